@@ -0,0 +1,217 @@
+"""
+AI建議快取模塊：記憶體LRU加上可選的SQLite持久層，支援TTL與過期重新驗證(stale-while-revalidate)
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class AdviceCache:
+    """
+    兩層式的建議快取
+
+    - 記憶體層: 有上限的LRU
+    - 磁碟層: SQLite資料表(db_path為None時停用)，可跨行程與重啟共享
+
+    條目在ttl秒內視為新鮮；超過ttl但仍在ttl + stale_ttl內時視為過期，
+    會立即回傳舊值並在背景重新計算
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 86400, stale_ttl: float = 3600,
+                 db_path: Optional[str] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.db_path = db_path
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        if db_path:
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS advice_cache ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+                )
+
+    def _connect(self) -> sqlite3.Connection:
+        # 每次操作都開新連線，避免跨執行緒共用同一個連線
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def _state(self, stored_at: float) -> Optional[str]:
+        age = time.time() - stored_at
+        if age <= self.ttl:
+            return "fresh"
+        if age <= self.ttl + self.stale_ttl:
+            return "stale"
+        return None
+
+    def get(self, key: str) -> Tuple[Any, Optional[str]]:
+        """
+        查詢快取
+
+        返回:
+        (值, 狀態)，狀態為 "fresh"、"stale" 或 None(未命中)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                state = self._state(entry[1])
+                if state is not None:
+                    self._entries.move_to_end(key)
+                    return entry[0], state
+                del self._entries[key]
+
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    row = conn.execute(
+                        "SELECT value, stored_at FROM advice_cache WHERE key = ?", (key,)
+                    ).fetchone()
+            except sqlite3.Error as e:
+                print(f"讀取建議快取時發生錯誤: {e}")
+                row = None
+            if row is not None:
+                value, stored_at = json.loads(row[0]), row[1]
+                state = self._state(stored_at)
+                if state is not None:
+                    self._remember(key, value, stored_at)
+                    return value, state
+        return None, None
+
+    def set(self, key: str, value: Any) -> None:
+        """寫入快取(兩層皆寫入)"""
+        stored_at = time.time()
+        self._remember(key, value, stored_at)
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO advice_cache (key, value, stored_at) VALUES (?, ?, ?)",
+                        (key, json.dumps(value, ensure_ascii=False), stored_at),
+                    )
+            except sqlite3.Error as e:
+                print(f"寫入建議快取時發生錯誤: {e}")
+
+    def _remember(self, key: str, value: Any, stored_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Tuple[Any, bool]]) -> Any:
+        """
+        取得快取值，未命中時呼叫compute
+
+        參數:
+        key: 快取鍵
+        compute: 回傳 (值, 是否可快取) 的函數；錯誤時的備用回應應回傳False，永遠不會被快取
+
+        返回:
+        快取或新計算的值
+        """
+        value, state = self.get(key)
+        if state == "fresh":
+            with self._lock:
+                self.hits += 1
+            return value
+        if state == "stale":
+            with self._lock:
+                self.stale_hits += 1
+            self._refresh_in_background(key, compute)
+            return value
+
+        with self._lock:
+            self.misses += 1
+        value, cacheable = compute()
+        if cacheable:
+            self.set(key, value)
+        return value
+
+    async def aget_or_compute(self, key: str, compute: Callable[[], Awaitable[Tuple[Any, bool]]]) -> Any:
+        """
+        get_or_compute的asyncio版本，compute為回傳 (值, 是否可快取) 的協程函數
+
+        過期條目會在目前的事件迴圈上以背景任務重新計算；磁碟層的SQLite存取在執行緒中進行，不阻塞事件迴圈
+        """
+        value, state = await self._aget(key)
+        if state == "fresh":
+            with self._lock:
+                self.hits += 1
+            return value
+        if state == "stale":
+            with self._lock:
+                self.stale_hits += 1
+                refreshing = key in self._refreshing
+                self._refreshing.add(key)
+            if not refreshing:
+                asyncio.get_running_loop().create_task(self._refresh_async(key, compute))
+            return value
+
+        with self._lock:
+            self.misses += 1
+        value, cacheable = await compute()
+        if cacheable:
+            await self._aset(key, value)
+        return value
+
+    async def _refresh_async(self, key: str, compute: Callable[[], Awaitable[Tuple[Any, bool]]]) -> None:
+        try:
+            value, cacheable = await compute()
+            if cacheable:
+                await self._aset(key, value)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    async def _aget(self, key: str) -> Tuple[Any, Optional[str]]:
+        if self.db_path:
+            return await asyncio.to_thread(self.get, key)
+        return self.get(key)
+
+    async def _aset(self, key: str, value: Any) -> None:
+        if self.db_path:
+            await asyncio.to_thread(self.set, key, value)
+        else:
+            self.set(key, value)
+
+    def _refresh_in_background(self, key: str, compute: Callable[[], Tuple[Any, bool]]) -> None:
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                value, cacheable = compute()
+                if cacheable:
+                    self.set(key, value)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name=f"advice-refresh-{key[:16]}", daemon=True).start()
+
+    def stats(self) -> Dict[str, int]:
+        """返回命中/未命中統計"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+    def clear(self) -> None:
+        """清除記憶體層與統計(磁碟層保留)"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.stale_hits = self.misses = 0
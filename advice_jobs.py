@@ -0,0 +1,309 @@
+"""
+非同步AI建議工作佇列：請求立即取得工作ID，由有上限的asyncio工作者在背景完成Gemini呼叫
+
+同步的gunicorn工作者不再被整個generate_content往返時間佔住；
+客戶端可輪詢工作狀態，或透過server-sent events等待結果。
+設定JobStore(SQLite)後工作狀態在工作者之間共享，查詢可以落在任何一個工作者上。
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import gemini_assistant
+
+
+class QueueFull(Exception):
+    """等待中的工作數已達上限"""
+
+
+class AdviceJob:
+    """單一建議工作的狀態(queued → running → done / error)"""
+
+    def __init__(self, job_id: str, params: Dict[str, Any]):
+        self.id = job_id
+        self.params = params
+        self.status = "queued"
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        # 每次狀態改變都會遞增，供SSE等待下一次變化
+        self.version = 0
+        self._changed = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "error")
+
+    def _update(self, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        with self._changed:
+            self.status = status
+            self.result = result
+            self.error = error
+            if self.finished:
+                self.finished_at = time.time()
+            self.version += 1
+            self._changed.notify_all()
+
+    def wait_for_change(self, version: int, timeout: Optional[float] = None) -> int:
+        """
+        等待狀態版本超過version
+
+        返回:
+        目前的狀態版本(逾時則與傳入值相同)
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self.version > version, timeout)
+            return self.version
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {"id": self.id, "status": self.status, "created_at": self.created_at}
+        if self.finished:
+            data["finished_at"] = self.finished_at
+        if self.result is not None:
+            data["result"] = self.result
+        if self.error is not None:
+            data["error"] = self.error
+        return data
+
+
+class JobStore:
+    """
+    以SQLite保存工作狀態，讓提交工作以外的gunicorn工作者也能回答查詢
+
+    參數:
+    db_path: SQLite資料庫路徑(可與建議快取共用同一個文件)
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS advice_jobs ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, result TEXT, error TEXT, "
+                "version INTEGER NOT NULL, created_at REAL NOT NULL, finished_at REAL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # 每次操作都開新連線，避免跨執行緒共用同一個連線
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def save(self, job: AdviceJob) -> None:
+        """寫入工作目前的狀態"""
+        result = json.dumps(job.result, ensure_ascii=False) if job.result is not None else None
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO advice_jobs "
+                    "(id, status, result, error, version, created_at, finished_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (job.id, job.status, result, job.error, job.version, job.created_at, job.finished_at),
+                )
+        except sqlite3.Error as e:
+            print(f"寫入建議工作 {job.id} 時發生錯誤: {e}")
+
+    def load(self, job_id: str) -> Optional[AdviceJob]:
+        """
+        讀取工作狀態
+
+        返回:
+        工作的快照(不會再收到狀態變化通知)，不存在時返回None
+        """
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT status, result, error, version, created_at, finished_at FROM advice_jobs WHERE id = ?",
+                    (job_id,),
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"讀取建議工作 {job_id} 時發生錯誤: {e}")
+            return None
+        if row is None:
+            return None
+        job = AdviceJob(job_id, {})
+        job.status, result, job.error, job.version, job.created_at, job.finished_at = row
+        job.result = json.loads(result) if result is not None else None
+        return job
+
+    def prune(self, cutoff: float) -> None:
+        """刪除在cutoff之前完成的工作"""
+        try:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM advice_jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (cutoff,))
+        except sqlite3.Error as e:
+            print(f"清除過期建議工作時發生錯誤: {e}")
+
+
+def _default_runner(params: Dict[str, Any]) -> Awaitable[Dict[str, Any]]:
+    return gemini_assistant.get_personalized_advice_async(**params)
+
+
+class AdviceJobQueue:
+    """
+    在獨立執行緒的事件迴圈上執行建議工作
+
+    參數:
+    concurrency: 同時進行的Gemini呼叫上限
+    max_queue: 尚未完成(等待中+執行中)的工作上限，超過時submit拋出QueueFull
+    job_ttl: 完成的工作保留供查詢的秒數
+    runner: 接收參數字典並回傳建議的協程函數
+    store: 共享工作狀態的JobStore，None時只有提交工作的行程能查詢
+    """
+
+    def __init__(self, concurrency: int = 4, max_queue: int = 100, job_ttl: float = 600,
+                 runner: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]] = _default_runner,
+                 store: Optional[JobStore] = None):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.job_ttl = job_ttl
+        self.runner = runner
+        self.store = store
+        self._jobs: Dict[str, AdviceJob] = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional["asyncio.Queue[AdviceJob]"] = None
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        # 呼叫端須持有self._lock
+        if self._loop is None:
+            loop = asyncio.new_event_loop()
+            started = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                self._queue = asyncio.Queue()
+                for _ in range(self.concurrency):
+                    loop.create_task(self._worker())
+                started.set()
+                loop.run_forever()
+
+            threading.Thread(target=run, name="advice-jobs", daemon=True).start()
+            started.wait()
+            self._loop = loop
+        return self._loop
+
+    async def _set_status(self, job: AdviceJob, status: str, **fields: Any) -> None:
+        job._update(status, **fields)
+        if self.store is not None:
+            # SQLite寫入在執行緒中進行，不阻塞事件迴圈上的其他工作
+            await asyncio.to_thread(self.store.save, job)
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            await self._set_status(job, "running")
+            try:
+                await self._set_status(job, "done", result=await self.runner(job.params))
+            except Exception as e:
+                print(f"建議工作 {job.id} 失敗: {e}")
+                await self._set_status(job, "error", error=str(e))
+            finally:
+                with self._lock:
+                    self._pending -= 1
+                self._queue.task_done()
+
+    def _prune(self) -> None:
+        # 呼叫端須持有self._lock
+        cutoff = time.time() - self.job_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+        if self.store is not None:
+            self.store.prune(cutoff)
+
+    def submit(self, **params: Any) -> AdviceJob:
+        """
+        提交建議工作並立即返回
+
+        參數:
+        params: 傳給runner的關鍵字參數(預設為get_personalized_advice_async的參數)
+
+        返回:
+        新建立的AdviceJob
+        """
+        with self._lock:
+            if self._pending >= self.max_queue:
+                raise QueueFull(f"建議工作佇列已滿 ({self.max_queue})")
+            self._prune()
+            job = AdviceJob(uuid.uuid4().hex, params)
+            self._jobs[job.id] = job
+            self._pending += 1
+            loop = self._ensure_started()
+        if self.store is not None:
+            self.store.save(job)
+        loop.call_soon_threadsafe(self._queue.put_nowait, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[AdviceJob]:
+        """
+        依ID取得工作，不存在或已過期時返回None
+
+        工作由其他工作者行程提交時，從JobStore返回其狀態的快照
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            job = self.store.load(job_id)
+        return job
+
+    def wait_for_change(self, job: AdviceJob, version: int, timeout: float,
+                        poll_interval: float = 0.5) -> Optional[AdviceJob]:
+        """
+        等待工作的狀態版本超過version
+
+        本行程的工作以條件變數等待；其他工作者的工作則定期從JobStore重新讀取
+
+        返回:
+        最新的工作(逾時則版本不變)，工作已不存在時返回None
+        """
+        with self._lock:
+            local = self._jobs.get(job.id)
+        if local is not None:
+            local.wait_for_change(version, timeout)
+            return local
+        deadline = time.monotonic() + timeout
+        while True:
+            latest = self.store.load(job.id) if self.store is not None else None
+            if latest is None or latest.version > version or time.monotonic() >= deadline:
+                return latest
+            time.sleep(min(poll_interval, max(0.0, deadline - time.monotonic())))
+
+    def stats(self) -> Dict[str, int]:
+        """返回佇列狀態"""
+        with self._lock:
+            return {
+                "pending": self._pending,
+                "jobs": len(self._jobs),
+                "concurrency": self.concurrency,
+                "max_queue": self.max_queue,
+            }
+
+
+_job_queue: Optional[AdviceJobQueue] = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> AdviceJobQueue:
+    """
+    返回每個行程共用的工作佇列(由環境變數設定上限)
+
+    ADVICE_JOB_DB(未設定時沿用GEMINI_CACHE_DB)指定共享工作狀態的SQLite文件，
+    多個gunicorn工作者時必須設定，否則查詢落在其他工作者上會得到404
+    """
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            db_path = os.environ.get("ADVICE_JOB_DB") or os.environ.get("GEMINI_CACHE_DB")
+            _job_queue = AdviceJobQueue(
+                concurrency=int(os.environ.get("ADVICE_JOB_CONCURRENCY", "4")),
+                max_queue=int(os.environ.get("ADVICE_JOB_QUEUE_SIZE", "100")),
+                job_ttl=float(os.environ.get("ADVICE_JOB_TTL", "600")),
+                store=JobStore(db_path) if db_path else None,
+            )
+        return _job_queue
@@ -1,20 +1,29 @@
 import os
 from flask import Flask, render_template
+import http_cache
+import page_cache
+import project_pages
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET")
 
 @app.route('/')
+@http_cache.page('index.html')
+@page_cache.page('index.html')
 def home():
     return render_template('index.html')
 
 @app.route('/slideshow')
+@http_cache.page('slideshow.html')
+@page_cache.page('slideshow.html')
 def slideshow():
     return render_template('slideshow.html')
 
 @app.route('/projects')
+@http_cache.page('projects.html', data=True)
+@page_cache.page('projects.html', data=True)
 def projects():
-    return render_template('projects.html')
+    return project_pages.render_projects()
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
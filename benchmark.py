@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+效能基準測試：量測肺部渲染與頁面服務的熱路徑
+
+涵蓋項目:
+    - lung_svg_generator.create_lung_image / generate_lung_svg (依健康度掃描，健康度越低成本越高)
+    - utils.get_project_data
+    - main.py 與 app.py 的 Flask 路由(透過 test client)
+    - 模組匯入時間(每次在全新的直譯器中量測，並記錄是否載入了重量級依賴)
+
+每項記錄牆鐘時間、tracemalloc峰值記憶體、artist數量與輸出位元組數
+
+用法:
+    python benchmark.py --json bench.json --template-dir .
+    python benchmark.py --compare bench.json --threshold 0.2
+"""
+import argparse
+import json
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+DEFAULT_LEVELS = (0, 10, 25, 50, 75, 90, 100)
+
+# 只應在實際渲染或呼叫AI時才載入的模組
+HEAVY_MODULES = ('numpy', 'matplotlib', 'PIL', 'google.generativeai')
+
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = (time.perf_counter() - started) * 1000
+print(json.dumps({{"ms": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(func, repeat):
+    """
+    重複執行func並記錄時間與記憶體
+
+    Returns:
+        tuple: (結果字典, 最後一次執行的回傳值)
+    """
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    # 另外執行一次量測記憶體峰值，避免tracemalloc的額外開銷影響計時
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "wall_ms": round(statistics.median(timings), 3),
+        "min_ms": round(min(timings), 3),
+        "peak_kb": round(peak / 1024, 1),
+    }, result
+
+
+def bench_lung(levels, repeat):
+    """肺部渲染：直接繪製與完整編碼(不經快取)"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    import lung_svg_generator
+
+    records = []
+    for level in levels:
+        def draw():
+            fig = Figure(figsize=(5, 5))
+            FigureCanvasAgg(fig)
+            ax = fig.add_subplot()
+            lung_svg_generator.create_lung_image(ax, level)
+            return ax
+
+        stats, ax = measure(draw, repeat)
+        stats["artists"] = len(ax.get_children())
+        stats["spots"] = sum(len(c.get_offsets()) for c in ax.collections)
+        records.append(dict(name=f"create_lung_image[{level:g}]", **stats))
+
+        for image_format in ('png', 'svg'):
+            stats, data = measure(
+                lambda: lung_svg_generator.generate_lung_svg(level, use_cache=False, format=image_format, raw=True),
+                repeat)
+            stats["output_bytes"] = len(data)
+            records.append(dict(name=f"generate_lung_svg[{image_format},{level:g}]", **stats))
+    return records
+
+
+def bench_project_data(repeat):
+    """專案資料讀取"""
+    import utils
+
+    stats, data = measure(utils.get_project_data, max(repeat, 50))
+    stats["items"] = len(data)
+    return [dict(name="utils.get_project_data", **stats)]
+
+
+def bench_routes(repeat, template_dir=None):
+    """
+    透過Flask test client量測頁面路由
+
+    Args:
+        template_dir: 覆寫Flask的模板目錄(模板不在預設的templates/目錄時)
+    """
+    import app as replit_app
+    import main
+
+    records = []
+    targets = [
+        ("main", main.app, ['/', '/slideshow', '/projects', '/lung/50.png']),
+        ("app", replit_app.app, ['/', '/slideshow', '/projects']),
+    ]
+    for label, flask_app, paths in targets:
+        if template_dir:
+            flask_app.template_folder = template_dir
+        # 錯誤(例如找不到模板)會反映在status欄位並使基準測試失敗，不需在每次重複時輸出追蹤訊息
+        flask_app.logger.disabled = True
+        client = flask_app.test_client()
+        for path in paths:
+            stats, response = measure(lambda: client.get(path), repeat)
+            stats["status"] = response.status_code
+            stats["output_bytes"] = len(response.get_data())
+            records.append(dict(name=f"{label}:GET {path}", **stats))
+    return records
+
+
+def bench_imports(repeat, modules=('main', 'lung_svg_generator', 'gemini_assistant', 'advice_jobs')):
+    """在全新的子行程中量測模組匯入時間(工作者啟動成本)"""
+    records = []
+    for module in modules:
+        code = IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)
+        timings = []
+        loaded = []
+        for _ in range(repeat):
+            completed = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+            if completed.returncode != 0:
+                break
+            probe = json.loads(completed.stdout)
+            timings.append(probe["ms"])
+            loaded = probe["loaded"]
+        if not timings:
+            records.append({"name": f"import {module}", "wall_ms": 0, "min_ms": 0, "peak_kb": 0, "status": "error"})
+            continue
+        records.append({
+            "name": f"import {module}",
+            "wall_ms": round(statistics.median(timings), 3),
+            "min_ms": round(min(timings), 3),
+            "peak_kb": 0,
+            "heavy_loaded": loaded,
+        })
+    return records
+
+
+def run(levels, repeat, suites, template_dir=None):
+    """執行選定的測試組並回傳報告"""
+    records = []
+    if 'imports' in suites:
+        records += bench_imports(repeat)
+    if 'lung' in suites:
+        records += bench_lung(levels, repeat)
+    if 'data' in suites:
+        records += bench_project_data(repeat)
+    if 'routes' in suites:
+        records += bench_routes(repeat, template_dir)
+
+    # ru_maxrss在Linux上的單位為KB，在macOS上為位元組
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        max_rss //= 1024
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "max_rss_kb": max_rss,
+        "results": records,
+    }
+
+
+def failed_records(report):
+    """
+    Returns:
+        list: 狀態不是200的測試名稱(例如路由返回錯誤頁面，或模組無法匯入)
+    """
+    return [record["name"] for record in report["results"] if record.get("status", 200) != 200]
+
+
+def compare(report, baseline, threshold):
+    """
+    與基準報告比較牆鐘時間
+
+    狀態與基準不同或不是200時視為失敗，不比較時間(錯誤頁面通常比實際渲染快得多)
+
+    Returns:
+        list: 退化超過門檻或失敗的測試名稱
+    """
+    baseline_results = {r["name"]: r for r in baseline["results"]}
+    regressions = []
+    print(f"\n{'名稱':<44}{'基準(ms)':>12}{'目前(ms)':>12}{'變化':>10}")
+    for record in report["results"]:
+        base = baseline_results.get(record["name"])
+        if base is None:
+            continue
+        status, base_status = record.get("status", 200), base.get("status", 200)
+        if status != 200 or status != base_status:
+            regressions.append(record["name"])
+            print(f"{record['name']:<44}{'狀態':>12}{base_status!s:>12}{status!s:>10}  <-- 失敗")
+            continue
+        if not base["wall_ms"]:
+            continue
+        change = record["wall_ms"] / base["wall_ms"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(record["name"])
+            flag = "  <-- 退化"
+        print(f"{record['name']:<44}{base['wall_ms']:>12.2f}{record['wall_ms']:>12.2f}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def print_report(report):
+    print(f"{'名稱':<44}{'狀態':>6}{'中位數(ms)':>12}{'峰值(KB)':>12}{'輸出(B)':>10}{'artists':>9}")
+    for record in report["results"]:
+        print(f"{record['name']:<44}{record.get('status', ''):>6}{record['wall_ms']:>12.2f}{record['peak_kb']:>12.1f}"
+              f"{record.get('output_bytes', ''):>10}{record.get('artists', ''):>9}"
+              + (f"  載入: {', '.join(record['heavy_loaded']) or '無'}" if 'heavy_loaded' in record else ""))
+    print(f"最大常駐記憶體: {report['max_rss_kb']} KB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="肺部渲染與頁面服務效能基準測試")
+    parser.add_argument('--levels', default=",".join(map(str, DEFAULT_LEVELS)), help="以逗號分隔的健康度")
+    parser.add_argument('--repeat', type=int, default=5, help="每項重複次數")
+    parser.add_argument('--suites', default='imports,lung,data,routes',
+                        help="要執行的測試組(imports、lung、data、routes)")
+    parser.add_argument('--json', dest='json_path', help="將報告寫入JSON檔案")
+    parser.add_argument('--compare', dest='baseline_path', help="與此基準JSON報告比較")
+    parser.add_argument('--threshold', type=float, default=0.2, help="視為退化的變慢比例(預設0.2)")
+    parser.add_argument('--template-dir', default=None, help="覆寫Flask的模板目錄(例如專案根目錄)")
+    args = parser.parse_args()
+
+    levels = [float(level) for level in args.levels.split(',') if level.strip()]
+    suites = {suite.strip() for suite in args.suites.split(',')}
+    report = run(levels, args.repeat, suites, args.template_dir)
+    print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+
+    if args.baseline_path:
+        with open(args.baseline_path, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} 項失敗或效能退化超過 {args.threshold:.0%}")
+            sys.exit(1)
+
+    failures = failed_records(report)
+    if failures:
+        print(f"\n{len(failures)} 項未返回200，計時不代表實際渲染: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
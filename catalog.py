@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+專案目錄模塊：以倒排索引依分類、技術與標題關鍵字篩選專案，並在伺服器端分頁
+"""
+import math
+import re
+import threading
+from collections import namedtuple
+
+import utils
+
+# 每頁專案數的預設值與上限
+DEFAULT_PER_PAGE = 12
+MAX_PER_PAGE = 50
+
+# 分類代碼對應的顯示名稱(未列出的分類直接顯示代碼)
+CATEGORY_LABELS = {
+    "finance": "金融",
+    "programming": "程式設計",
+    "analysis": "分析",
+}
+
+# 中日韓文字連續區段，或英數字詞(英數字詞排除中日韓文字，「Python股價」切為「Python」與「股價」)
+_CJK_RANGES = r'\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af'
+_TOKEN_PATTERN = re.compile(rf'[{_CJK_RANGES}]+|[^\W_{_CJK_RANGES}]+')
+_CJK_PATTERN = re.compile(rf'[{_CJK_RANGES}]')
+
+Page = namedtuple('Page', ['items', 'page', 'per_page', 'total', 'pages'])
+
+
+def tokenize(text, unigrams=False):
+    """
+    將標題切成索引詞
+
+    英數字以整個詞(不分大小寫)為單位；中日韓文字沒有空白分隔，改以相鄰兩字(bigram)為單位，
+    例如「台積電股價」切為「台積」「積電」「電股」「股價」。單一字的區段保留該字。
+
+    Args:
+        unigrams: 是否另外加入每個中日韓單字；建立索引時使用，讓「台」這類單字查詢也能命中
+
+    Returns:
+        list: 索引詞
+    """
+    tokens = []
+    for run in _TOKEN_PATTERN.findall(text):
+        if _CJK_PATTERN.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+                if unigrams:
+                    tokens.extend(run)
+        else:
+            tokens.append(run.casefold())
+    return tokens
+
+
+def _normalize(value):
+    return value.strip().casefold()
+
+
+class ProjectFilter:
+    """
+    單一專案的篩選條件，語意與ProjectCatalog.search相同，用於無法預先建立索引的串流資料
+    """
+
+    def __init__(self, categories=(), technologies=(), query=""):
+        self.categories = {_normalize(category) for category in categories}
+        self.technologies = [_normalize(technology) for technology in technologies]
+        self.tokens = set(tokenize(query))
+
+    def __call__(self, project):
+        if self.categories and _normalize(project.category) not in self.categories:
+            return False
+        if self.technologies:
+            available = {_normalize(technology) for technology in project.technologies}
+            if not all(technology in available for technology in self.technologies):
+                return False
+        return not self.tokens or self.tokens <= set(tokenize(project.title, unigrams=True))
+
+
+class StreamedPage:
+    """
+    邊讀邊篩選的一頁專案：迭代時逐一產生本頁的專案，之後繼續掃描剩餘資料以計算總數，
+    因此total與pages只在迭代結束後才有值
+
+    頁碼超出範圍時與ProjectCatalog.paginate相同改為最後一頁：掃描期間保留目前最後一頁的專案
+    (最多per_page個)，掃描結束後才產生，page也在此時改為最後一頁的頁碼
+
+    Args:
+        projects: 專案的可迭代物件(例如utils.iter_project_lines())
+        predicate: 篩選函數
+    """
+
+    def __init__(self, projects, predicate, page=1, per_page=DEFAULT_PER_PAGE):
+        self.projects = projects
+        self.predicate = predicate
+        self.page = max(1, page)
+        self.per_page = max(1, min(per_page, MAX_PER_PAGE))
+        self.total = None
+        self.pages = None
+
+    def __iter__(self):
+        start = (self.page - 1) * self.per_page
+        end = start + self.per_page
+        count = 0
+        last_page = []
+        for project in self.projects:
+            if not self.predicate(project):
+                continue
+            if start <= count < end:
+                yield project
+            elif count < start:
+                if count % self.per_page == 0:
+                    last_page = []
+                last_page.append(project)
+            count += 1
+        self.total = count
+        self.pages = max(1, math.ceil(count / self.per_page))
+        if self.page > self.pages:
+            self.page = self.pages
+            yield from last_page
+
+
+class ProjectCatalog:
+    """
+    建立在專案列表上的唯讀索引
+
+    Args:
+        projects: utils.get_project_data()返回的Project序列
+    """
+
+    def __init__(self, projects):
+        self.projects = tuple(projects)
+        self.by_category = {}
+        self.by_technology = {}
+        self.by_title_token = {}
+        for index, project in enumerate(self.projects):
+            self.by_category.setdefault(_normalize(project.category), []).append(index)
+            for technology in project.technologies:
+                self.by_technology.setdefault(_normalize(technology), []).append(index)
+            for token in set(tokenize(project.title, unigrams=True)):
+                self.by_title_token.setdefault(token, []).append(index)
+        # 每個索引項目都是遞增的專案序號，交集後直接排序即可保持原本的順序
+        for index in (self.by_category, self.by_technology, self.by_title_token):
+            for key, positions in index.items():
+                index[key] = frozenset(positions)
+
+    def categories(self):
+        """
+        Returns:
+            list: (分類代碼, 顯示名稱, 專案數)，依專案數由多到少
+        """
+        return sorted(
+            ((category, CATEGORY_LABELS.get(category, category), len(positions))
+             for category, positions in self.by_category.items() if category),
+            key=lambda item: (-item[2], item[0]),
+        )
+
+    def search(self, categories=(), technologies=(), query=""):
+        """
+        篩選專案：多個分類取聯集；技術與標題關鍵字的每一項都必須符合
+
+        Returns:
+            tuple: 符合條件的專案(依原本順序)
+        """
+        candidates = None
+
+        def narrow(positions):
+            nonlocal candidates
+            candidates = positions if candidates is None else candidates & positions
+
+        if categories:
+            narrow(frozenset().union(*(self.by_category.get(_normalize(c), frozenset()) for c in categories)))
+        for technology in technologies:
+            narrow(self.by_technology.get(_normalize(technology), frozenset()))
+        for token in set(tokenize(query)):
+            narrow(self.by_title_token.get(token, frozenset()))
+
+        if candidates is None:
+            return self.projects
+        return tuple(self.projects[index] for index in sorted(candidates))
+
+    @staticmethod
+    def paginate(results, page=1, per_page=DEFAULT_PER_PAGE):
+        """
+        取出一頁結果(頁碼超出範圍時取最後一頁)
+
+        Returns:
+            Page: items、page、per_page、total、pages
+        """
+        per_page = max(1, min(per_page, MAX_PER_PAGE))
+        pages = max(1, math.ceil(len(results) / per_page))
+        page = max(1, min(page, pages))
+        start = (page - 1) * per_page
+        return Page(results[start:start + per_page], page, per_page, len(results), pages)
+
+
+_catalog = None
+_catalog_source = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """
+    返回目前專案資料的目錄，只在utils重新載入data.txt後重建索引
+
+    Returns:
+        ProjectCatalog: 專案目錄
+    """
+    global _catalog, _catalog_source
+    projects = utils.get_project_data()
+    with _catalog_lock:
+        # 資料未改變時utils會返回同一個物件
+        if projects is not _catalog_source:
+            _catalog, _catalog_source = ProjectCatalog(projects), projects
+        return _catalog
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+靜態網站匯出：將Flask路由預先渲染成靜態文件，可直接由任何靜態伺服器或CDN提供
+
+從種子路由(/、/slideshow、/projects)開始，透過Flask test client渲染頁面，
+並沿著頁面中的站內連結(例如專案的分類、技術篩選與分頁)繼續渲染，直到沒有新的連結。
+
+輸出:
+    <output_dir>/index.html、slideshow.html、projects.html ...
+    <output_dir>/projects-<雜湊>.html          帶查詢參數的頁面
+    <output_dir>/static/css/style.<雜湊>.css   以內容雜湊命名的資源(頁面中的引用會一併改寫)
+    <output_dir>/asset-manifest.json
+    以及每個文字文件的 .gz 與 .br(需安裝brotli)預先壓縮版本
+
+用法:
+    python freeze.py --output-dir build --lungs png
+"""
+import argparse
+import gzip
+import hashlib
+import html
+import json
+import os
+import re
+import shutil
+import time
+from urllib.parse import urlsplit
+
+try:
+    import brotli
+except ImportError:  # 沒有brotli時只產生.gz
+    brotli = None
+
+import main
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT_DIR = os.path.join(BASE_DIR, 'build')
+SEED_URLS = ('/', '/slideshow', '/projects')
+
+# 值得預先壓縮的文件類型
+COMPRESSIBLE_EXTENSIONS = ('.html', '.css', '.js', '.svg', '.json', '.txt', '.xml')
+
+MANIFEST_NAME = 'asset-manifest.json'
+COMPRESSED_SUFFIXES = ('', '.gz', '.br')
+
+# 頁面中的href/src屬性
+_LINK_PATTERN = re.compile(r'(href|src)="([^"]*)"')
+
+
+def output_name(url):
+    """
+    將站內URL對應到輸出文件名稱
+
+    "/" 對應 index.html；沒有副檔名的路徑加上 .html；帶查詢參數的URL在檔名後加上查詢字串的雜湊
+
+    Returns:
+        str: 相對於輸出目錄的路徑
+    """
+    parts = urlsplit(url)
+    path = parts.path.strip('/') or 'index'
+    root, extension = os.path.splitext(path)
+    if not extension:
+        extension = '.html'
+    if parts.query:
+        root = f"{root}-{hashlib.sha1(parts.query.encode('utf-8')).hexdigest()[:10]}"
+    return root + extension
+
+
+def _internal_links(body):
+    """找出頁面中可由Flask渲染的站內連結(以 / 開頭、非靜態資源)"""
+    links = set()
+    for _, value in _LINK_PATTERN.findall(body):
+        url = html.unescape(value)
+        if url.startswith('/') and not url.startswith(('//', '/static/')):
+            links.add(urlsplit(url)._replace(fragment='').geturl())
+    return links
+
+
+def crawl(client, seeds, max_pages):
+    """
+    從種子URL開始渲染所有可到達的站內頁面
+
+    Returns:
+        tuple: ({URL: 回應內容bytes}, [失敗的(URL, 狀態碼)], [達到max_pages而未渲染的URL])
+    """
+    pages = {}
+    failures = []
+    pending = list(seeds)
+    seen = set(pending)
+    while pending:
+        if len(pages) >= max_pages:
+            # 未渲染的頁面在靜態網站上會是404，由呼叫者回報
+            break
+        url = pending.pop(0)
+        response = client.get(url)
+        body = response.get_data()
+        if response.status_code != 200:
+            failures.append((url, response.status_code))
+            continue
+        pages[url] = body
+        if response.mimetype == 'text/html':
+            for link in sorted(_internal_links(body.decode('utf-8'))):
+                if link not in seen:
+                    seen.add(link)
+                    pending.append(link)
+    return pages, failures, pending
+
+
+def hash_assets(static_dir, output_dir):
+    """
+    以內容雜湊命名並複製靜態資源
+
+    Returns:
+        dict: {原本的相對路徑: 雜湊後的相對路徑}，例如 static/css/style.css -> static/css/style.1a2b3c4d.css
+    """
+    manifest = {}
+    if not os.path.isdir(static_dir):
+        return manifest
+    for directory, _, files in os.walk(static_dir):
+        for filename in files:
+            source = os.path.join(directory, filename)
+            relative = os.path.relpath(source, os.path.dirname(static_dir)).replace(os.sep, '/')
+            with open(source, 'rb') as file:
+                digest = hashlib.sha256(file.read()).hexdigest()[:8]
+            root, extension = os.path.splitext(relative)
+            hashed = f"{root}.{digest}{extension}"
+            target = os.path.join(output_dir, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(source, target)
+            manifest[relative] = hashed
+    return manifest
+
+
+def rewrite_links(body, url_map, asset_map):
+    """將頁面中的站內連結改為輸出文件，靜態資源改為雜湊後的名稱"""
+    def replace(match):
+        attribute, value = match.groups()
+        url = html.unescape(value)
+        base, _, fragment = url.partition('#')
+        if base in url_map:
+            target = '/' + url_map[base]
+        elif base.lstrip('/') in asset_map:
+            # 保留原本是相對或絕對路徑
+            target = ('/' if base.startswith('/') else '') + asset_map[base.lstrip('/')]
+        else:
+            return match.group(0)
+        if fragment:
+            target += '#' + fragment
+        return f'{attribute}="{html.escape(target)}"'
+
+    return _LINK_PATTERN.sub(replace, body)
+
+
+def precompress(path):
+    """
+    寫出 .gz 與 .br 版本(壓縮後沒有變小則略過)
+
+    Returns:
+        list: 寫出的文件路徑
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    written = []
+    # mtime=0 讓相同內容產生相同的.gz，方便CDN快取與比對
+    encodings = [('.gz', lambda raw: gzip.compress(raw, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        encodings.append(('.br', lambda raw: brotli.compress(raw, quality=11)))
+    for suffix, compress in encodings:
+        compressed = compress(data)
+        if len(compressed) < len(data):
+            with open(path + suffix, 'wb') as file:
+                file.write(compressed)
+            written.append(path + suffix)
+    return written
+
+
+def clean_previous_export(output_dir):
+    """
+    只刪除上一次匯出的manifest所列出的文件(以及其 .gz/.br 版本)，其他文件保持不變
+
+    Returns:
+        int: 刪除的文件數
+    """
+    root = os.path.realpath(output_dir)
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'r', encoding='utf-8') as file:
+        manifest = json.load(file)
+    names = [MANIFEST_NAME] + list(manifest.get("pages", {}).values()) + list(manifest.get("assets", {}).values())
+    removed = 0
+    directories = set()
+    for name in names:
+        for suffix in COMPRESSED_SUFFIXES:
+            path = os.path.realpath(os.path.join(root, name + suffix))
+            # 忽略指向輸出目錄以外的項目
+            if not path.startswith(root + os.sep) or not os.path.isfile(path):
+                continue
+            os.remove(path)
+            removed += 1
+            directories.add(os.path.dirname(path))
+    # 移除因此變空的子目錄(例如lung/)
+    for directory in sorted(directories, key=len, reverse=True):
+        while directory != root and os.path.isdir(directory) and not os.listdir(directory):
+            os.rmdir(directory)
+            directory = os.path.dirname(directory)
+    return removed
+
+
+def prepare_output_dir(output_dir, force=False):
+    """
+    準備輸出目錄：不存在或為空時直接使用；含有上一次匯出的manifest時只清除其列出的文件；
+    其他非空目錄(例如誤傳了專案根目錄)除非force，否則拒絕寫入
+
+    Raises:
+        FileExistsError: 目錄非空且不是先前的匯出結果
+    """
+    if os.path.realpath(output_dir) in (os.path.realpath(BASE_DIR), os.path.realpath(os.sep)):
+        # 匯出的index.html等文件會覆蓋專案根目錄中的模板
+        raise FileExistsError(f"不能匯出到 {output_dir}")
+    if not os.path.isdir(output_dir) or not os.listdir(output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+    elif os.path.isfile(os.path.join(output_dir, MANIFEST_NAME)):
+        clean_previous_export(output_dir)
+    elif not force:
+        raise FileExistsError(f"{output_dir} 不是空目錄，也沒有先前匯出的 {MANIFEST_NAME}；"
+                              f"確定要寫入時請加上 --force(不會刪除既有文件)")
+
+
+def freeze(output_dir=DEFAULT_OUTPUT_DIR, lung_formats=(), max_pages=10000, template_dir=None, force=False):
+    """
+    匯出整個網站
+
+    Args:
+        output_dir: 輸出目錄(只清除先前匯出的文件，見prepare_output_dir)
+        lung_formats: 一併匯出0-100肺部圖像的格式(例如 ('png',))
+        max_pages: 最多渲染的頁面數
+        template_dir: 覆寫Flask的模板目錄；預設在Flask的templates/目錄不存在時使用專案根目錄
+        force: 允許寫入非空且不是先前匯出結果的目錄
+
+    Returns:
+        dict: 匯出摘要
+    """
+    started = time.perf_counter()
+    if template_dir is None and not os.path.isdir(os.path.join(main.app.root_path, main.app.template_folder)):
+        # 本專案的模板放在根目錄
+        template_dir = BASE_DIR
+    if template_dir:
+        main.app.template_folder = template_dir
+    prepare_output_dir(output_dir, force)
+
+    seeds = list(SEED_URLS)
+    seeds += [f"/lung/{level}.{image_format}" for image_format in lung_formats for level in range(101)]
+    pages, failures, skipped = crawl(main.app.test_client(), seeds, max_pages)
+
+    asset_map = hash_assets(os.path.join(BASE_DIR, 'static'), output_dir)
+    url_map = {url: output_name(url) for url in pages}
+
+    written = []
+    for url, body in pages.items():
+        path = os.path.join(output_dir, url_map[url])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if path.endswith('.html'):
+            body = rewrite_links(body.decode('utf-8'), url_map, asset_map).encode('utf-8')
+        with open(path, 'wb') as file:
+            file.write(body)
+        written.append(path)
+
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'w', encoding='utf-8') as file:
+        json.dump({"assets": asset_map, "pages": url_map}, file, indent=2, ensure_ascii=False)
+    written.append(os.path.join(output_dir, MANIFEST_NAME))
+    written += [os.path.join(output_dir, hashed) for hashed in asset_map.values()]
+
+    compressed = []
+    for path in written:
+        if path.endswith(COMPRESSIBLE_EXTENSIONS):
+            compressed += precompress(path)
+
+    for url, status in failures:
+        print(f"無法渲染 {url} (HTTP {status})")
+    if skipped:
+        print(f"達到 --max-pages {max_pages}，{len(skipped)} 個連結未匯出(在靜態網站上會是404):")
+        for url in skipped:
+            print(f"  {url}")
+    print(f"已匯出 {len(pages)} 個頁面、{len(asset_map)} 個資源、{len(compressed)} 個壓縮文件，"
+          f"耗時 {time.perf_counter() - started:.1f} 秒 -> {output_dir}")
+    if brotli is None:
+        print("未安裝brotli，只產生 .gz")
+    return {"pages": len(pages), "assets": len(asset_map), "compressed": len(compressed),
+            "failures": failures, "skipped": skipped}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="將網站匯出為靜態文件")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help="輸出目錄(只清除先前匯出的文件)")
+    parser.add_argument('--lungs', default='', help="一併匯出肺部圖像的格式，以逗號分隔(png、svg、webp)")
+    parser.add_argument('--max-pages', type=int, default=10000, help="最多渲染的頁面數(超過時列出未匯出的連結並以非零狀態結束)")
+    parser.add_argument('--template-dir', default=None, help="覆寫Flask的模板目錄(預設在templates/不存在時使用專案根目錄)")
+    parser.add_argument('--force', action='store_true', help="允許寫入非空且不是先前匯出結果的目錄(不會刪除既有文件)")
+    args = parser.parse_args()
+
+    lung_formats = [f.strip() for f in args.lungs.split(',') if f.strip()]
+    try:
+        summary = freeze(args.output_dir, lung_formats, args.max_pages, args.template_dir, args.force)
+    except FileExistsError as e:
+        raise SystemExit(str(e))
+    if summary["failures"] or summary["skipped"]:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main_cli()
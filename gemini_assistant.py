@@ -1,13 +1,143 @@
-import google.generativeai as genai
+import copy
+import json
 import os
-from typing import List, Dict, Any, Optional
+import re
+import threading
+import time
+from typing import List, Dict, Any, Iterator, Optional, Tuple, TypedDict
+
+import local_advice
+import metrics
+import resilience
+from advice_cache import AdviceCache
+from singleflight import SingleFlight
 
 # 設置Gemini API密鑰
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_API_KEY)
 
 # 設置Gemini模型 - 使用最新的API格式
-model = genai.GenerativeModel('gemini-1.5-pro')
+GEMINI_MODEL_NAME = 'gemini-1.5-pro'
+
+# SDK與模型在第一次使用時才建立，只提供靜態頁面的工作者不必載入google.generativeai
+_model = None
+_model_lock = threading.Lock()
+
+def _get_model():
+    """返回共用的GenerativeModel，第一次呼叫時匯入SDK並設定API密鑰"""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                if os.environ.get("GEMINI_BACKEND") == "stub":
+                    # 本地替身，不連網(見gemini_stub.py)
+                    import gemini_stub
+                    _model = gemini_stub.StubModel()
+                else:
+                    import google.generativeai as genai
+                    genai.configure(api_key=GEMINI_API_KEY)
+                    if GEMINI_STRUCTURED_OUTPUT:
+                        _model = genai.GenerativeModel(
+                            GEMINI_MODEL_NAME,
+                            system_instruction=ADVICE_SYSTEM_INSTRUCTION,
+                            generation_config=structured_generation_config,
+                        )
+                    else:
+                        _model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+    return _model
+
+def __getattr__(name: str) -> Any:
+    # 保留 gemini_assistant.model 的存取方式
+    if name == 'model':
+        return _get_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# 呼叫Gemini的時間預算、重試與斷路器：上游不健康時立即返回備用回應，而不是每個請求都卡到SDK逾時
+gemini_retry = resilience.RetryPolicy(
+    attempts=int(os.environ.get("GEMINI_RETRIES", "3")),
+    deadline=float(os.environ.get("GEMINI_TIMEOUT", "20")),
+)
+gemini_breaker = resilience.CircuitBreaker(
+    failure_threshold=int(os.environ.get("GEMINI_BREAKER_THRESHOLD", "5")),
+    reset_timeout=float(os.environ.get("GEMINI_BREAKER_RESET", "30")),
+)
+
+# 指標：各階段耗時、token用量、結果與解析失敗，於/metrics以Prometheus格式輸出
+# variant標籤區分 sync(get_personalized_advice)、async 與 stream
+ADVICE_STAGE_SECONDS = metrics.Histogram(
+    "gemini_advice_stage_seconds", "Time spent per advice stage (build, network, first_chunk, parse)",
+    ("stage", "variant"))
+ADVICE_REQUESTS = metrics.Counter(
+    "gemini_advice_requests_total", "Gemini advice calls by outcome", ("variant", "outcome"))
+ADVICE_PARSE_FAILURES = metrics.Counter(
+    "gemini_advice_parse_failures_total", "Responses whose JSON could not be extracted", ("reason",))
+ADVICE_FALLBACKS = metrics.Counter(
+    "gemini_advice_fallbacks_total", "Fallback responses served instead of model output", ("kind",))
+ADVICE_TOKENS = metrics.Counter(
+    "gemini_advice_tokens_total", "Tokens reported by usage_metadata", ("kind",))
+ADVICE_PROMPT_TOKENS = metrics.Histogram(
+    "gemini_advice_prompt_tokens", "Prompt tokens per call", buckets=metrics.TOKEN_BUCKETS)
+ADVICE_OUTPUT_TOKENS = metrics.Histogram(
+    "gemini_advice_output_tokens", "Output (candidate) tokens per call", buckets=metrics.TOKEN_BUCKETS)
+ADVICE_FINISH_REASONS = metrics.Counter(
+    "gemini_advice_finish_reasons_total", "Finish reason of the first candidate", ("reason",))
+
+def _record_usage(response: Any) -> None:
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+        output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+        ADVICE_TOKENS.inc(prompt_tokens, kind="prompt")
+        ADVICE_TOKENS.inc(output_tokens, kind="output")
+        ADVICE_PROMPT_TOKENS.observe(prompt_tokens)
+        ADVICE_OUTPUT_TOKENS.observe(output_tokens)
+    try:
+        reason = response.candidates[0].finish_reason
+    except (AttributeError, IndexError, TypeError):
+        return
+    # MAX_TOKENS表示回應被max_output_tokens截斷
+    ADVICE_FINISH_REASONS.inc(reason=getattr(reason, "name", str(reason)))
+
+def _record_error(error: Exception, variant: str) -> None:
+    if isinstance(error, resilience.CircuitOpenError):
+        outcome = "circuit_open"
+    elif isinstance(error, TimeoutError):
+        outcome = "timeout"
+    else:
+        outcome = "error"
+    ADVICE_REQUESTS.inc(variant=variant, outcome=outcome)
+
+# 建議模式: local 只用本地規則引擎；llm 只用Gemini(錯誤時返回通用備用訊息)；
+# auto 使用Gemini，但在未設定API、斷路器開啟或回應無法解析時改用本地引擎
+ADVICE_MODES = ('auto', 'local', 'llm')
+ADVICE_MODE = os.environ.get("ADVICE_MODE", "auto")
+
+def resolve_advice_mode(mode: Optional[str] = None) -> str:
+    """返回實際使用的建議模式(未設定API時auto會降為local)，未知模式拋出ValueError"""
+    mode = mode or ADVICE_MODE
+    if mode not in ADVICE_MODES:
+        raise ValueError(f"未知的建議模式: {mode}")
+    if mode == 'auto' and not (GEMINI_API_KEY or os.environ.get("GEMINI_BACKEND") == "stub"):
+        return 'local'
+    return mode
+
+def _with_local_fallback(
+    mode: str,
+    result: Tuple[Dict[str, Any], bool],
+    cigarettes_per_day: float,
+    years_smoking: float,
+    health_percentage: float
+) -> Tuple[Dict[str, Any], bool]:
+    # auto模式下以本地建議取代備用回應；兩者都不會被快取
+    advice, ok = result
+    if not ok:
+        ADVICE_FALLBACKS.inc(kind="local" if mode == 'auto' else "generic")
+        if mode == 'auto':
+            advice = local_advice.generate_local_advice(cigarettes_per_day, years_smoking, health_percentage)
+    return advice, ok
+
+metrics.FunctionMetric(
+    "gemini_circuit_open", "1 while the Gemini circuit breaker rejects calls",
+    lambda: {(): int(gemini_breaker.state == "open")})
 
 # 設置生成參數
 generation_config = {
@@ -17,11 +147,165 @@ generation_config = {
     "max_output_tokens": 1024,
 }
 
+# 結構化輸出模式(預設開啟，設定GEMINI_STRUCTURED_OUTPUT=0改回文字提示詞加正規表示式擷取):
+# 固定的說明放在system instruction，每次請求只送出使用者的數字，
+# 並以JSON MIME類型與response schema要求模型直接輸出符合結構的JSON
+GEMINI_STRUCTURED_OUTPUT = os.environ.get("GEMINI_STRUCTURED_OUTPUT", "1") != "0"
+
+ADVICE_SYSTEM_INSTRUCTION = (
+    "你是醫學專家。根據使用者提供的吸煙數據與醫學文獻，以繁體中文回答:"
+    "health_risks為目前面臨的主要健康風險(3-5項)；"
+    "quit_strategies為3-5個基於證據、涵蓋心理與生理層面的戒煙策略；"
+    "recovery_timeline為戒煙後一週、一個月、三個月、六個月、一年、五年的身體恢復情況；"
+    "medical_stats為2-3項相關的關鍵醫學研究數據；motivation為一段鼓勵戒煙的激勵信息。"
+    "每項簡潔具體，避免重複。"
+)
+
+RECOVERY_PERIODS = ("一週後", "一個月後", "三個月後", "六個月後", "一年後", "五年後")
+
+_STRING_LIST_SCHEMA = {"type": "ARRAY", "items": {"type": "STRING"}}
+ADVICE_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "health_risks": _STRING_LIST_SCHEMA,
+        "quit_strategies": _STRING_LIST_SCHEMA,
+        "recovery_timeline": {
+            "type": "OBJECT",
+            "properties": {period: {"type": "STRING"} for period in RECOVERY_PERIODS},
+            "required": list(RECOVERY_PERIODS),
+        },
+        "medical_stats": _STRING_LIST_SCHEMA,
+        "motivation": {"type": "STRING"},
+    },
+    "required": ["health_risks", "quit_strategies", "recovery_timeline", "medical_stats", "motivation"],
+}
+
+structured_generation_config = dict(
+    generation_config,
+    # 結構固定且精簡，不需要1024個輸出token；出現MAX_TOKENS結束原因時再調高
+    max_output_tokens=int(os.environ.get("GEMINI_MAX_OUTPUT_TOKENS", "768")),
+    response_mime_type="application/json",
+    response_schema=ADVICE_RESPONSE_SCHEMA,
+)
+
+class AdviceResponse(TypedDict):
+    """Gemini建議的結構(與ADVICE_RESPONSE_SCHEMA對應)"""
+    health_risks: List[str]
+    quit_strategies: List[str]
+    recovery_timeline: Dict[str, str]
+    medical_stats: List[str]
+    motivation: str
+
+def validate_advice(data: Any) -> AdviceResponse:
+    """
+    驗證並轉換為AdviceResponse，忽略多餘欄位
+    
+    返回:
+    AdviceResponse；結構不符時拋出ValueError
+    """
+    if not isinstance(data, dict):
+        raise ValueError("建議必須是JSON物件")
+    for field in ("health_risks", "quit_strategies", "medical_stats"):
+        value = data.get(field)
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            raise ValueError(f"{field} 必須是字串陣列")
+    timeline = data.get("recovery_timeline")
+    if not isinstance(timeline, dict) or not all(isinstance(v, str) for v in timeline.values()):
+        raise ValueError("recovery_timeline 必須是字串對應表")
+    if not isinstance(data.get("motivation"), str):
+        raise ValueError("motivation 必須是字串")
+    return AdviceResponse(
+        health_risks=data["health_risks"],
+        quit_strategies=data["quit_strategies"],
+        recovery_timeline=timeline,
+        medical_stats=data["medical_stats"],
+        motivation=data["motivation"],
+    )
+
+# 快取鍵的分組粒度：輸入值會先四捨五入到這些間隔，讓相近的使用者資料共用同一份建議
+# 設定pack_years後，改以四捨五入的包年數取代每日支數與年數作為鍵
+ADVICE_CACHE_BUCKETS = {
+    "cigarettes_per_day": 1.0,
+    "years_smoking": 1.0,
+    "health_percentage": 5.0,
+    "pack_years": None,
+}
+
+# 建議快取：記憶體LRU，設定GEMINI_CACHE_DB時另外持久化到SQLite
+advice_cache = AdviceCache(
+    maxsize=int(os.environ.get("GEMINI_CACHE_SIZE", "256")),
+    ttl=float(os.environ.get("GEMINI_CACHE_TTL", "86400")),
+    stale_ttl=float(os.environ.get("GEMINI_CACHE_STALE_TTL", "3600")),
+    db_path=os.environ.get("GEMINI_CACHE_DB"),
+)
+
+# 相同(分組後)輸入的並行請求共用一次Gemini呼叫；設定GEMINI_SINGLEFLIGHT_DIR時
+# 另以檔案鎖跨gunicorn工作者合併(需搭配GEMINI_CACHE_DB共享結果)
+advice_flight = SingleFlight(lock_dir=os.environ.get("GEMINI_SINGLEFLIGHT_DIR"))
+
+metrics.FunctionMetric(
+    "gemini_advice_cache_requests_total", "Advice cache lookups by result",
+    lambda: {(result,): advice_cache.stats()[field]
+             for result, field in (("hit", "hits"), ("stale", "stale_hits"), ("miss", "misses"))},
+    labelnames=("result",), metric_type="counter")
+metrics.FunctionMetric(
+    "gemini_advice_cache_entries", "Entries in the in-memory advice cache",
+    lambda: {(): advice_cache.stats()["size"]})
+metrics.FunctionMetric(
+    "gemini_advice_coalesced_total", "Requests that shared another caller's in-flight Gemini call",
+    lambda: {(): advice_flight.shared}, metric_type="counter")
+
+def _stored_advice(key: str) -> Optional[Tuple[Dict[str, Any], bool]]:
+    # 其他工作者持鎖期間已寫入共享快取的結果；標記為不可快取以免重設其時間戳記
+    value, state = advice_cache.get(key)
+    return (value, False) if state == "fresh" else None
+
+def _store_advice(key: str, result: Tuple[Dict[str, Any], bool]) -> None:
+    advice, cacheable = result
+    if cacheable:
+        advice_cache.set(key, advice)
+
+def _bucket(value: float, step: Optional[float]) -> float:
+    if not step:
+        return float(value)
+    return round(round(value / step) * step, 6)
+
+def make_advice_cache_key(
+    cigarettes_per_day: float,
+    years_smoking: float,
+    health_percentage: float,
+    buckets: Optional[Dict[str, Optional[float]]] = None
+) -> str:
+    """
+    依分組後的輸入建立快取鍵
+    
+    參數:
+    cigarettes_per_day, years_smoking, health_percentage: 與get_personalized_advice相同
+    buckets: 分組粒度，預設使用ADVICE_CACHE_BUCKETS
+    
+    返回:
+    快取鍵字串
+    """
+    buckets = ADVICE_CACHE_BUCKETS if buckets is None else buckets
+    if buckets.get("pack_years"):
+        normalized = {"pack_years": _bucket((cigarettes_per_day / 20) * years_smoking, buckets["pack_years"])}
+    else:
+        normalized = {
+            "cigarettes_per_day": _bucket(cigarettes_per_day, buckets.get("cigarettes_per_day")),
+            "years_smoking": _bucket(years_smoking, buckets.get("years_smoking")),
+        }
+    # additional_info不會送入提示詞、不影響輸出，因此不納入鍵中；
+    # 否則每個不同的值都會繞過快取與請求合併，並各自留下一個檔案鎖
+    normalized["health_percentage"] = _bucket(health_percentage, buckets.get("health_percentage"))
+    return json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+
 def get_personalized_advice(
     cigarettes_per_day: float,
     years_smoking: float,
     health_percentage: float,
-    additional_info: Optional[Dict[str, Any]] = None
+    additional_info: Optional[Dict[str, Any]] = None,
+    use_cache: bool = True,
+    mode: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     使用Gemini AI獲取個性化戒煙建議和健康分析
@@ -30,17 +314,82 @@ def get_personalized_advice(
     cigarettes_per_day: 每天吸煙數量
     years_smoking: 吸煙年數
     health_percentage: 當前肺部健康度百分比
-    additional_info: 其他用戶信息(可選)
+    additional_info: 其他用戶信息(可選，目前不影響建議內容)
+    use_cache: 是否使用建議快取(錯誤時的備用回應不會被快取)
+    mode: 建議模式(auto、local、llm)，預設為ADVICE_MODE
     
     返回:
     包含AI生成的建議和分析的字典
     """
+    mode = resolve_advice_mode(mode)
+    if mode == 'local':
+        return local_advice.generate_local_advice(cigarettes_per_day, years_smoking, health_percentage)
+
+    key = make_advice_cache_key(cigarettes_per_day, years_smoking, health_percentage)
+
+    def generate() -> Tuple[Dict[str, Any], bool]:
+        return _with_local_fallback(
+            mode, _generate_advice(cigarettes_per_day, years_smoking, health_percentage),
+            cigarettes_per_day, years_smoking, health_percentage)
+
+    def compute() -> Tuple[Dict[str, Any], bool]:
+        if not use_cache:
+            return advice_flight.do(f"{mode}:{key}", generate)[0]
+        # 在持有跨工作者的鎖時寫入共享快取，等待中的工作者取得鎖後便能讀到；
+        # 已寫入的結果標記為不可快取，避免get_or_compute再寫一次
+        advice, _ = advice_flight.do(f"{mode}:{key}", generate, lambda: _stored_advice(key),
+                                     lambda result: _store_advice(key, result))[0]
+        return advice, False
+
+    # 回傳副本，避免呼叫端修改到快取中或與其他請求共用的內容
+    if not use_cache:
+        return copy.deepcopy(compute()[0])
+    return copy.deepcopy(advice_cache.get_or_compute(key, compute))
+
+async def get_personalized_advice_async(
+    cigarettes_per_day: float,
+    years_smoking: float,
+    health_percentage: float,
+    additional_info: Optional[Dict[str, Any]] = None,
+    use_cache: bool = True,
+    mode: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    get_personalized_advice的非阻塞版本，使用SDK的generate_content_async
+    
+    參數與返回值同get_personalized_advice
+    """
+    mode = resolve_advice_mode(mode)
+    if mode == 'local':
+        return local_advice.generate_local_advice(cigarettes_per_day, years_smoking, health_percentage)
+
+    key = make_advice_cache_key(cigarettes_per_day, years_smoking, health_percentage)
+
+    async def generate() -> Tuple[Dict[str, Any], bool]:
+        return _with_local_fallback(
+            mode, await _generate_advice_async(cigarettes_per_day, years_smoking, health_percentage),
+            cigarettes_per_day, years_smoking, health_percentage)
+
+    async def compute() -> Tuple[Dict[str, Any], bool]:
+        return (await advice_flight.do_async(f"{mode}:{key}", generate))[0]
+
+    if not use_cache:
+        return copy.deepcopy((await compute())[0])
+    return copy.deepcopy(await advice_cache.aget_or_compute(key, compute))
+
+def _build_prompt(cigarettes_per_day: float, years_smoking: float, health_percentage: float) -> str:
     # 計算吸煙相關統計數據
-    pack_years = (cigarettes_per_day / 20) * years_smoking
-    total_cigarettes = int(cigarettes_per_day * 365 * years_smoking)
+    stats = local_advice.smoking_stats(cigarettes_per_day, years_smoking)
+    pack_years = stats["pack_years"]
+    total_cigarettes = stats["total_cigarettes"]
+    
+    if GEMINI_STRUCTURED_OUTPUT:
+        # 說明與輸出格式已在system instruction與response schema中，只送出數字
+        return (f"每天{cigarettes_per_day:g}支，吸煙{years_smoking:g}年，共{total_cigarettes}支，"
+                f"{pack_years:.1f}包年，肺部健康度{health_percentage:.1f}%")
     
     # 構建提示詞
-    prompt = f"""
+    return f"""
     作為一名醫學專家，請分析以下吸煙者的數據並提供專業的健康建議。請提供詳細的分析、具體的戒煙建議和科學的健康恢復預測。
     
     吸煙者數據:
@@ -58,48 +407,272 @@ def get_personalized_advice(
     5. 激勵信息: 提供一段激勵性信息，鼓勵戒煙
     
     請確保回答格式為json，包含以下關鍵:
-    {
+    {{
       "health_risks": ["風險1", "風險2", "風險3"],
       "quit_strategies": ["策略1", "策略2", "策略3"],
-      "recovery_timeline": {"一週後": "描述", "一個月後": "描述"},
+      "recovery_timeline": {{"一週後": "描述", "一個月後": "描述"}},
       "medical_stats": ["統計1", "統計2"],
       "motivation": "激勵信息"
+    }}
+    """
+
+def _parse_advice(advice_text: str) -> Tuple[Dict[str, Any], bool]:
+    """
+    從模型回應中解析建議
+    
+    返回:
+    (建議字典, 是否成功解析並通過validate_advice)
+    """
+    if GEMINI_STRUCTURED_OUTPUT:
+        # 回應本身就是符合schema的JSON，不需以正規表示式擷取
+        try:
+            return dict(validate_advice(json.loads(advice_text))), True
+        except ValueError as e:
+            ADVICE_PARSE_FAILURES.inc(reason="schema")
+            print(f"Gemini回應不符合結構: {e}")
+            return _fallback_advice(), False
+    # 提取JSON部分(去除可能的標記和前導/尾隨文本)
+    json_match = re.search(r'({[\s\S]*})', advice_text)
+    if json_match:
+        try:
+            data = json.loads(json_match.group(1))
+        except ValueError as e:
+            ADVICE_PARSE_FAILURES.inc(reason="invalid_json")
+            print(f"解析Gemini回應時出錯: {e}")
+            return _fallback_advice(), False
+        # 任意JSON物件(例如{"error": "quota"})都不能當作建議返回或快取
+        try:
+            return dict(validate_advice(data)), True
+        except ValueError as e:
+            ADVICE_PARSE_FAILURES.inc(reason="schema")
+            print(f"Gemini回應不符合結構: {e}")
+            return _fallback_advice(), False
+    # 如果無法解析為JSON，返回文本作為建議
+    ADVICE_PARSE_FAILURES.inc(reason="no_json")
+    return {
+        "health_risks": ["基於您的吸煙數據分析..."],
+        "quit_strategies": ["根據醫學建議..."],
+        "recovery_timeline": {"提示": "無法生成詳細時間表"},
+        "medical_stats": ["統計數據暫時無法生成"],
+        "motivation": advice_text
+    }, False
+
+def _fallback_advice() -> Dict[str, Any]:
+    # 發生錯誤時返回的備用訊息
+    return {
+        "health_risks": ["暫時無法分析健康風險，請稍後再試"],
+        "quit_strategies": ["暫時無法提供戒煙策略"],
+        "recovery_timeline": {"提示": "無法生成恢復時間表"},
+        "medical_stats": ["無法獲取醫學統計數據"],
+        "motivation": "目前無法連接到AI服務，但請記住，戒煙永遠不會太晚，每一天不吸煙都是對健康的投資。"
     }
+
+def _generate_advice(
+    cigarettes_per_day: float,
+    years_smoking: float,
+    health_percentage: float
+) -> Tuple[Dict[str, Any], bool]:
     """
+    呼叫Gemini產生建議
     
+    返回:
+    (建議字典, 是否可快取)；無法解析或發生錯誤時的備用回應不可快取
+    """
+    with ADVICE_STAGE_SECONDS.time(stage="build", variant="sync"):
+        prompt = _build_prompt(cigarettes_per_day, years_smoking, health_percentage)
     try:
-        # 調用Gemini API生成回應
-        response = model.generate_content(prompt)
-        advice_text = response.text
-        
-        # 嘗試解析JSON回應
-        import json
-        import re
-        
-        # 提取JSON部分(去除可能的標記和前導/尾隨文本)
-        json_match = re.search(r'({[\s\S]*})', advice_text)
-        if json_match:
-            advice_json = json.loads(json_match.group(1))
-            return advice_json
-        else:
-            # 如果無法解析為JSON，返回文本作為建議
-            return {
-                "health_risks": ["基於您的吸煙數據分析..."],
-                "quit_strategies": ["根據醫學建議..."],
-                "recovery_timeline": {"提示": "無法生成詳細時間表"},
-                "medical_stats": ["統計數據暫時無法生成"],
-                "motivation": advice_text
-            }
+        # 調用Gemini API生成回應(每次嘗試以剩餘預算作為請求逾時)
+        with ADVICE_STAGE_SECONDS.time(stage="network", variant="sync"):
+            response = resilience.call_with_resilience(
+                lambda timeout: _get_model().generate_content(prompt, request_options={"timeout": timeout}),
+                gemini_breaker, gemini_retry)
+        return _handle_response(response, "sync")
     except Exception as e:
-        # 發生錯誤時返回備用訊息
+        _record_error(e, "sync")
         print(f"獲取Gemini建議時出錯: {e}")
-        return {
-            "health_risks": ["暫時無法分析健康風險，請稍後再試"],
-            "quit_strategies": ["暫時無法提供戒煙策略"],
-            "recovery_timeline": {"提示": "無法生成恢復時間表"},
-            "medical_stats": ["無法獲取醫學統計數據"],
-            "motivation": "目前無法連接到AI服務，但請記住，戒煙永遠不會太晚，每一天不吸煙都是對健康的投資。"
-        }
+        return _fallback_advice(), False
+
+def _handle_response(response: Any, variant: str) -> Tuple[Dict[str, Any], bool]:
+    # 記錄用量並解析完整(非串流)回應
+    _record_usage(response)
+    with ADVICE_STAGE_SECONDS.time(stage="parse", variant=variant):
+        advice, ok = _parse_advice(response.text)
+    ADVICE_REQUESTS.inc(variant=variant, outcome="ok" if ok else "parse_failure")
+    return advice, ok
+
+async def _generate_advice_async(
+    cigarettes_per_day: float,
+    years_smoking: float,
+    health_percentage: float
+) -> Tuple[Dict[str, Any], bool]:
+    """_generate_advice的非阻塞版本"""
+    with ADVICE_STAGE_SECONDS.time(stage="build", variant="async"):
+        prompt = _build_prompt(cigarettes_per_day, years_smoking, health_percentage)
+    try:
+        with ADVICE_STAGE_SECONDS.time(stage="network", variant="async"):
+            response = await resilience.call_with_resilience_async(
+                lambda timeout: _get_model().generate_content_async(prompt, request_options={"timeout": timeout}),
+                gemini_breaker, gemini_retry)
+        return _handle_response(response, "async")
+    except Exception as e:
+        _record_error(e, "async")
+        print(f"獲取Gemini建議時出錯: {e}")
+        return _fallback_advice(), False
+
+class AdviceSectionParser:
+    """
+    增量JSON解析器：逐段餵入串流文字，每當頂層物件的一個欄位完整時立即返回
+    
+    只追蹤字串、跳脫字元與括號深度，不需等待整個回應即可解析各欄位；
+    頂層物件之前的文字(例如```json標記)會被忽略
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.sections: Dict[str, Any] = {}
+        self.complete = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = 0
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        餵入一段文字
+        
+        返回:
+        本次新完成的 (欄位名稱, 內容) 列表
+        """
+        self.text += chunk
+        found = []
+        while self._pos < len(self.text) and not self.complete:
+            ch = self.text[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif self._depth == 0:
+                if ch == '{':
+                    self._depth = 1
+                    self._member_start = self._pos + 1
+            elif ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    found += self._finish_member()
+                    self.complete = True
+            elif ch == ',' and self._depth == 1:
+                found += self._finish_member()
+                self._member_start = self._pos + 1
+            self._pos += 1
+        return found
+
+    def _finish_member(self) -> List[Tuple[str, Any]]:
+        member = self.text[self._member_start:self._pos].strip()
+        if not member:
+            return []
+        try:
+            items = list(json.loads("{" + member + "}").items())
+        except ValueError:
+            return []
+        self.sections.update(items)
+        return items
+
+def _streamed_advice(parser: AdviceSectionParser) -> Tuple[Dict[str, Any], bool]:
+    """
+    取得串流結束後的完整建議
+    
+    返回:
+    (建議字典, 是否可快取)；只有通過validate_advice的建議可快取
+    """
+    if parser.complete:
+        try:
+            return dict(validate_advice(parser.sections)), True
+        except ValueError as e:
+            # 頂層物件前的文字含有大括號，或有欄位無法解析時，sections不完整
+            ADVICE_PARSE_FAILURES.inc(reason="schema")
+            print(f"Gemini回應不符合結構: {e}")
+            if GEMINI_STRUCTURED_OUTPUT:
+                return _fallback_advice(), False
+    return _parse_advice(parser.text)
+
+def stream_personalized_advice(
+    cigarettes_per_day: float,
+    years_smoking: float,
+    health_percentage: float,
+    additional_info: Optional[Dict[str, Any]] = None,
+    use_cache: bool = True,
+    mode: Optional[str] = None
+) -> Iterator[Tuple[str, Any]]:
+    """
+    以串流方式獲取個性化建議，每個欄位(health_risks、quit_strategies等)一完成就產生
+    
+    參數與get_personalized_advice相同
+    
+    返回:
+    依序產生 (欄位名稱, 內容)，最後產生 ("done", 完整建議字典)
+    """
+    mode = resolve_advice_mode(mode)
+    if mode == 'local':
+        advice = local_advice.generate_local_advice(cigarettes_per_day, years_smoking, health_percentage)
+        yield from advice.items()
+        yield "done", advice
+        return
+
+    key = make_advice_cache_key(cigarettes_per_day, years_smoking, health_percentage)
+    if use_cache:
+        cached, state = advice_cache.get(key)
+        if state == "fresh":
+            advice = copy.deepcopy(cached)
+            yield from advice.items()
+            yield "done", advice
+            return
+
+    parser = AdviceSectionParser()
+    with ADVICE_STAGE_SECONDS.time(stage="build", variant="stream"):
+        prompt = _build_prompt(cigarettes_per_day, years_smoking, health_percentage)
+    try:
+        # 重試只涵蓋建立串流；開始產生內容後的錯誤直接改用備用回應
+        started = time.perf_counter()
+        response = resilience.call_with_resilience(
+            lambda timeout: _get_model().generate_content(prompt, stream=True, request_options={"timeout": timeout}),
+            gemini_breaker, gemini_retry)
+        chunk = None
+        try:
+            for chunk in response:
+                if not parser.text:
+                    ADVICE_STAGE_SECONDS.observe(time.perf_counter() - started, stage="first_chunk", variant="stream")
+                yield from parser.feed(chunk.text)
+        except Exception:
+            gemini_breaker.record_failure()
+            raise
+        ADVICE_STAGE_SECONDS.observe(time.perf_counter() - started, stage="network", variant="stream")
+        # 用量統計附在最後一個區塊
+        if chunk is not None:
+            _record_usage(chunk)
+        advice, cacheable = _streamed_advice(parser)
+        ADVICE_REQUESTS.inc(variant="stream", outcome="ok" if cacheable else "parse_failure")
+    except Exception as e:
+        _record_error(e, "stream")
+        print(f"串流Gemini建議時出錯: {e}")
+        advice, cacheable = _fallback_advice(), False
+    advice, cacheable = _with_local_fallback(
+        mode, (advice, cacheable), cigarettes_per_day, years_smoking, health_percentage)
+
+    # 補上串流中未能產生的欄位(例如備用回應)
+    for name, value in advice.items():
+        if name not in parser.sections:
+            yield name, value
+    if use_cache and cacheable:
+        advice_cache.set(key, advice)
+    yield "done", copy.deepcopy(advice)
 
 def get_quitting_resources() -> Dict[str, List[str]]:
     """
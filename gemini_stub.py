@@ -0,0 +1,99 @@
+"""
+本地Gemini替身：不連網、不需API密鑰，用於開發與測試韌性機制
+
+設定 GEMINI_BACKEND=stub 後，gemini_assistant會改用StubModel。行為由環境變數控制:
+    GEMINI_STUB_MODE     ok(預設)、fail(一律拋出暫時性錯誤)、flaky(依GEMINI_STUB_FAILURE_RATE隨機失敗)、
+                         hang(睡眠到逾時為止)、garbage(返回非JSON文字)
+    GEMINI_STUB_LATENCY  每次回應前的延遲秒數(預設0)
+    GEMINI_STUB_FAILURE_RATE  flaky模式的失敗機率(預設0.5)
+"""
+import asyncio
+import json
+import os
+import random
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, Optional
+
+STUB_ADVICE = {
+    "health_risks": ["慢性阻塞性肺病(COPD)風險上升", "心血管疾病風險上升", "肺癌風險上升"],
+    "quit_strategies": ["設定明確的戒煙日期", "使用尼古丁替代療法", "避開會引發吸煙慾望的情境"],
+    "recovery_timeline": {
+        "一週後": "血液中一氧化碳濃度恢復正常",
+        "一個月後": "咳嗽與呼吸急促減少",
+        "一年後": "冠心病風險降為吸煙者的一半",
+    },
+    "medical_stats": ["戒煙10年後肺癌死亡風險約降低一半"],
+    "motivation": "每一天不吸煙，肺部都在修復。",
+}
+
+
+class StubServiceUnavailable(Exception):
+    """模擬google.api_core的ServiceUnavailable"""
+
+
+# 讓resilience.is_transient以名稱辨識為暫時性錯誤
+StubServiceUnavailable.__name__ = "ServiceUnavailable"
+
+
+class StubResponse:
+    def __init__(self, text: str, usage_metadata: Optional[SimpleNamespace] = None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+def _stub_usage(prompt: str, text: str) -> SimpleNamespace:
+    # 粗略估計：中文約每字一個token
+    prompt_tokens, output_tokens = len(prompt), len(text)
+    return SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=output_tokens,
+                           total_token_count=prompt_tokens + output_tokens)
+
+
+class StubModel:
+    """與GenerativeModel介面相容的替身(generate_content / generate_content_async)"""
+
+    def __init__(self, mode: Optional[str] = None, latency: Optional[float] = None,
+                 failure_rate: Optional[float] = None):
+        self.mode = mode or os.environ.get("GEMINI_STUB_MODE", "ok")
+        self.latency = float(os.environ.get("GEMINI_STUB_LATENCY", "0") if latency is None else latency)
+        self.failure_rate = float(os.environ.get("GEMINI_STUB_FAILURE_RATE", "0.5")
+                                  if failure_rate is None else failure_rate)
+        self.calls = 0
+
+    def _delay(self, request_options: Optional[Dict[str, Any]]) -> float:
+        timeout = (request_options or {}).get("timeout")
+        if self.mode == "hang":
+            return timeout if timeout is not None else 3600
+        return self.latency if timeout is None else min(self.latency, timeout)
+
+    def _outcome(self, request_options: Optional[Dict[str, Any]]) -> str:
+        self.calls += 1
+        timeout = (request_options or {}).get("timeout")
+        if self.mode == "hang" or (timeout is not None and self.latency > timeout):
+            raise TimeoutError("stub請求逾時")
+        if self.mode == "fail" or (self.mode == "flaky" and random.random() < self.failure_rate):
+            raise StubServiceUnavailable("stub上游暫時不可用")
+        if self.mode == "garbage":
+            return "抱歉，我現在無法提供建議。"
+        return json.dumps(STUB_ADVICE, ensure_ascii=False, indent=2)
+
+    def generate_content(self, prompt: str, stream: bool = False,
+                         request_options: Optional[Dict[str, Any]] = None, **kwargs: Any):
+        time.sleep(self._delay(request_options))
+        text = self._outcome(request_options)
+        if stream:
+            return self._chunks(text, _stub_usage(prompt, text))
+        return StubResponse(text, _stub_usage(prompt, text))
+
+    async def generate_content_async(self, prompt: str, request_options: Optional[Dict[str, Any]] = None,
+                                     **kwargs: Any) -> StubResponse:
+        await asyncio.sleep(self._delay(request_options))
+        text = self._outcome(request_options)
+        return StubResponse(text, _stub_usage(prompt, text))
+
+    @staticmethod
+    def _chunks(text: str, usage: SimpleNamespace, size: int = 24) -> Iterator[StubResponse]:
+        # 與SDK相同，用量統計只附在最後一個區塊
+        starts = range(0, len(text), size)
+        for start in starts:
+            yield StubResponse(text[start:start + size], usage if start == starts[-1] else None)
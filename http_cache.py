@@ -0,0 +1,148 @@
+"""
+HTTP條件式請求：以模板與資料文件的版本計算ETag/Last-Modified，回應304並加上Cache-Control
+
+頁面的輸出只由路由、查詢參數、模板與專案資料決定，因此在渲染之前就能算出ETag，
+客戶端的If-None-Match/If-Modified-Since符合時直接回應304，不必重新渲染。
+需要驗證參數的視圖應先完成驗證(錯誤時照常返回404/400)，再呼叫conditional_response。
+"""
+import functools
+import hashlib
+import os
+from datetime import datetime, timezone
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+from flask import Response, current_app, make_response, request
+from werkzeug.http import is_resource_modified
+
+import lung_svg_generator
+import metrics
+import utils
+
+# 頁面每次都向伺服器驗證(通常得到304)；肺部圖像內容只隨渲染程式改變，可快取較久
+PAGE_CACHE_CONTROL = os.environ.get("HTTP_CACHE_CONTROL", "no-cache")
+IMAGE_CACHE_CONTROL = os.environ.get("LUNG_CACHE_CONTROL", "public, max-age=86400")
+
+# 程式碼改變但模板與資料未變時，部署時設定新的APP_VERSION即可讓既有的ETag失效
+APP_VERSION = os.environ.get("APP_VERSION", "")
+
+NOT_MODIFIED = metrics.Counter(
+    "http_not_modified_total", "Conditional requests answered with 304 Not Modified", ("endpoint",))
+
+
+def _signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def template_paths(*names: str) -> List[str]:
+    """返回模板在目前Flask應用程式模板目錄中的路徑"""
+    folder = os.path.join(current_app.root_path, current_app.template_folder or "")
+    return [os.path.join(folder, name) for name in names]
+
+
+def project_data_paths() -> List[str]:
+    """返回目前使用的專案資料文件(data.jsonl或data.txt)"""
+    return [utils.PROJECT_LINES_PATH if utils.has_project_lines() else utils.DATA_PATH]
+
+
+def version_stamp(paths: Iterable[str]) -> Tuple[str, Optional[datetime]]:
+    """
+    以文件的mtime與大小計算版本戳記
+
+    參數:
+    paths: 決定輸出內容的文件
+
+    返回:
+    (版本戳記字串, 最新的修改時間)；文件不存在時以None參與計算，修改時間為None
+    """
+    digest = hashlib.sha1()
+    latest = None
+    for path in paths:
+        signature = _signature(path)
+        digest.update(f"{path}:{signature};".encode("utf-8"))
+        if signature is not None:
+            latest = max(latest or 0, signature[0])
+    if latest is None:
+        return digest.hexdigest(), None
+    return digest.hexdigest(), datetime.fromtimestamp(latest / 1e9, timezone.utc)
+
+
+def conditional_response(sources: Iterable[str], render: Callable[[], Any],
+                         cache_control: str = PAGE_CACHE_CONTROL) -> Response:
+    """
+    以強ETag、Last-Modified與Cache-Control回應目前的(已驗證的)請求，驗證符合時不呼叫render直接回應304
+
+    參數:
+    sources: 決定輸出內容的文件路徑
+    render: 產生回應的函數
+    cache_control: Cache-Control標頭
+
+    ETag由路由、查詢參數與sources的版本戳記組成，文件改變後自動失效；render返回非200時不加上驗證標頭
+    """
+    stamp, last_modified = version_stamp(sources)
+    etag = hashlib.sha1(f"{APP_VERSION}|{request.full_path}|{stamp}".encode("utf-8")).hexdigest()
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        NOT_MODIFIED.inc(endpoint=request.endpoint)
+        response = make_response("", 304)
+    else:
+        response = make_response(render())
+        if response.status_code != 200:
+            return response
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+def conditional(sources: Callable[[], Iterable[str]], cache_control: str = PAGE_CACHE_CONTROL):
+    """
+    conditional_response的裝飾器版本，只用於不需要驗證參數的視圖
+
+    參數:
+    sources: 返回決定輸出內容之文件路徑的函數(在請求中呼叫)
+    cache_control: Cache-Control標頭
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            return conditional_response(sources(), lambda: view(*args, **kwargs), cache_control)
+        return wrapper
+    return decorator
+
+
+def page_sources(*templates: str, data: bool = False) -> Callable[[], List[str]]:
+    """
+    返回頁面輸出所取決的文件路徑函數
+
+    參數:
+    templates: 視圖渲染的模板
+    data: 輸出是否取決於專案資料
+    """
+    def sources():
+        return template_paths(*templates) + (project_data_paths() if data else [])
+    return sources
+
+
+def page(*templates: str, data: bool = False, cache_control: str = PAGE_CACHE_CONTROL):
+    """
+    頁面路由的條件式請求
+
+    參數:
+    templates: 視圖渲染的模板
+    data: 輸出是否取決於專案資料
+    """
+    return conditional(page_sources(*templates, data=data), cache_control)
+
+
+def image_response(render: Callable[[], Any], cache_control: str = IMAGE_CACHE_CONTROL) -> Response:
+    """
+    肺部圖像的條件式回應，版本取決於渲染程式本身
+
+    參數:
+    render: 產生圖像回應的函數(呼叫前須已驗證健康度與畫質)
+    """
+    return conditional_response([lung_svg_generator.__file__], render, cache_control)
@@ -0,0 +1,123 @@
+"""
+本地建議引擎：以規則與模板從吸煙數據直接產生與Gemini相同結構的建議
+
+不需網路、在微秒內完成，可作為即時的初步結果、離線模式或預設層級，
+Gemini只用於選擇性的補充。
+"""
+from typing import Any, Dict, List, Tuple
+
+# (包年下限, 風險列表)，由高到低比對
+PACK_YEAR_RISKS: Tuple[Tuple[float, List[str]], ...] = (
+    (40, ["肺癌風險顯著上升(約為非吸煙者的20倍以上)", "慢性阻塞性肺病(COPD)與肺氣腫風險很高",
+          "冠狀動脈心臟病與中風風險很高", "口腔、喉部、食道與膀胱癌風險上升"]),
+    (20, ["肺癌風險明顯上升，已達低劑量電腦斷層篩檢建議門檻", "慢性阻塞性肺病(COPD)風險上升",
+          "冠狀動脈心臟病與中風風險上升"]),
+    (10, ["慢性支氣管炎與持續性咳嗽風險上升", "肺癌與心血管疾病風險逐年累積",
+          "呼吸道感染更頻繁且恢復較慢"]),
+    (0, ["呼吸道發炎與咳嗽", "運動耐力下降", "尼古丁依賴持續加深，越晚戒越困難"]),
+)
+
+# (健康度下限, 針對目前肺部狀況的風險)，由高到低比對
+HEALTH_RISKS: Tuple[Tuple[float, str], ...] = (
+    (80, "目前肺功能大致保留，這是戒煙效果最好的時機"),
+    (50, "肺部已出現可察覺的損傷，可能伴隨活動時呼吸急促"),
+    (20, "肺部損傷明顯，建議盡快接受肺功能檢查"),
+    (0, "肺部損傷嚴重，請盡快就醫評估呼吸功能與相關疾病"),
+)
+
+# (每日支數下限, 策略列表)，由高到低比對
+QUIT_STRATEGIES: Tuple[Tuple[float, List[str]], ...] = (
+    (20, ["諮詢醫師使用合併型尼古丁替代療法(貼片加口香糖或含錠)以緩解重度依賴的戒斷症狀",
+          "評估處方藥物(如Varenicline)，可顯著提高戒煙成功率",
+          "參加門診戒煙治療或撥打戒煙專線 0800-636363 取得持續追蹤"]),
+    (10, ["使用尼古丁貼片或口香糖降低戒斷症狀",
+          "撥打戒煙專線 0800-636363 取得免費諮詢",
+          "記錄每次想吸煙的時間與情境，預先規劃替代行為"]),
+    (0, ["選定戒煙日並告知親友，爭取支持",
+         "移除香煙、打火機與煙灰缸，避開吸煙情境",
+         "用深呼吸、喝水或短暫散步度過幾分鐘的煙癮高峰"]),
+)
+
+COMMON_STRATEGIES = ["規律運動以減輕壓力與體重增加", "若復吸不要放棄，多數人需嘗試數次才成功"]
+
+# 戒煙後的一般恢復時間表(依公共衛生機構整理的常見描述)
+RECOVERY_TIMELINE = {
+    "一週後": "血液中一氧化碳濃度恢復正常，味覺與嗅覺開始改善",
+    "一個月後": "咳嗽與呼吸急促減少，肺部纖毛功能開始恢復",
+    "三個月後": "血液循環改善，肺功能可提升約一成",
+    "六個月後": "呼吸道感染減少，體力與運動耐力明顯提升",
+    "一年後": "冠狀動脈心臟病風險降為吸煙者的一半",
+    "五年後": "中風風險接近非吸煙者，口腔與喉部癌症風險減半",
+}
+
+MEDICAL_STATS = [
+    "吸煙者罹患肺癌的風險約為非吸煙者的15至30倍",
+    "戒煙10年後，肺癌死亡風險約降為持續吸煙者的一半",
+]
+
+SCREENING_STAT = "美國預防服務工作小組(USPSTF)建議50至80歲、累積20包年以上的吸煙者每年接受低劑量電腦斷層篩檢"
+
+
+def smoking_stats(cigarettes_per_day: float, years_smoking: float) -> Dict[str, float]:
+    """
+    計算吸煙相關統計數據
+
+    返回:
+    包含pack_years(包年)與total_cigarettes(總支數)的字典
+    """
+    return {
+        "pack_years": (cigarettes_per_day / 20) * years_smoking,
+        "total_cigarettes": int(cigarettes_per_day * 365 * years_smoking),
+    }
+
+
+def _match(table, value):
+    for lower_bound, item in table:
+        if value >= lower_bound:
+            return item
+    return table[-1][1]
+
+
+def generate_local_advice(
+    cigarettes_per_day: float,
+    years_smoking: float,
+    health_percentage: float
+) -> Dict[str, Any]:
+    """
+    以規則產生個性化戒煙建議
+
+    參數:
+    cigarettes_per_day: 每天吸煙數量
+    years_smoking: 吸煙年數
+    health_percentage: 當前肺部健康度百分比
+
+    返回:
+    與get_personalized_advice相同結構的字典
+    """
+    stats = smoking_stats(cigarettes_per_day, years_smoking)
+    pack_years = stats["pack_years"]
+    total_cigarettes = stats["total_cigarettes"]
+
+    health_risks = list(_match(PACK_YEAR_RISKS, pack_years))
+    health_risks.append(_match(HEALTH_RISKS, health_percentage))
+
+    medical_stats = [f"您累積的吸煙量約為 {pack_years:.1f} 包年，共約 {total_cigarettes:,} 支香煙"]
+    medical_stats += MEDICAL_STATS
+    if pack_years >= 20:
+        medical_stats.append(SCREENING_STAT)
+
+    if health_percentage >= 80:
+        motivation = "您的肺部仍保有大部分功能，現在戒煙，幾年內就能把大部分風險降回接近非吸煙者的水準。"
+    elif health_percentage >= 40:
+        motivation = (f"已經吸了約 {total_cigarettes:,} 支煙，但今天停下來，肺部從明天就開始修復。"
+                      "每一天不吸煙都是對健康的投資。")
+    else:
+        motivation = "肺部的損傷雖然明顯，但戒煙在任何年齡、任何階段都能減緩惡化並延長壽命，永遠不會太晚。"
+
+    return {
+        "health_risks": health_risks,
+        "quit_strategies": _match(QUIT_STRATEGIES, cigarettes_per_day) + COMMON_STRATEGIES,
+        "recovery_timeline": dict(RECOVERY_TIMELINE),
+        "medical_stats": medical_stats,
+        "motivation": motivation,
+    }
@@ -1,14 +1,223 @@
-import matplotlib.pyplot as plt
-import numpy as np
+import importlib
 import io
+import os
 import base64
-import math
-from matplotlib.patches import Ellipse, Circle, PathPatch, FancyBboxPatch
-import matplotlib.path as mpath
-import matplotlib.transforms as mtransforms
-import matplotlib.collections as mcollections
-import random
-from matplotlib.colors import LinearSegmentedColormap
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class _LazyModule:
+    """
+    Stand-in for a heavy module that is only imported on first attribute access.
+
+    Importing this module (e.g. from main.py or a CLI tool) should not pay for numpy
+    and matplotlib until something is actually rendered. Resolved attributes are
+    cached on the proxy, so hot loops see plain instance-attribute lookups.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        value = getattr(self._module, attr)
+        setattr(self, attr, value)
+        return value
+
+
+np = _LazyModule('numpy')
+mpatches = _LazyModule('matplotlib.patches')
+mpath = _LazyModule('matplotlib.path')
+mtransforms = _LazyModule('matplotlib.transforms')
+mcollections = _LazyModule('matplotlib.collections')
+mcolors = _LazyModule('matplotlib.colors')
+mfigure = _LazyModule('matplotlib.figure')
+backend_agg = _LazyModule('matplotlib.backends.backend_agg')
+
+# Bump whenever the drawing code changes so stale on-disk renders are never served
+RENDER_VERSION = "3"
+
+# Level-of-detail tiers: fraction of random spots drawn, output DPI, anti-aliasing,
+# and the display width used for the <img> tag
+QUALITY_TIERS = {
+    'thumbnail': {'detail': 0.35, 'dpi': 40, 'antialiased': False, 'width': 120},
+    'standard': {'detail': 1.0, 'dpi': 100, 'antialiased': True, 'width': 300},
+    'high': {'detail': 1.0, 'dpi': 200, 'antialiased': True, 'width': 600},
+}
+
+# Render options that do not show up in on-disk cache file names
+DEFAULT_RENDER_OPTIONS = {'minify': True, 'quality': 'standard'}
+
+# x coordinate of the left (index 0) and right (index 1) lung centres
+LUNG_CENTERS_X = (3.5, 6.5)
+
+
+def quantize_health(health_percentage):
+    """
+    Quantize a health percentage to the integer level (0-100) used to seed the renderer.
+
+    create_lung_image seeds its random patterns with int(health_percentage), so every
+    value between two integers shares the same spot layout.
+    """
+    return max(0, min(100, int(health_percentage)))
+
+
+class LungRenderCache:
+    """
+    Two-tier cache for rendered lung images.
+
+    Entries are keyed by the quantized health level plus the render options. The
+    memory tier is a bounded LRU; the optional disk tier (cache_dir) keeps renders
+    across processes and restarts, laid out as <cache_dir>/<RENDER_VERSION>/lung_NNN.<format>.
+    """
+
+    def __init__(self, maxsize=128, cache_dir=None):
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(level, options):
+        return (level,) + tuple(sorted(options.items()))
+
+    def disk_path(self, level, options):
+        """Return the on-disk location for a render, or None when the disk tier is off"""
+        if not self.cache_dir:
+            return None
+        name = f"lung_{level:03d}"
+        # Default options keep the plain lung_NNN.<format> name used by prerender_lungs.py
+        extra = sorted((k, v) for k, v in options.items()
+                       if k != 'format' and DEFAULT_RENDER_OPTIONS.get(k) != v)
+        if extra:
+            name += "_" + hashlib.sha1(repr(extra).encode('utf-8')).hexdigest()[:10]
+        return os.path.join(self.cache_dir, RENDER_VERSION, f"{name}.{options.get('format', 'png')}")
+
+    def sequence_paths(self, kind, quality):
+        """
+        Return the on-disk (data, index) locations of a prebuilt render_lung_sequence
+        result, or None when the disk tier is off
+        """
+        if not self.cache_dir:
+            return None
+        base = os.path.join(self.cache_dir, RENDER_VERSION, f"sequence_{kind}_{quality}")
+        return f"{base}.{SEQUENCE_EXTENSIONS[kind]}", f"{base}.json"
+
+    def read_sequence(self, kind, quality):
+        """Return a prebuilt sequence from the disk tier, or None"""
+        paths = self.sequence_paths(kind, quality)
+        if paths is None:
+            return None
+        data, index = (self._read_disk(path) for path in paths)
+        if data is None or index is None:
+            return None
+        with self._lock:
+            self.disk_hits += 1
+        return dict(json.loads(index), data=data)
+
+    def write_sequence(self, kind, quality, sequence):
+        """Store a render_lung_sequence result in the disk tier (no-op when it is off)"""
+        paths = self.sequence_paths(kind, quality)
+        if paths is None:
+            return
+        # The index is written last, so readers never pair it with a missing image
+        self._write_disk(paths[0], sequence['data'])
+        index = {key: value for key, value in sequence.items() if key != 'data'}
+        self._write_disk(paths[1], json.dumps(index).encode('utf-8'))
+
+    def get_or_render(self, level, options, render):
+        """
+        Return the cached bytes for (level, options), calling render() on a miss.
+
+        Parameters:
+        level (int): Quantized health level
+        options (dict): Render options that affect the output bytes
+        render (callable): Zero-argument function producing the image bytes
+        """
+        key = self.make_key(level, options)
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+
+        path = self.disk_path(level, options)
+        data = self._read_disk(path)
+        if data is not None:
+            with self._lock:
+                self.disk_hits += 1
+        else:
+            with self._lock:
+                self.misses += 1
+            data = render()
+            self._write_disk(path, data)
+
+        with self._lock:
+            self._entries[key] = data
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return data
+
+    def _read_disk(self, path):
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, path, data):
+        if path is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary file first so readers never see a partial image
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not write lung render cache file {path}: {e}")
+
+    def stats(self):
+        """Return hit/miss counters and the current memory-tier size"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+    def clear(self):
+        """Drop the memory tier and reset the counters (the disk tier is left untouched)"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+
+_render_cache = LungRenderCache(
+    maxsize=int(os.environ.get("LUNG_RENDER_CACHE_SIZE", "128")),
+    cache_dir=os.environ.get("LUNG_RENDER_CACHE_DIR"),
+)
+
+
+def get_render_cache():
+    """Return the process-wide lung render cache"""
+    return _render_cache
 
 def create_realistic_lung_path(ax, x_center, y_center, scale=1.0, is_left=True):
     """
@@ -111,63 +320,118 @@ def draw_realistic_bronchi(ax):
     ax.plot([6.7, 7.1], [5.9, 5.6], color=trachea_color, linewidth=2)
     ax.plot([6.7, 6.9], [5.9, 5.4], color=trachea_color, linewidth=2)
 
-def create_lung_image(ax, health_percentage):
+def draw_spot_layer(ax, x, y, widths, heights=None, angles=0.0, facecolors='#000000',
+                    edgecolors='none', alpha=1.0, linewidths=0.0):
     """
-    Create a realistic lung visualization on the given matplotlib axes.
-    
+    Draw one layer of circular/elliptical spots as a single EllipseCollection.
+
+    Every argument after y accepts either a scalar or one value per spot. Widths and
+    heights are full axis lengths in data units (diameters for circles), angles are
+    in degrees, and alpha is applied to both face and edge colours like a patch alpha.
+
+    Returns:
+    EllipseCollection: The added collection, or None if the layer is empty
+    """
+    offsets = np.column_stack([np.asarray(x, dtype=float), np.asarray(y, dtype=float)])
+    count = len(offsets)
+    if count == 0:
+        return None
+
+    widths = np.broadcast_to(np.asarray(widths, dtype=float), (count,))
+    heights = widths if heights is None else np.broadcast_to(np.asarray(heights, dtype=float), (count,))
+    angles = np.broadcast_to(np.asarray(angles, dtype=float), (count,))
+    alpha = np.broadcast_to(np.asarray(alpha, dtype=float), (count,))
+
+    def with_alpha(colors):
+        if isinstance(colors, str):
+            colors = [colors]
+        rgba = np.array(np.broadcast_to(mcolors.to_rgba_array(colors), (count, 4)))
+        # 'none' stays fully transparent, every other colour takes the spot alpha
+        rgba[:, 3] = np.where(rgba[:, 3] > 0, alpha, 0.0)
+        return rgba
+
+    spots = mcollections.EllipseCollection(
+        widths, heights, angles,
+        units='xy',
+        offsets=offsets,
+        offset_transform=ax.transData,
+        facecolors=with_alpha(facecolors),
+        edgecolors=with_alpha(edgecolors),
+        linewidths=linewidths,
+    )
+    ax.add_collection(spots, autolim=False)
+    return spots
+
+def points_in_lungs(x, y, sides, left_lung_path, right_lung_path):
+    """
+    Test many points against the lung outlines in bulk.
+
+    Parameters:
+    x, y (array): Point coordinates
+    sides (array): 0 to test a point against the left lung, 1 for the right lung
+    left_lung_path, right_lung_path (Path): Lung outlines from create_realistic_lung_path
+
+    Returns:
+    ndarray: Boolean mask of the points that fall inside their lung
+    """
+    points = np.column_stack([np.asarray(x, dtype=float), np.asarray(y, dtype=float)])
+    sides = np.asarray(sides)
+    inside = np.zeros(len(points), dtype=bool)
+    for side, path in ((0, left_lung_path), (1, right_lung_path)):
+        selected = sides == side
+        if selected.any():
+            inside[selected] = path.contains_points(points[selected])
+    return inside
+
+# Colour bands based on health percentage - 更準確地反映吸菸肺部的實際色彩變化
+# 對照醫學圖像參考，吸菸肺部會從粉紅色健康肺組織轉變為黑色沉積
+# 重新調整顏色階梯，使其更接近實際臨床觀察
+# Each entry is (lower bound, lung colour, tar opacity), checked from the top down
+LUNG_COLOR_BANDS = (
+    (99, "#E5ACAC", 0.1),   # 完全健康的粉紅色
+    (95, "#D9A09F", 0.2),   # 非常輕微受損
+    (90, "#CE9594", 0.35),  # 輕微受損
+    (85, "#C38B8A", 0.4),   # 初期受損
+    (80, "#B87F7E", 0.55),  # 明顯受損
+    (75, "#A37170", 0.6),   # 中輕度受損，更深的紅褐色
+    (70, "#8E625F", 0.65),  # 中度受損，朝向更暗的色調
+    (60, "#79514E", 0.7),   # 中重度受損，明顯的暗褐色
+    (50, "#64413E", 0.75),  # 重度受損，深褐色
+    (40, "#503130", 0.8),   # 嚴重受損，朝向黑色的深褐色
+    (30, "#3C2625", 0.85),  # 極嚴重受損，非常深的褐黑色
+    (20, "#2A1B1A", 0.9),   # 近乎喪失功能，幾乎是黑色
+    (10, "#1C1110", 0.95),  # 幾乎完全喪失功能，近黑色
+    (0, "#110A0A", 1.0),    # 完全喪失功能 - 接近純黑色
+)
+
+def health_band(health_percentage):
+    """Return the lower bound of the colour band a health percentage falls into"""
+    for lower_bound, _, _ in LUNG_COLOR_BANDS:
+        if health_percentage >= lower_bound:
+            return lower_bound
+    return LUNG_COLOR_BANDS[-1][0]
+
+def get_lung_color(health_percentage):
+    """
+    Return the (lung_color, tar_opacity) pair for a health percentage.
+    """
+    for lower_bound, lung_color, tar_opacity in LUNG_COLOR_BANDS:
+        if health_percentage >= lower_bound:
+            return lung_color, tar_opacity
+    return LUNG_COLOR_BANDS[-1][1:]
+
+def draw_lung_base(ax, lung_color):
+    """
+    Draw the static anatomy that does not depend on the damage pattern: the bronchi
+    tree, both lung outlines and the 3D shading.
+
     Parameters:
     ax: matplotlib axes to draw on
-    health_percentage (float): Percentage of lung health (0-100)
+    lung_color (str): Fill colour for the lungs (can be changed later via set_facecolor)
+
+    Returns:
+    tuple: (left_lung, right_lung) PathPatch objects
     """
-    # Set consistent random seed for consistent tar patterns at each health level
-    random.seed(int(health_percentage))
-    
-    # Set up colors based on health percentage - 更準確地反映吸菸肺部的實際色彩變化
-    # 對照醫學圖像參考，吸菸肺部會從粉紅色健康肺組織轉變為黑色沉積
-    # 重新調整顏色階梯，使其更接近實際臨床觀察
-    if health_percentage >= 99:
-        lung_color = "#E5ACAC"  # 完全健康的粉紅色
-        tar_opacity = 0.1
-    elif health_percentage >= 95:
-        lung_color = "#D9A09F"  # 非常輕微受損
-        tar_opacity = 0.2
-    elif health_percentage >= 90:
-        lung_color = "#CE9594"  # 輕微受損
-        tar_opacity = 0.35
-    elif health_percentage >= 85:
-        lung_color = "#C38B8A"  # 初期受損
-        tar_opacity = 0.4
-    elif health_percentage >= 80:
-        lung_color = "#B87F7E"  # 明顯受損
-        tar_opacity = 0.55
-    elif health_percentage >= 75:
-        lung_color = "#A37170"  # 中輕度受損，更深的紅褐色
-        tar_opacity = 0.6
-    elif health_percentage >= 70:
-        lung_color = "#8E625F"  # 中度受損，朝向更暗的色調
-        tar_opacity = 0.65
-    elif health_percentage >= 60:
-        lung_color = "#79514E"  # 中重度受損，明顯的暗褐色
-        tar_opacity = 0.7
-    elif health_percentage >= 50:
-        lung_color = "#64413E"  # 重度受損，深褐色
-        tar_opacity = 0.75
-    elif health_percentage >= 40:
-        lung_color = "#503130"  # 嚴重受損，朝向黑色的深褐色
-        tar_opacity = 0.8
-    elif health_percentage >= 30:
-        lung_color = "#3C2625"  # 極嚴重受損，非常深的褐黑色
-        tar_opacity = 0.85
-    elif health_percentage >= 20:
-        lung_color = "#2A1B1A"  # 近乎喪失功能，幾乎是黑色
-        tar_opacity = 0.9
-    elif health_percentage >= 10:
-        lung_color = "#1C1110"  # 幾乎完全喪失功能，近黑色
-        tar_opacity = 0.95
-    else:
-        lung_color = "#110A0A"  # 完全喪失功能 - 接近純黑色
-        tar_opacity = 1.0
-    
     ax.set_xlim(0, 10)
     ax.set_ylim(0, 10)
     
@@ -179,8 +443,8 @@ def create_lung_image(ax, health_percentage):
     right_lung_path = create_realistic_lung_path(ax, 6.5, 4, 2.5, is_left=False)
     
     # Draw the lungs with the realistic paths
-    left_lung = PathPatch(left_lung_path, facecolor=lung_color, edgecolor='#444444', linewidth=1)
-    right_lung = PathPatch(right_lung_path, facecolor=lung_color, edgecolor='#444444', linewidth=1)
+    left_lung = mpatches.PathPatch(left_lung_path, facecolor=lung_color, edgecolor='#444444', linewidth=1)
+    right_lung = mpatches.PathPatch(right_lung_path, facecolor=lung_color, edgecolor='#444444', linewidth=1)
     
     ax.add_patch(left_lung)
     ax.add_patch(right_lung)
@@ -194,47 +458,70 @@ def create_lung_image(ax, health_percentage):
         [[(6.5+1.5, 4), (6.5, 4+1.5)]], 
         colors=[(0,0,0,0.1)], linewidths=5
     ))
-    
-    # Add alveoli texture
-    for i in range(int(12 * health_percentage / 100)):
-        # Left lung alveoli
-        alv_x = 3.5 + (random.random() - 0.5) * 1.8
-        alv_y = 4 + (random.random() - 0.5) * 3
-        if left_lung_path.contains_point((alv_x, alv_y)):
-            # Create small bubble-like circles for alveoli
-            alveoli = Circle((alv_x, alv_y), 0.1, 
-                           facecolor='#FFB6B6', 
-                           edgecolor='#DDA0A0', 
-                           linewidth=0.5,
-                           alpha=0.6)
-            ax.add_patch(alveoli)
-            
-        # Right lung alveoli
-        alv_x = 6.5 + (random.random() - 0.5) * 1.8
-        alv_y = 4 + (random.random() - 0.5) * 3
-        if right_lung_path.contains_point((alv_x, alv_y)):
-            # Create small bubble-like circles for alveoli
-            alveoli = Circle((alv_x, alv_y), 0.1, 
-                           facecolor='#FFB6B6', 
-                           edgecolor='#DDA0A0', 
-                           linewidth=0.5,
-                           alpha=0.6)
-            ax.add_patch(alveoli)
-    
+    return left_lung, right_lung
+
+def draw_lung_damage(ax, health_percentage, left_lung_path, right_lung_path, detail=1.0):
+    """
+    Draw the health-dependent overlay (alveoli and smoking damage) on top of the base
+    layer from draw_lung_base. Every element is added as a spot collection.
+
+    Parameters:
+    ax: matplotlib axes to draw on
+    health_percentage (float): Percentage of lung health (0-100)
+    left_lung_path, right_lung_path (Path): Lung outlines used for containment tests
+    detail (float): Level-of-detail factor applied to every random spot count
+    """
+    # Seed a dedicated generator per health level so tar patterns are reproducible
+    rng = np.random.default_rng(quantize_health(health_percentage))
+
+    def lod(count):
+        # Scale a spot count by the level of detail (detail=1.0 keeps it unchanged)
+        return int(round(count * detail))
+
+    # Add alveoli texture (alternating left/right samples)
+    sides = np.tile([0, 1], lod(int(12 * health_percentage / 100)))
+    x = np.take(LUNG_CENTERS_X, sides) + (rng.random(len(sides)) - 0.5) * 1.8
+    y = 4 + (rng.random(len(sides)) - 0.5) * 3
+    keep = points_in_lungs(x, y, sides, left_lung_path, right_lung_path)
+
+    # Create small bubble-like circles for alveoli
+    draw_spot_layer(ax, x[keep], y[keep], 0.2,
+                    facecolors='#FFB6B6',
+                    edgecolors='#DDA0A0',
+                    linewidths=0.5,
+                    alpha=0.6)
+
     # Add realistic tobacco-related damage based on medical research and reference images of damaged lungs
-    # References: 
+    # References:
     # - American Cancer Society: Lung damage patterns
     # - Journal of Thoracic Imaging: Cigarette smoking-related lung changes
     # - New England Journal of Medicine: Effects of smoking on lung tissue
     # - Reference medical image showing severe tar deposition in damaged lungs
-    
+
     if health_percentage < 100:
         # Stages of smoke damage based on medical literature
         damage_stage = 5 - int(health_percentage / 20)  # 1-5 scale (mild to severe)
-        
+
         # 黑色焦油斑點的數量基於損傷程度
         tar_spot_count = int(50 * (5 - health_percentage/20) / 5)
-        
+
+        def sample_spots(count, x_spread, y_center, y_spread):
+            # Uniform box sampling around each lung; even spots go left, odd spots go right
+            sides = np.arange(count) % 2
+            x = np.take(LUNG_CENTERS_X, sides) + (rng.random(count) - 0.5) * x_spread
+            y = y_center + rng.random(count) * y_spread
+            keep = points_in_lungs(x, y, sides, left_lung_path, right_lung_path)
+            return x[keep], y[keep]
+
+        def sample_polar_spots(count, radius, x_scale, y_scale):
+            # Polar sampling around each lung centre; radius is an array of distance factors
+            sides = np.arange(count) % 2
+            angle = rng.random(count) * 2 * np.pi  # 隨機角度 (0-2π)
+            x = np.take(LUNG_CENTERS_X, sides) + radius * np.cos(angle) * x_scale  # x方向偏移
+            y = 4 + radius * np.sin(angle) * y_scale  # y方向偏移，略大以覆蓋縱向更長的肺部
+            keep = points_in_lungs(x, y, sides, left_lung_path, right_lung_path)
+            return x[keep], y[keep]
+
         # =========================================================================
         # Stage 1: Early Changes (90-100% health)
         # =========================================================================
@@ -244,36 +531,22 @@ def create_lung_image(ax, health_percentage):
         # =========================================================================
         if damage_stage >= 1:
             # Increased mucus production in bronchioles
-            bronchiole_points = [
+            bronchiole_points = np.array([
                 (4.2, 6.2), (5.8, 6.2),  # Upper bronchioles
                 (3.8, 5.5), (6.2, 5.5),  # Middle bronchioles
-            ]
-            
-            for point in bronchiole_points:
-                mucus = Ellipse(point, 0.15, 0.08, 
-                             facecolor='#E2D2D2', 
-                             edgecolor='#D4C2C2', 
-                             alpha=0.7, 
-                             linewidth=0.5)
-                ax.add_patch(mucus)
-            
+            ])
+            draw_spot_layer(ax, bronchiole_points[:, 0], bronchiole_points[:, 1], 0.15, 0.08,
+                            facecolors='#E2D2D2',
+                            edgecolors='#D4C2C2',
+                            alpha=0.7,
+                            linewidths=0.5)
+
             # Mild inflammation spots around small airways
-            for i in range(8):
-                if i % 2 == 0:  # Left lung
-                    x = 3.5 + (random.random() - 0.5) * 1.2
-                    y = 5.5 + (random.random() - 0.5) * 0.8
-                else:  # Right lung
-                    x = 6.5 + (random.random() - 0.5) * 1.2
-                    y = 5.5 + (random.random() - 0.5) * 0.8
-
-                if (i % 2 == 0 and left_lung_path.contains_point((x, y))) or \
-                   (i % 2 == 1 and right_lung_path.contains_point((x, y))):
-                    inflammation = Circle((x, y), 0.08, 
-                                      facecolor='#E88A8A', 
-                                      edgecolor=None, 
-                                      alpha=0.6)
-                    ax.add_patch(inflammation)
-        
+            x, y = sample_spots(lod(8), 1.2, 5.5 - 0.4, 0.8)
+            draw_spot_layer(ax, x, y, 0.16,
+                            facecolors='#E88A8A',
+                            alpha=0.6)
+
         # =========================================================================
         # Stage 2: Mild Damage (70-90% health)
         # - Accumulation of pigmented macrophages
@@ -284,108 +557,53 @@ def create_lung_image(ax, health_percentage):
         if damage_stage >= 2:
             # Add pigment accumulation (macrophages with tar) - 更多分布在整個肺部
             # 根據健康百分比動態調整斑點數量，即使是輕度損傷也顯示足夠多的斑點
-            spot_count = int(40 + (100 - health_percentage) * 0.8)  # 健康度越低，斑點越多
-            for i in range(spot_count):  # 動態調整數量
-                # 徹底改變分布方式，使焦油斑點更均勻地分布在整個肺部區域
-                # 不再依賴固定的分布類型，而是使用整個肺部的範圍
-                if i % 2 == 0:  # Left lung
-                    x_center = 3.5
-                    # 計算與肺部中心的距離係數，確保更多點分布在肺部邊緣
-                    distance_factor = 0.5 + random.random() * 1.0  # 0.5-1.5範圍，保證更多點在邊緣
-                    
-                    angle = random.random() * 2 * 3.14159  # 隨機角度 (0-2π)
-                    x_offset = distance_factor * math.cos(angle) * 1.7  # x方向偏移
-                    y_offset = distance_factor * math.sin(angle) * 2.3  # y方向偏移，略大一些以覆蓋縱向更長的肺部
-                    
-                    x = x_center + x_offset
-                    y = 4 + y_offset
-                else:  # Right lung
-                    x_center = 6.5
-                    # 計算與肺部中心的距離係數，確保更多點分布在肺部邊緣
-                    distance_factor = 0.5 + random.random() * 1.0  # 0.5-1.5範圍，保證更多點在邊緣
-                    
-                    angle = random.random() * 2 * 3.14159  # 隨機角度 (0-2π)
-                    x_offset = distance_factor * math.cos(angle) * 1.7  # x方向偏移
-                    y_offset = distance_factor * math.sin(angle) * 2.3  # y方向偏移，略大一些以覆蓋縱向更長的肺部
-                    
-                    x = x_center + x_offset
-                    y = 4 + y_offset
-
-                if (i % 2 == 0 and left_lung_path.contains_point((x, y))) or \
-                   (i % 2 == 1 and right_lung_path.contains_point((x, y))):
-                    # Pigmented macrophages - 使用更暗的色調和更大的尺寸
-                    tar_intensity = (100 - health_percentage) / 20  # 進一步增強視覺影響
-                    # 健康度降低時增加斑點尺寸
-                    macrophage_size = 0.2 + random.random() * 0.2 + (100 - health_percentage) / 100 * 0.15
-                    # 提高不透明度以增強視覺效果
-                    macrophage_opacity = 0.75 + (100 - health_percentage) / 100 * 0.2
-                    
-                    # 根據健康度動態選擇顏色，進一步強化更深的黑色
-                    tar_colors = ['#443333', '#332222', '#221111', '#110000']
-                    # 即使在高健康度時也使用較深顏色
-                    color_index = min(3, int((100 - health_percentage) / 20))
-                    tar_color = tar_colors[color_index]
-                    
-                    macrophage = Circle((x, y), macrophage_size, 
-                                     facecolor=tar_color, 
-                                     edgecolor=None, 
-                                     alpha=macrophage_opacity)
-                    ax.add_patch(macrophage)
-            
+            spot_count = lod(int(40 + (100 - health_percentage) * 0.8))  # 健康度越低，斑點越多
+            # 計算與肺部中心的距離係數，0.5-1.5範圍，保證更多點在邊緣
+            distance_factor = 0.5 + rng.random(spot_count) * 1.0
+            x, y = sample_polar_spots(spot_count, distance_factor, 1.7, 2.3)
+
+            # Pigmented macrophages - 使用更暗的色調和更大的尺寸
+            # 健康度降低時增加斑點尺寸
+            macrophage_size = 0.2 + rng.random(len(x)) * 0.2 + (100 - health_percentage) / 100 * 0.15
+            # 提高不透明度以增強視覺效果
+            macrophage_opacity = 0.75 + (100 - health_percentage) / 100 * 0.2
+            # 根據健康度動態選擇顏色，進一步強化更深的黑色
+            tar_colors = ['#443333', '#332222', '#221111', '#110000']
+            # 即使在高健康度時也使用較深顏色
+            color_index = min(3, int((100 - health_percentage) / 20))
+            draw_spot_layer(ax, x, y, 2 * macrophage_size,
+                            facecolors=tar_colors[color_index],
+                            alpha=macrophage_opacity)
+
             # Early bronchiolitis - 更廣泛分布在整個肺部
             # 動態調整數量，根據健康度增加炎症點
-            inflammation_count = int(20 + (100 - health_percentage) * 0.6)  # 健康度越低，炎症點越多
-            for i in range(inflammation_count):  # 動態調整數量
-                # 使用相同的極坐標分布方法，確保均勻覆蓋整個肺部
-                if i % 2 == 0:  # Left lung
-                    x_center = 3.5
-                    # 使用距離因子確保點分布在整個肺部，包括邊緣
-                    distance_factor = 0.3 + random.random() * 1.2  # 0.3-1.5範圍，覆蓋從中心到邊緣
-                    
-                    angle = random.random() * 2 * math.pi  # 隨機角度 (0-2π)
-                    x_offset = distance_factor * math.cos(angle) * 1.6  # x方向偏移
-                    y_offset = distance_factor * math.sin(angle) * 2.2  # y方向偏移，略大以覆蓋縱向
-                    
-                    x = x_center + x_offset
-                    y = 4 + y_offset
-                else:  # Right lung
-                    x_center = 6.5
-                    # 使用距離因子確保點分布在整個肺部，包括邊緣
-                    distance_factor = 0.3 + random.random() * 1.2  # 0.3-1.5範圍，覆蓋從中心到邊緣
-                    
-                    angle = random.random() * 2 * math.pi  # 隨機角度 (0-2π)
-                    x_offset = distance_factor * math.cos(angle) * 1.6  # x方向偏移
-                    y_offset = distance_factor * math.sin(angle) * 2.2  # y方向偏移
-                    
-                    x = x_center + x_offset
-                    y = 4 + y_offset
-
-                if (i % 2 == 0 and left_lung_path.contains_point((x, y))) or \
-                   (i % 2 == 1 and right_lung_path.contains_point((x, y))):
-                    # Inflamed bronchioles - 更明顯的顏色和尺寸
-                    # 健康度降低時增加大小
-                    bronchiolitis_size = 0.18 + random.random() * 0.12 + (100 - health_percentage) / 100 * 0.1
-                    # 增強不透明度
-                    bronchiolitis_opacity = 0.6 + (100 - health_percentage) / 100 * 0.35
-                    
-                    # 根據健康度調整顏色，即使是高健康度也使用較明顯的顏色
-                    if health_percentage >= 85:
-                        face_color = '#CC7777'
-                        edge_color = '#BB6666'
-                    elif health_percentage >= 70:
-                        face_color = '#BB6666'
-                        edge_color = '#AA5555'
-                    else:
-                        face_color = '#AA5555'
-                        edge_color = '#994444'
-                    
-                    bronchiolitis = Circle((x, y), bronchiolitis_size,
-                                        facecolor=face_color,
-                                        edgecolor=edge_color,
-                                        alpha=bronchiolitis_opacity,
-                                        linewidth=0.7)  # 加粗線條
-                    ax.add_patch(bronchiolitis)
-        
+            inflammation_count = lod(int(20 + (100 - health_percentage) * 0.6))  # 健康度越低，炎症點越多
+            # 使用距離因子確保點分布在整個肺部，0.3-1.5範圍，覆蓋從中心到邊緣
+            distance_factor = 0.3 + rng.random(inflammation_count) * 1.2
+            x, y = sample_polar_spots(inflammation_count, distance_factor, 1.6, 2.2)
+
+            # Inflamed bronchioles - 更明顯的顏色和尺寸，健康度降低時增加大小
+            bronchiolitis_size = 0.18 + rng.random(len(x)) * 0.12 + (100 - health_percentage) / 100 * 0.1
+            # 增強不透明度
+            bronchiolitis_opacity = 0.6 + (100 - health_percentage) / 100 * 0.35
+
+            # 根據健康度調整顏色，即使是高健康度也使用較明顯的顏色
+            if health_percentage >= 85:
+                face_color = '#CC7777'
+                edge_color = '#BB6666'
+            elif health_percentage >= 70:
+                face_color = '#BB6666'
+                edge_color = '#AA5555'
+            else:
+                face_color = '#AA5555'
+                edge_color = '#994444'
+
+            draw_spot_layer(ax, x, y, 2 * bronchiolitis_size,
+                            facecolors=face_color,
+                            edgecolors=edge_color,
+                            alpha=bronchiolitis_opacity,
+                            linewidths=0.7)  # 加粗線條
+
         # =========================================================================
         # Stage 3: Moderate Damage (50-70% health)
         # - Diffuse centrilobular emphysema
@@ -395,58 +613,34 @@ def create_lung_image(ax, health_percentage):
         # =========================================================================
         if damage_stage >= 3:
             # Add emphysema patches (enlarged, damaged air spaces)
-            for i in range(20):
-                side = i % 2
-                region = i % 5  # 0=upper, 1=upper-mid, 2=mid, 3=mid-lower, 4=lower
-                
-                if side == 0:  # Left lung
-                    x_center = 3.5
-                    x_offset = (random.random() - 0.5) * 1.6
-                else:  # Right lung
-                    x_center = 6.5
-                    x_offset = (random.random() - 0.5) * 1.6
-                
-                if region == 0:  # Upper 
-                    y = 4 + 1.5 + (random.random() - 0.5) * 0.8
-                elif region == 1:  # Upper-mid
-                    y = 4 + 0.8 + (random.random() - 0.5) * 0.8
-                elif region == 2:  # Mid
-                    y = 4 + (random.random() - 0.5) * 0.8
-                elif region == 3:  # Mid-lower
-                    y = 4 - 0.8 + (random.random() - 0.5) * 0.8
-                else:  # Lower
-                    y = 4 - 1.5 + (random.random() - 0.5) * 0.8
-
-                # Position with more realistic distribution
-                x = x_center + x_offset
-
-                if (side == 0 and left_lung_path.contains_point((x, y))) or \
-                   (side == 1 and right_lung_path.contains_point((x, y))):
-                   
-                    # Emphysema appears as abnormally enlarged air spaces
-                    emphysema_size = 0.15 + random.random() * 0.1
-                    emphysema = Circle((x, y), emphysema_size,
-                                    facecolor='#FFDDDD',
-                                    edgecolor='#E8C0C0',
-                                    alpha=0.7,
-                                    linewidth=0.5)
-                    ax.add_patch(emphysema)
-            
+            # Vertical centre of each region: 0=upper, 1=upper-mid, 2=mid, 3=mid-lower, 4=lower
+            region_offsets = np.array([1.5, 0.8, 0.0, -0.8, -1.5])
+            emphysema_count = lod(20)
+            sides = np.arange(emphysema_count) % 2
+            x = np.take(LUNG_CENTERS_X, sides) + (rng.random(emphysema_count) - 0.5) * 1.6
+            y = 4 + region_offsets[np.arange(emphysema_count) % 5] + (rng.random(emphysema_count) - 0.5) * 0.8
+            keep = points_in_lungs(x, y, sides, left_lung_path, right_lung_path)
+
+            # Emphysema appears as abnormally enlarged air spaces
+            emphysema_size = 0.15 + rng.random(keep.sum()) * 0.1
+            draw_spot_layer(ax, x[keep], y[keep], 2 * emphysema_size,
+                            facecolors='#FFDDDD',
+                            edgecolors='#E8C0C0',
+                            alpha=0.7,
+                            linewidths=0.5)
+
             # Add fibrosis (scarring) around airways
-            fibrosis_areas = [
+            fibrosis_areas = np.array([
                 (3.8, 6.0, 0.25), (6.2, 6.0, 0.25),  # Upper airways
                 (3.5, 5.0, 0.3), (6.5, 5.0, 0.3),    # Mid airways
                 (3.2, 4.0, 0.2), (6.8, 4.0, 0.2),    # Lower airways
-            ]
-            
-            for x, y, size in fibrosis_areas:
-                fibrosis = Circle((x, y), size,
-                                facecolor='#AA7777',
-                                edgecolor='#996666',
-                                alpha=0.4,
-                                linewidth=0.5)
-                ax.add_patch(fibrosis)
-        
+            ])
+            draw_spot_layer(ax, fibrosis_areas[:, 0], fibrosis_areas[:, 1], 2 * fibrosis_areas[:, 2],
+                            facecolors='#AA7777',
+                            edgecolors='#996666',
+                            alpha=0.4,
+                            linewidths=0.5)
+
         # =========================================================================
         # Stage 4: Severe Damage (25-50% health)
         # - Diffuse emphysema throughout lungs
@@ -458,62 +652,29 @@ def create_lung_image(ax, health_percentage):
         if damage_stage >= 4:
             # Black carbon/tar deposits throughout lungs
             # More prominent in upper lobes (per medical research)
-            upper_tar_count = 25
-            lower_tar_count = 15
-            
+            upper_tar_count = lod(25)
+            lower_tar_count = lod(15)
+
             # Upper lobe deposits (heaviest concentration)
-            for i in range(upper_tar_count):
-                if i % 2 == 0:  # Left upper lobe
-                    x = 3.5 + (random.random() - 0.5) * 1.5
-                    y = 4 + 1 + random.random() * 1.5
-                else:  # Right upper lobe  
-                    x = 6.5 + (random.random() - 0.5) * 1.5
-                    y = 4 + 1 + random.random() * 1.5
-                
-                if (i % 2 == 0 and left_lung_path.contains_point((x, y))) or \
-                   (i % 2 == 1 and right_lung_path.contains_point((x, y))):
-                    size = 0.15 + (0.1 * random.random())
-                    tar_spot = Circle((x, y), size, 
-                                   facecolor='#000000', 
-                                   alpha=0.7)
-                    ax.add_patch(tar_spot)
-            
+            x, y = sample_spots(upper_tar_count, 1.5, 4 + 1, 1.5)
+            draw_spot_layer(ax, x, y, 2 * (0.15 + 0.1 * rng.random(len(x))),
+                            facecolors='#000000',
+                            alpha=0.7)
+
             # Lower lung tar deposits (less concentrated but still present)
-            for i in range(lower_tar_count):
-                if i % 2 == 0:  # Left lower areas
-                    x = 3.5 + (random.random() - 0.5) * 1.5
-                    y = 4 - random.random() * 2
-                else:  # Right lower areas
-                    x = 6.5 + (random.random() - 0.5) * 1.5
-                    y = 4 - random.random() * 2
-                
-                if (i % 2 == 0 and left_lung_path.contains_point((x, y))) or \
-                   (i % 2 == 1 and right_lung_path.contains_point((x, y))):
-                    size = 0.1 + (0.1 * random.random())
-                    tar_spot = Circle((x, y), size, 
-                                   facecolor='#000000', 
-                                   alpha=0.5)
-                    ax.add_patch(tar_spot)
-            
+            x, y = sample_spots(lower_tar_count, 1.5, 4, -2)
+            draw_spot_layer(ax, x, y, 2 * (0.1 + 0.1 * rng.random(len(x))),
+                            facecolors='#000000',
+                            alpha=0.5)
+
             # Add bullae (larger emphysematous areas)
-            for i in range(8):
-                if i % 2 == 0:  # Left lung
-                    x = 3.5 + (random.random() - 0.5) * 1.4
-                    y = 4 + (random.random() - 1) * 2.5
-                else:  # Right lung
-                    x = 6.5 + (random.random() - 0.5) * 1.4
-                    y = 4 + (random.random() - 1) * 2.5
-                
-                if (i % 2 == 0 and left_lung_path.contains_point((x, y))) or \
-                   (i % 2 == 1 and right_lung_path.contains_point((x, y))):
-                    bulla_size = 0.3 + random.random() * 0.2
-                    bulla = Circle((x, y), bulla_size,
-                                facecolor='#F8E0E0',
-                                edgecolor='#E0C0C0',
-                                alpha=0.8,
-                                linewidth=0.5)
-                    ax.add_patch(bulla)
-        
+            x, y = sample_spots(lod(8), 1.4, 4 - 2.5, 2.5)
+            draw_spot_layer(ax, x, y, 2 * (0.3 + rng.random(len(x)) * 0.2),
+                            facecolors='#F8E0E0',
+                            edgecolors='#E0C0C0',
+                            alpha=0.8,
+                            linewidths=0.5)
+
         # =========================================================================
         # Stage 5: Critical Damage (<25% health)
         # - Extensive emphysema and bullae
@@ -525,199 +686,500 @@ def create_lung_image(ax, health_percentage):
         if damage_stage >= 5:
             # Dark tar patches throughout lungs - much more extensive and darker
             # 參考圖片顯示大量焦油沉積，覆蓋整個肺部表面，而不僅僅是中間
-            for i in range(160):  # 進一步增加焦油斑點的數量
-                # 使用極坐標分布方法，確保斑點均勻覆蓋整個肺部
-                if i % 2 == 0:  # Left lung
-                    x_center = 3.5
-                    # 使用距離因子確保點分布在整個肺部，與中心距離分布更均勻
-                    # 增加r值範圍使更多點分布在邊緣
-                    r = 0.2 + 1.5 * math.sqrt(random.random())  # 平方根分布使點更均勻分布在面積上
-                    
-                    angle = random.random() * 2 * math.pi  # 隨機角度 (0-2π)
-                    x_offset = r * math.cos(angle) * 1.6  # x方向偏移
-                    y_offset = r * math.sin(angle) * 2.2  # y方向偏移，略大以覆蓋縱向
-                    
-                    x = x_center + x_offset
-                    y = 4 + y_offset
-                else:  # Right lung
-                    x_center = 6.5
-                    # 使用距離因子確保點分布在整個肺部，與中心距離分布更均勻
-                    # 增加r值範圍使更多點分布在邊緣
-                    r = 0.2 + 1.5 * math.sqrt(random.random())  # 平方根分布使點更均勻分布在面積上
-                    
-                    angle = random.random() * 2 * math.pi  # 隨機角度 (0-2π)
-                    x_offset = r * math.cos(angle) * 1.6  # x方向偏移
-                    y_offset = r * math.sin(angle) * 2.2  # y方向偏移
-                    
-                    x = x_center + x_offset
-                    y = 4 + y_offset
-                
-                if (i % 2 == 0 and left_lung_path.contains_point((x, y))) or \
-                   (i % 2 == 1 and right_lung_path.contains_point((x, y))):
-                    # 使用大小不一的黑色區塊，而不僅僅是小圓點
-                    # 在健康度較低時使用更大的黑色區塊
-                    size_factor = 1.0 + (100 - health_percentage) / 40  # 健康度越低，尺寸越大
-                    # 使用更大的尺寸範圍
-                    size = (0.3 + (0.5 * random.random())) * size_factor  # 更大的斑點
-                    
-                    # 使用更深的黑色，接近真實的煙焦油顏色
-                    tar_colors = ['#100808', '#080404', '#000000']
-                    tar_color = random.choice(tar_colors)
-                    
-                    # 使用不同形狀，有些是圓形，有些是橢圓形
-                    if random.random() > 0.3:  # 70%使用圓形
-                        tar_patch = Circle((x, y), size, 
-                                        facecolor=tar_color, 
-                                        alpha=0.9)  # 更高的不透明度
-                    else:  # 30%使用橢圓形，呈現更自然的形狀
-                        width = size * (0.8 + random.random() * 0.4)
-                        height = size * (0.8 + random.random() * 0.4)
-                        angle = random.random() * 360  # 隨機角度
-                        tar_patch = Ellipse((x, y), width, height, angle=angle,
-                                         facecolor=tar_color, 
-                                         alpha=0.9)
-                    
-                    ax.add_patch(tar_patch)
-            
+            # 使用極坐標分布方法，確保斑點均勻覆蓋整個肺部
+            # 平方根分布使點更均勻分布在面積上，增加r值範圍使更多點分布在邊緣
+            tar_patch_count = lod(160)  # 進一步增加焦油斑點的數量
+            r = 0.2 + 1.5 * np.sqrt(rng.random(tar_patch_count))
+            x, y = sample_polar_spots(tar_patch_count, r, 1.6, 2.2)
+            count = len(x)
+
+            # 使用大小不一的黑色區塊，而不僅僅是小圓點
+            # 在健康度較低時使用更大的黑色區塊
+            size_factor = 1.0 + (100 - health_percentage) / 40  # 健康度越低，尺寸越大
+            size = (0.3 + 0.5 * rng.random(count)) * size_factor  # 更大的斑點
+
+            # 使用更深的黑色，接近真實的煙焦油顏色
+            tar_colors = rng.choice(['#100808', '#080404', '#000000'], size=count)
+
+            # 使用不同形狀，70%使用圓形，30%使用橢圓形呈現更自然的形狀
+            is_circle = rng.random(count) > 0.3
+            widths = np.where(is_circle, 2 * size, size * (0.8 + rng.random(count) * 0.4))
+            heights = np.where(is_circle, 2 * size, size * (0.8 + rng.random(count) * 0.4))
+            angles = np.where(is_circle, 0.0, rng.random(count) * 360)  # 隨機角度
+            draw_spot_layer(ax, x, y, widths, heights, angles,
+                            facecolors=tar_colors,
+                            alpha=0.9)  # 更高的不透明度
+
             # 添加大片焦油覆蓋區域，模擬真實吸菸肺部中的大片黑色區域
             # 大幅增加黑色區域的數量和大小，特別是在肺部健康度低的情況下
-            
+
             # 根據健康度動態生成黑色區域的數量
-            black_areas_count = 25 + int((100 - health_percentage) / 5)  # 健康度為0時最多45個大塊區域
-            
-            # 隨機生成分布在整個肺部的大片黑色區域
-            major_tar_areas = []
-            
-            # 左肺生成點
-            for _ in range(black_areas_count // 2):
-                # 使用極坐標方法生成點，確保均勻覆蓋
-                r = 0.2 + 1.5 * math.sqrt(random.random())
-                angle = random.random() * 2 * math.pi
-                x = 3.5 + r * math.cos(angle) * 1.6
-                y = 4 + r * math.sin(angle) * 2.2
-                
-                # 大小隨健康度變化，健康度越低，黑斑越大
-                size = 0.6 + random.random() * 0.7 + (100 - health_percentage) / 100 * 0.9
-                
-                major_tar_areas.append((x, y, size))
-                
-            # 右肺生成點
-            for _ in range(black_areas_count // 2):
-                r = 0.2 + 1.5 * math.sqrt(random.random())
-                angle = random.random() * 2 * math.pi
-                x = 6.5 + r * math.cos(angle) * 1.6
-                y = 4 + r * math.sin(angle) * 2.2
-                
-                # 大小隨健康度變化
-                size = 0.6 + random.random() * 0.7 + (100 - health_percentage) / 100 * 0.9
-                
-                major_tar_areas.append((x, y, size))
-            
-            # 渲染所有大片黑色區域
-            for x, y, size in major_tar_areas:
-                if (x < 5 and left_lung_path.contains_point((x, y))) or \
-                   (x >= 5 and right_lung_path.contains_point((x, y))):
-                    # 使用不規則形狀創建更自然的大片焦油形狀
-                    shape_type = random.choice(['ellipse', 'blob'])
-                    
-                    if shape_type == 'ellipse':
-                        # 橢圓形狀
-                        width = size * (0.8 + random.random() * 0.4)
-                        height = size * (0.8 + random.random() * 0.4)
-                        angle = random.random() * 360  # 完全隨機角度
-                        tar_patch = Ellipse((x, y), width, height, angle=angle,
-                                         facecolor='#000000', 
-                                         alpha=0.95)  # 幾乎完全不透明
-                    else:
-                        # 圓形但更大
-                        tar_patch = Circle((x, y), size * 1.1,
-                                        facecolor='#000000', 
-                                        alpha=0.95)
-                    
-                    ax.add_patch(tar_patch)
-            
+            black_areas_count = lod(25 + int((100 - health_percentage) / 5))  # 健康度為0時最多45個大塊區域
+
+            # 隨機生成分布在整個肺部的大片黑色區域，先左肺後右肺
+            sides = np.repeat([0, 1], black_areas_count // 2)
+            count = len(sides)
+            r = 0.2 + 1.5 * np.sqrt(rng.random(count))
+            angle = rng.random(count) * 2 * np.pi
+            x = np.take(LUNG_CENTERS_X, sides) + r * np.cos(angle) * 1.6
+            y = 4 + r * np.sin(angle) * 2.2
+            # 大小隨健康度變化，健康度越低，黑斑越大
+            size = 0.6 + rng.random(count) * 0.7 + (100 - health_percentage) / 100 * 0.9
+
+            # 以所在位置(中線左右)決定使用哪一側肺部輪廓判斷
+            keep = points_in_lungs(x, y, (x >= 5).astype(int), left_lung_path, right_lung_path)
+            x, y, size = x[keep], y[keep], size[keep]
+            count = len(x)
+
+            # 使用不規則形狀創建更自然的大片焦油形狀：橢圓形或更大的圓形
+            is_ellipse = rng.random(count) < 0.5
+            widths = np.where(is_ellipse, size * (0.8 + rng.random(count) * 0.4), 2 * size * 1.1)
+            heights = np.where(is_ellipse, size * (0.8 + rng.random(count) * 0.4), 2 * size * 1.1)
+            angles = np.where(is_ellipse, rng.random(count) * 360, 0.0)  # 完全隨機角度
+            draw_spot_layer(ax, x, y, widths, heights, angles,
+                            facecolors='#000000',
+                            alpha=0.95)  # 幾乎完全不透明
+
             # Honeycomb pattern in lower lungs (sign of end-stage lung disease)
             # 在參考圖片中，肺部有顯著的蜂窩狀結構
-            for i in range(25):  # 增加蜂窩結構的數量
-                if i % 2 == 0:  # Left lower lung
-                    x = 3.5 + (random.random() - 0.5) * 1.5
-                    y = 4 - 1 - random.random() * 1.2
-                else:  # Right lower lung
-                    x = 6.5 + (random.random() - 0.5) * 1.5
-                    y = 4 - 1 - random.random() * 1.2
-                
-                if (i % 2 == 0 and left_lung_path.contains_point((x, y))) or \
-                   (i % 2 == 1 and right_lung_path.contains_point((x, y))):
-                    # 更深色的蜂窩結構，更接近參考圖片
-                    honeycomb = Circle((x, y), 0.25,
-                                    facecolor='#885050',  # 更深的紅褐色
-                                    edgecolor='#5F3535',  # 更暗的邊緣
-                                    alpha=0.9,
-                                    linewidth=1)
-                    ax.add_patch(honeycomb)
-                    
-                    # 添加小的黑點在蜂窩結構中心以模擬焦油沉積
-                    center_dot = Circle((x, y), 0.08,
-                                     facecolor='#000000',
-                                     alpha=0.9)
-                    ax.add_patch(center_dot)
-            
+            x, y = sample_spots(lod(25), 1.5, 4 - 1, -1.2)  # 增加蜂窩結構的數量
+
+            # 更深色的蜂窩結構(更深的紅褐色，更暗的邊緣)，每個蜂窩結構後緊接一個小的黑點以模擬焦油沉積
+            # 兩者交錯放在同一圖層以保持繪製順序
+            count = len(x)
+            draw_spot_layer(ax, np.repeat(x, 2), np.repeat(y, 2), np.tile([0.5, 0.16], count),
+                            facecolors=['#885050', '#000000'] * count,
+                            edgecolors=['#5F3535', 'none'] * count,
+                            alpha=0.9,
+                            linewidths=np.tile([1.0, 0.0], count))
+
             # Add large bullae in upper lobes (characteristic of severe emphysema)
             # 在參考圖片中，除了黑色區域，還有一些較淺的區域，這些是肺氣腫的泡狀損傷
-            upper_bullae = [
+            upper_bullae = np.array([
                 (3.0, 5.5, 0.5), (7.0, 5.5, 0.5),  # Large upper bullae
                 (3.5, 6.0, 0.4), (6.5, 6.0, 0.4),  # More upper bullae
                 (3.2, 4.5, 0.45), (6.8, 4.5, 0.45),  # Additional bullae
                 (3.8, 5.2, 0.35), (6.2, 5.2, 0.35),  # Additional bullae
-            ]
-            
-            for x, y, size in upper_bullae:
-                if (x < 5 and left_lung_path.contains_point((x, y))) or \
-                   (x >= 5 and right_lung_path.contains_point((x, y))):
-                    # 更深色的氣腫泡，更接近參考圖像
-                    bulla = Circle((x, y), size,
-                                facecolor='#C0A0A0',  # 較淺但仍暗淡的肺氣腫區域
-                                edgecolor='#A08080',  # 較深的邊緣
-                                alpha=0.85,
-                                linewidth=0.7)
-                    ax.add_patch(bulla)
-                    
-                    # 添加一些小的黑點以模擬焦油在肺氣腫區域的沉積
-                    for _ in range(3):
-                        spot_x = x + (random.random() - 0.5) * size * 1.5
-                        spot_y = y + (random.random() - 0.5) * size * 1.5
-                        
-                        # 確保點在主要的肺輪廓內
-                        if ((x < 5 and left_lung_path.contains_point((spot_x, spot_y))) or \
-                           (x >= 5 and right_lung_path.contains_point((spot_x, spot_y)))):
-                            small_tar = Circle((spot_x, spot_y), 0.05 + random.random() * 0.08,
-                                            facecolor='#000000',
-                                            alpha=0.8)
-                            ax.add_patch(small_tar)
-
-def generate_lung_svg(health_percentage):
+            ])
+            bulla_sides = (upper_bullae[:, 0] >= 5).astype(int)
+            keep = points_in_lungs(upper_bullae[:, 0], upper_bullae[:, 1], bulla_sides,
+                                   left_lung_path, right_lung_path)
+            bullae, bulla_sides = upper_bullae[keep], bulla_sides[keep]
+
+            # 添加一些小的黑點以模擬焦油在肺氣腫區域的沉積，每個氣腫泡3個
+            parent = np.repeat(np.arange(len(bullae)), 3)
+            bx, by, bsize = bullae[parent, 0], bullae[parent, 1], bullae[parent, 2]
+            spot_x = bx + (rng.random(len(parent)) - 0.5) * bsize * 1.5
+            spot_y = by + (rng.random(len(parent)) - 0.5) * bsize * 1.5
+            # 確保點在主要的肺輪廓內
+            spot_keep = points_in_lungs(spot_x, spot_y, bulla_sides[parent], left_lung_path, right_lung_path)
+            spot_size = 0.05 + rng.random(spot_keep.sum()) * 0.08
+
+            # 每個氣腫泡之後緊接其黑點；依所屬氣腫泡穩定排序以保持繪製順序
+            order = np.argsort(np.concatenate([np.arange(len(bullae)), parent[spot_keep]]), kind='stable')
+            is_bulla = np.arange(len(order)) < len(bullae)
+            draw_spot_layer(ax,
+                            np.concatenate([bullae[:, 0], spot_x[spot_keep]])[order],
+                            np.concatenate([bullae[:, 1], spot_y[spot_keep]])[order],
+                            np.concatenate([2 * bullae[:, 2], 2 * spot_size])[order],
+                            # 更深色的氣腫泡，更接近參考圖像(較淺但仍暗淡的肺氣腫區域，較深的邊緣)
+                            facecolors=np.where(is_bulla, '#C0A0A0', '#000000')[order],
+                            edgecolors=np.where(is_bulla, '#A08080', 'none')[order],
+                            alpha=np.where(is_bulla, 0.85, 0.8)[order],
+                            linewidths=np.where(is_bulla, 0.7, 0.0)[order])
+
+def create_lung_image(ax, health_percentage):
+    """
+    Create a realistic lung visualization on the given matplotlib axes.
+    
+    Parameters:
+    ax: matplotlib axes to draw on
+    health_percentage (float): Percentage of lung health (0-100)
+    """
+    lung_color, _ = get_lung_color(health_percentage)
+    left_lung, right_lung = draw_lung_base(ax, lung_color)
+    draw_lung_damage(ax, health_percentage, left_lung.get_path(), right_lung.get_path())
+
+class LungRenderer:
+    """
+    Reusable lung renderer built on the object-oriented Figure/FigureCanvasAgg API.
+
+    The figure, axes and static base layer (outlines, shading and bronchi) are built
+    once. Each render only recolours the lungs, adds the damage overlay, saves, and
+    removes the overlay again, so nothing goes through pyplot's global state. A
+    renderer serializes its own renders with a lock.
+    """
+
+    def __init__(self, figsize=(5, 5)):
+        self.figure = mfigure.Figure(figsize=figsize)
+        backend_agg.FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot()
+        self.ax.axis('off')
+        self.left_lung, self.right_lung = draw_lung_base(self.ax, get_lung_color(100)[0])
+        self._base_collections = len(self.ax.collections)
+        self._lock = threading.Lock()
+
+    def render(self, health_percentage, format='png', minify=False, quality='standard'):
+        """
+        Render one health level.
+
+        Parameters:
+        health_percentage (float): Percentage of lung health (0-100)
+        format (str): 'png', 'svg' or 'webp'
+        minify (bool): Pass SVG output through minify_svg (ignored for raster formats)
+        quality (str): One of QUALITY_TIERS
+
+        Returns:
+        bytes: Encoded image data
+        """
+        if format not in IMAGE_MIME_TYPES:
+            raise ValueError(f"Unsupported lung image format: {format}")
+        tier = get_quality_tier(quality)
+
+        with self._lock, self._overlay(health_percentage, tier):
+            buf = io.BytesIO()
+            self.figure.savefig(buf, format=format, dpi=tier['dpi'], bbox_inches='tight', transparent=True)
+
+        data = buf.getvalue()
+        if format == 'svg' and minify:
+            data = minify_svg(data)
+        return data
+
+    def render_rgba(self, health_percentage, quality='standard'):
+        """
+        Render one health level to a transparent RGBA pixel array cropped to the axes.
+
+        Unlike render(), every frame has the same size, which makes the result usable
+        as an animation frame or sprite cell.
+
+        Returns:
+        ndarray: (height, width, 4) uint8 array
+        """
+        tier = get_quality_tier(quality)
+        with self._lock, self._overlay(health_percentage, tier):
+            facecolor = self.figure.patch.get_facecolor()
+            dpi = self.figure.dpi
+            self.figure.patch.set_facecolor('none')
+            self.figure.set_dpi(tier['dpi'])
+            try:
+                self.figure.canvas.draw()
+                pixels = np.asarray(self.figure.canvas.buffer_rgba())
+                x0, y0, x1, y1 = np.round(self.ax.get_window_extent().extents).astype(int)
+            finally:
+                self.figure.patch.set_facecolor(facecolor)
+                self.figure.set_dpi(dpi)
+            height = pixels.shape[0]
+            return pixels[height - y1:height - y0, x0:x1].copy()
+
+    @contextmanager
+    def _overlay(self, health_percentage, tier):
+        # Recolour the lungs and draw the damage overlay for the duration of the block
+        lung_color, _ = get_lung_color(health_percentage)
+        self.left_lung.set_facecolor(lung_color)
+        self.right_lung.set_facecolor(lung_color)
+        try:
+            draw_lung_damage(self.ax, health_percentage,
+                             self.left_lung.get_path(), self.right_lung.get_path(),
+                             detail=tier['detail'])
+            for artist in (*self.ax.lines, *self.ax.patches, *self.ax.collections):
+                artist.set_antialiased(tier['antialiased'])
+            yield
+        finally:
+            for overlay in list(self.ax.collections[self._base_collections:]):
+                overlay.remove()
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+def get_renderer():
+    """Return the process-wide LungRenderer, creating it on first use"""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = LungRenderer()
+        return _renderer
+
+# MIME types of the output formats supported by generate_lung_svg
+IMAGE_MIME_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+    'webp': 'image/webp',
+}
+
+_SVG_PATH_RE = re.compile(r'<path d="([^"]*)"((?: clip-path="[^"]*")?) style="([^"]*)"/>')
+_SVG_NUMBER_RE = re.compile(r'-?\d+(?:\.\d+)?')
+_SVG_STROKE_WIDTH_RE = re.compile(r'stroke-width: ([\d.]+)')
+
+def _svg_number(value):
+    return f"{value:.2f}".rstrip('0').rstrip('.')
+
+def _svg_spot_use(d, style, unit_circle):
+    """
+    Return a <use> of the shared unit circle when the path d is an affine image
+    of it, or None when the path is some other shape.
+    """
+    if not d.lstrip().startswith('M') or d.count('C') != 8:
+        return None
+    numbers = np.array(_SVG_NUMBER_RE.findall(d), dtype=float)
+    if len(numbers) != 2 * len(unit_circle):
+        return None
+    points = numbers.reshape(-1, 2)
+
+    # Solve points = unit_circle @ A + t in the least-squares sense and check the fit
+    design = np.column_stack([unit_circle, np.ones(len(unit_circle))])
+    solution, _, _, _ = np.linalg.lstsq(design, points, rcond=None)
+    if np.abs(design @ solution - points).max() > 0.01:
+        return None
+    (a, b), (c, d_), (e, f) = solution
+
+    if 'stroke:' in style:
+        # The <use> transform also scales the stroke, so only uniformly scaled circles
+        # keep their edges; undo the scale on the stroke width (SVG's default is 1)
+        scale_x, scale_y = np.hypot(a, b), np.hypot(c, d_)
+        if abs(scale_x - scale_y) > 0.01 * scale_x:
+            return None
+        stroke = _SVG_STROKE_WIDTH_RE.search(style)
+        width = float(stroke.group(1)) if stroke else 1.0
+        if stroke:
+            style = style.replace(stroke.group(0), f"stroke-width: {width / scale_x:.4g}")
+        else:
+            style += f"; stroke-width: {width / scale_x:.4g}"
+
+    matrix = " ".join(_svg_number(v) if abs(v) >= 1 else f"{v:.4g}" for v in (a, b, c, d_, e, f))
+    return f'<use xlink:href="#spot" transform="matrix({matrix})" style="{style}"/>'
+
+def _minify_svg_collection(match, unit_circle):
+    opening, body = match.groups()
+    clip_paths = set(m.group(2) for m in _SVG_PATH_RE.finditer(body))
+    if len(clip_paths) != 1:
+        return match.group(0)
+
+    # A clip-path on a transformed <use> would be transformed with it, so the shared
+    # clip-path moves up to the collection group
+    clip_path = clip_paths.pop()
+    converted = []
+    for path in _SVG_PATH_RE.finditer(body):
+        use = _svg_spot_use(path.group(1), path.group(3), unit_circle)
+        if use is None:
+            return match.group(0)
+        converted.append(use)
+    return opening[:-1] + clip_path + '>' + ''.join(converted) + '</g>'
+
+def minify_svg(svg_data):
+    """
+    Shrink Matplotlib SVG output.
+
+    Drops metadata and indentation, rounds path coordinates to 0.01 pt, and replaces
+    every spot of an EllipseCollection with a <use> of one unit circle shared through
+    <defs>, so each spot costs a transform matrix instead of eight Bezier segments.
+
+    Parameters:
+    svg_data (bytes): SVG document produced by savefig(format='svg')
+
+    Returns:
+    bytes: Minified SVG document
+    """
+    svg = svg_data.decode('utf-8')
+    svg = re.sub(r'<\?xml[^>]*\?>\s*<!DOCTYPE[^>]*>', '', svg, count=1)
+    svg = re.sub(r'<metadata>.*?</metadata>', '', svg, count=1, flags=re.S)
+
+    unit_circle = mpath.Path.unit_circle().vertices[:-1]
+    svg = re.sub(r'(<g id="EllipseCollection_\d+">)(.*?)</g>',
+                 lambda m: _minify_svg_collection(m, unit_circle), svg, flags=re.S)
+
+    def round_path(match):
+        d = _SVG_NUMBER_RE.sub(lambda m: _svg_number(float(m.group(0))), match.group(1))
+        return f'<path d="{" ".join(d.split())}"{match.group(2)} style="{match.group(3)}"/>'
+
+    svg = _SVG_PATH_RE.sub(round_path, svg)
+
+    unit_d = "M" + " ".join(f"{x:.4g} {y:.4g}" for x, y in unit_circle[:1])
+    unit_d += "C" + " ".join(f"{x:.4g} {y:.4g}" for x, y in unit_circle[1:]) + "z"
+    svg = svg.replace('<defs>', f'<defs><path id="spot" d="{unit_d}"/>', 1)
+    svg = re.sub(r'>\s+<', '><', svg).strip()
+    return svg.encode('utf-8')
+
+def get_quality_tier(quality):
+    """Return the QUALITY_TIERS settings for a tier name"""
+    try:
+        return QUALITY_TIERS[quality]
+    except KeyError:
+        raise ValueError(f"Unknown lung render quality: {quality}") from None
+
+def render_lung_image(health_percentage, format='png', minify=False, quality='standard'):
+    """
+    Render the lung visualization to image bytes without any caching.
+
+    Parameters:
+    health_percentage (float): Percentage of lung health (0-100)
+    format (str): 'png', 'svg' or 'webp'
+    minify (bool): Pass SVG output through minify_svg (ignored for raster formats)
+    quality (str): 'thumbnail', 'standard' or 'high' (see QUALITY_TIERS)
+
+    Returns:
+    bytes: Encoded image data
+    """
+    return get_renderer().render(health_percentage, format=format, minify=minify, quality=quality)
+
+def render_options(format='png', minify=True, quality='standard'):
+    """Return the cache options for a render; minify only applies to SVG"""
+    get_quality_tier(quality)
+    options = {'format': format, 'quality': quality}
+    if format == 'svg':
+        options['minify'] = minify
+    return options
+
+def generate_lung_svg(health_percentage, use_cache=True, format='png', minify=True, raw=False,
+                      quality='standard'):
     """
     Generate a lung visualization based on health percentage using Matplotlib.
     
     Parameters:
     health_percentage (float): Percentage of lung health (0-100)
+    use_cache (bool): Serve repeat requests from the render cache. Cached renders
+        are drawn at the quantized (integer) health level.
+    format (str): 'png', 'svg' (native vector output) or 'webp'
+    minify (bool): Minify SVG output with shared <defs> for the spot shapes
+    raw (bool): Return the encoded image bytes instead of an HTML img tag
+    quality (str): 'thumbnail', 'standard' or 'high' level of detail (see QUALITY_TIERS)
     
     Returns:
-    str: HTML img tag with the lung visualization
+    str: HTML img tag with the lung visualization as a data URI, or
+    bytes: The encoded image when raw is True
     """
-    # Create a figure
-    fig, ax = plt.subplots(figsize=(5, 5))
-    ax.axis('off')
-    
-    # Create the lung image
-    create_lung_image(ax, health_percentage)
+    options = render_options(format, minify, quality)
+    if use_cache:
+        level = quantize_health(health_percentage)
+        image_data = _render_cache.get_or_render(level, options, lambda: render_lung_image(level, **options))
+    else:
+        image_data = render_lung_image(health_percentage, **options)
+
+    if raw:
+        return image_data
     
     # Convert plot to base64 image
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', bbox_inches='tight', transparent=True)
-    buf.seek(0)
-    img_str = base64.b64encode(buf.read()).decode('utf-8')
-    plt.close(fig)
+    img_str = base64.b64encode(image_data).decode('utf-8')
     
     # Return an HTML img tag with the visualization
-    return f'<img src="data:image/png;base64,{img_str}" alt="Lung visualization" width="300">'
+    width = QUALITY_TIERS[quality]['width']
+    return f'<img src="data:{IMAGE_MIME_TYPES[format]};base64,{img_str}" alt="Lung visualization" width="{width}">'
+
+# Output formats of render_lung_sequence and their MIME types
+SEQUENCE_MIME_TYPES = {
+    'webp': 'image/webp',
+    'apng': 'image/apng',
+    'sprite': 'image/png',
+}
+
+# File extensions of sequences stored in the disk tier
+SEQUENCE_EXTENSIONS = {
+    'webp': 'webp',
+    'apng': 'png',
+    'sprite': 'png',
+}
+
+def render_lung_sequence(start=100, stop=0, step=-1, format='webp', snap_to_bands=False,
+                         frame_duration=80, sprite_columns=10, quality='standard'):
+    """
+    Render a range of health levels in one pass over the shared renderer.
+
+    Identical frames are stored once, and by default every frame matches the image
+    generate_lung_svg returns for that level. With snap_to_bands every level is drawn at
+    the lower bound of its colour band (see LUNG_COLOR_BANDS), so all levels of a band
+    collapse into a single frame; 100% keeps its own frame because it has no damage.
+
+    Parameters:
+    start, stop, step (int): Health levels to cover, stop included
+    format (str): 'webp' (animated WebP), 'apng' (animated PNG) or 'sprite' (PNG sheet)
+    snap_to_bands (bool): Draw each level at its band's lower bound (smaller output,
+        but frames no longer match the individual level images)
+    frame_duration (int): Milliseconds each level stays on screen in animations
+    sprite_columns (int): Number of cells per row in the sprite sheet
+    quality (str): One of QUALITY_TIERS; 'thumbnail' suits mobile scrubbing
+
+    Returns:
+    dict: {'data': bytes, 'mime_type': str, 'frame_width': int, 'frame_height': int,
+           'frame_count': int, 'levels': [{'level', 'frame', and 'time' (ms) for
+           animations or 'x'/'y' (px offset) for sprites}]}
+
+    Raises:
+    ValueError: Unsupported format, or a range that covers no levels
+    """
+    if format not in SEQUENCE_MIME_TYPES:
+        raise ValueError(f"Unsupported lung sequence format: {format}")
+    if step == 0:
+        raise ValueError("Lung sequence step must not be zero")
+    level_range = range(start, stop + (1 if step > 0 else -1), step)
+    if not level_range:
+        raise ValueError(f"Lung sequence range start={start}, stop={stop}, step={step} covers no levels")
+    from PIL import Image
+
+    renderer = get_renderer()
+    # Frames are converted (sprite: pasted into the sheet) as soon as they are drawn,
+    # so only the encoder's own input is kept rather than every pixel array
+    images = []
+    sheet = None
+    columns = min(sprite_columns, len(level_range))
+    frame_ids = {}
+    drawn_levels = {}
+    level_frames = []
+    for level in level_range:
+        draw_level = level if level >= 100 or not snap_to_bands else health_band(level)
+        if draw_level not in drawn_levels:
+            pixels = renderer.render_rgba(draw_level, quality)
+            digest = hashlib.sha1(pixels.tobytes()).digest()
+            if digest not in frame_ids:
+                frame = frame_ids[digest] = len(frame_ids)
+                image = Image.fromarray(pixels, 'RGBA')
+                if format != 'sprite':
+                    images.append(image)
+                else:
+                    if sheet is None:
+                        # Sized for the worst case (no duplicate frames) and cropped below
+                        frame_width, frame_height = image.size
+                        rows = -(-len(level_range) // columns)
+                        sheet = Image.new('RGBA', (columns * frame_width, rows * frame_height), (0, 0, 0, 0))
+                    sheet.paste(image, ((frame % columns) * frame_width, (frame // columns) * frame_height))
+            drawn_levels[draw_level] = frame_ids[digest]
+        level_frames.append((level, drawn_levels[draw_level]))
+
+    frame_count = len(frame_ids)
+    levels = []
+    buf = io.BytesIO()
+
+    if format == 'sprite':
+        used_columns = min(columns, frame_count)
+        rows = -(-frame_count // columns)
+        if sheet.size != (used_columns * frame_width, rows * frame_height):
+            sheet = sheet.crop((0, 0, used_columns * frame_width, rows * frame_height))
+        sheet.save(buf, format='PNG', optimize=True)
+        for level, frame in level_frames:
+            levels.append({'level': level, 'frame': frame,
+                           'x': (frame % columns) * frame_width, 'y': (frame // columns) * frame_height})
+    else:
+        # Merge runs of the same frame into one animation frame with a longer duration
+        runs = []
+        for level, frame in level_frames:
+            if runs and runs[-1][0] == frame:
+                runs[-1][1] += frame_duration
+            else:
+                runs.append([frame, frame_duration])
+            levels.append({'level': level, 'frame': len(runs) - 1,
+                           'time': sum(duration for _, duration in runs) - frame_duration})
+        frame_width, frame_height = images[0].size
+        animation = [images[frame] for frame, _ in runs]
+        save_options = dict(save_all=True, append_images=animation[1:],
+                            duration=[duration for _, duration in runs], loop=0)
+        if format == 'webp':
+            animation[0].save(buf, format='WEBP', **save_options)
+        else:
+            animation[0].save(buf, format='PNG', disposal=1, **save_options)
+
+    return {
+        'data': buf.getvalue(),
+        'mime_type': SEQUENCE_MIME_TYPES[format],
+        'frame_width': frame_width,
+        'frame_height': frame_height,
+        'frame_count': frame_count if format == 'sprite' else len(runs),
+        'levels': levels,
+    }
@@ -2,28 +2,255 @@
 """
 主程式模塊：廖貫呈的個人作品集
 """
-from flask import Flask, render_template
+import functools
+import json
+import math
+import os
+from flask import Flask, Response, abort, jsonify, render_template, request, url_for
+import advice_jobs
+import gemini_assistant
+import http_cache
+import local_advice
+import lung_svg_generator
+import metrics
+import page_cache
+import project_pages
 import utils
 
 app = Flask(__name__)
 app.secret_key = "your_secret_key_here"
 
+# 設定後以背景執行緒監看data.txt，請求路徑不再檢查文件
+if os.environ.get('PROJECT_DATA_WATCH_INTERVAL'):
+    utils.project_data_loader.start_watcher(float(os.environ['PROJECT_DATA_WATCH_INTERVAL']))
+
 @app.route('/')
+@http_cache.page('index.html')
+@page_cache.page('index.html')
 def home():
     """渲染首頁"""
     return render_template('index.html')
 
 @app.route('/slideshow')
+@http_cache.page('slideshow.html')
+@page_cache.page('slideshow.html')
 def slideshow():
     """渲染幻燈片頁面"""
     return render_template('slideshow.html')
 
 @app.route('/projects')
+@http_cache.page('projects.html', data=True)
+@page_cache.page('projects.html', data=True)
 def projects():
-    """渲染專案頁面"""
-    # 從utils模塊獲取專案數據
-    project_data = utils.get_project_data()
-    return render_template('projects.html', projects=project_data)
+    """渲染專案頁面(伺服器端篩選與分頁)"""
+    return project_pages.render_projects()
+
+@app.route('/api/projects')
+@http_cache.conditional(http_cache.project_data_paths)
+def projects_api():
+    """以JSON提供篩選後的一頁專案"""
+    _, filters, page = project_pages.get_project_page()
+    return jsonify({
+        "projects": [project.to_dict() for project in page.items],
+        "page": page.page,
+        "per_page": page.per_page,
+        "total": page.total,
+        "pages": page.pages,
+        "filters": filters,
+    })
+
+def get_lung_quality():
+    """從查詢參數讀取肺部圖像畫質(thumbnail、standard、high)"""
+    quality = request.args.get('quality', 'standard')
+    if quality not in lung_svg_generator.QUALITY_TIERS:
+        abort(400)
+    return quality
+
+@app.route('/lung/<int:level>.<any(png, svg, webp):image_format>')
+def lung_image(level, image_format):
+    """提供可快取的肺部健康圖像，頁面以URL引用而非內嵌base64"""
+    if level > 100:
+        abort(404)
+    quality = get_lung_quality()
+
+    def render():
+        image_data = lung_svg_generator.generate_lung_svg(level, format=image_format, raw=True, quality=quality)
+        return Response(image_data, mimetype=lung_svg_generator.IMAGE_MIME_TYPES[image_format])
+
+    return http_cache.image_response(render)
+
+# 請求中只即時渲染這些畫質的序列；high需要數十秒與數百MB記憶體，只提供prerender_lungs.py預先渲染的檔案
+ONLINE_SEQUENCE_QUALITIES = ('thumbnail', 'standard')
+
+def get_sequence_quality(kind):
+    """讀取序列的畫質，不能即時渲染且沒有預先渲染的檔案時返回404"""
+    quality = get_lung_quality()
+    if quality not in ONLINE_SEQUENCE_QUALITIES:
+        paths = lung_svg_generator.get_render_cache().sequence_paths(kind, quality)
+        if paths is None or not all(os.path.exists(path) for path in paths):
+            abort(404)
+    return quality
+
+@functools.lru_cache(maxsize=len(lung_svg_generator.SEQUENCE_MIME_TYPES) * len(lung_svg_generator.QUALITY_TIERS))
+def get_lung_sequence(kind, quality):
+    """返回100%至0%的肺部退化序列：優先讀取預先渲染的檔案，否則渲染一次並寫入磁碟快取"""
+    render_cache = lung_svg_generator.get_render_cache()
+    sequence = render_cache.read_sequence(kind, quality)
+    if sequence is None:
+        sequence = lung_svg_generator.render_lung_sequence(format=kind, quality=quality)
+        render_cache.write_sequence(kind, quality, sequence)
+    return sequence
+
+@app.route('/lung/sequence/<any(webp, apng, sprite):kind>')
+def lung_sequence(kind):
+    """提供肺部退化動畫(WebP/APNG)或精靈圖，客戶端一次下載即可流暢拖曳"""
+    quality = get_sequence_quality(kind)
+
+    def render():
+        sequence = get_lung_sequence(kind, quality)
+        return Response(sequence['data'], mimetype=sequence['mime_type'])
+
+    return http_cache.image_response(render)
+
+@app.route('/lung/sequence/<any(webp, apng, sprite):kind>/index')
+def lung_sequence_index(kind):
+    """提供序列的索引：每個健康度對應的影格與時間點或精靈圖位移"""
+    quality = get_sequence_quality(kind)
+
+    def render():
+        sequence = get_lung_sequence(kind, quality)
+        return jsonify({key: value for key, value in sequence.items() if key != 'data'})
+
+    return http_cache.image_response(render)
+
+# 建議所需的數值欄位與允許範圍
+ADVICE_FIELD_RANGES = {
+    'cigarettes_per_day': (0, 200),
+    'years_smoking': (0, 100),
+    'health_percentage': (0, 100),
+}
+ADVICE_FIELDS = tuple(ADVICE_FIELD_RANGES)
+ADVICE_PARAMS_ERROR = ("需要數值欄位: " + "、".join(f"{field}({low}-{high})"
+                                                  for field, (low, high) in ADVICE_FIELD_RANGES.items())
+                       + f"；mode(可選)須為 {', '.join(gemini_assistant.ADVICE_MODES)}")
+
+def parse_advice_params(source):
+    """從JSON或查詢參數讀取建議所需的數值欄位，缺少或格式錯誤時返回None"""
+    try:
+        params = {field: float(source[field]) for field in ADVICE_FIELDS}
+    except (KeyError, TypeError, ValueError):
+        return None
+    # 拒絕nan、inf與超出範圍的數值，避免後續計算失敗
+    for field, (low, high) in ADVICE_FIELD_RANGES.items():
+        if not math.isfinite(params[field]) or not low <= params[field] <= high:
+            return None
+    if isinstance(source.get('additional_info'), dict):
+        params['additional_info'] = source['additional_info']
+    if source.get('mode'):
+        if source['mode'] not in gemini_assistant.ADVICE_MODES:
+            return None
+        params['mode'] = source['mode']
+    return params
+
+def sse_event(event, data):
+    """格式化一則server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route('/api/advice/local')
+def advice_local():
+    """以本地規則引擎即時產生建議(不呼叫Gemini)"""
+    params = parse_advice_params(request.args)
+    if params is None:
+        return jsonify({"error": ADVICE_PARAMS_ERROR}), 400
+    return jsonify(local_advice.generate_local_advice(
+        params['cigarettes_per_day'], params['years_smoking'], params['health_percentage']))
+
+@app.route('/api/advice/jobs', methods=['POST'])
+def submit_advice_job():
+    """提交AI建議工作，立即返回工作ID而不等待Gemini回應"""
+    params = parse_advice_params(request.get_json(silent=True) or {})
+    if params is None:
+        return jsonify({"error": ADVICE_PARAMS_ERROR}), 400
+
+    try:
+        job = advice_jobs.get_job_queue().submit(**params)
+    except advice_jobs.QueueFull as e:
+        return jsonify({"error": str(e)}), 503, {'Retry-After': '5'}
+
+    status_url = url_for('advice_job_status', job_id=job.id)
+    return jsonify({
+        "id": job.id,
+        "status": job.status,
+        "status_url": status_url,
+        "events_url": url_for('advice_job_events', job_id=job.id),
+    }), 202, {'Location': status_url}
+
+def get_advice_job(job_id):
+    job = advice_jobs.get_job_queue().get(job_id)
+    if job is None:
+        abort(404)
+    return job
+
+@app.route('/api/advice/jobs/<job_id>')
+def advice_job_status(job_id):
+    """查詢建議工作狀態，完成後包含結果"""
+    return jsonify(get_advice_job(job_id).to_dict())
+
+@app.route('/api/advice/jobs/<job_id>/events')
+def advice_job_events(job_id):
+    """
+    以server-sent events推送建議工作的狀態變化，直到完成
+
+    連線在整個工作期間佔用一個工作者：同步(sync)的gunicorn工作者請改用輪詢狀態端點，
+    SSE需搭配gevent等非同步工作者(gunicorn -k gevent)
+    """
+    job = get_advice_job(job_id)
+    queue = advice_jobs.get_job_queue()
+
+    def stream():
+        current, version = job, -1
+        while True:
+            current = queue.wait_for_change(current, version, timeout=15)
+            if current is None:
+                # 工作已過期並被清除
+                break
+            if current.version == version:
+                # 保持連線，避免代理伺服器因閒置而中斷
+                yield ": keep-alive\n\n"
+                continue
+            version = current.version
+            state = current.to_dict()
+            yield sse_event(state['status'], state)
+            if current.finished:
+                break
+
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@app.route('/api/advice/stream')
+def advice_stream():
+    """以server-sent events串流AI建議：先推送本地建議(preview事件)，每個AI欄位一完成就推送(section事件)，最後推送done事件"""
+    params = parse_advice_params(request.args)
+    if params is None:
+        return jsonify({"error": ADVICE_PARAMS_ERROR}), 400
+    def stream():
+        if gemini_assistant.resolve_advice_mode(params.get('mode')) != 'local':
+            # 先推送本地引擎的結果作為即時的初步內容，AI的欄位隨後逐一取代
+            preview = local_advice.generate_local_advice(
+                params['cigarettes_per_day'], params['years_smoking'], params['health_percentage'])
+            yield sse_event('preview', preview)
+        for name, value in gemini_assistant.stream_personalized_advice(**params):
+            if name == 'done':
+                yield sse_event('done', value)
+            else:
+                yield sse_event('section', {"name": name, "value": value})
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """以Prometheus文字格式輸出本工作者行程的指標"""
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
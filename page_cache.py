@@ -0,0 +1,153 @@
+"""
+頁面快取：在Jinja路由前保留整個回應內容的記憶體LRU，命中時完全不經過模板渲染
+
+鍵為路由與查詢參數，每個條目記錄渲染時的版本戳記(http_cache.version_stamp)；
+模板或專案資料文件改變後戳記不同，條目在下一次查詢時自動失效並重新渲染。
+串流回應(例如data.jsonl的/projects)邊輸出邊保留內容，完整送出後才存入快取。
+"""
+import functools
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from flask import Response, make_response, request
+
+import http_cache
+import metrics
+
+# (版本戳記, 內容, Content-Type)
+Entry = Tuple[str, bytes, str]
+
+
+class PageCache:
+    """
+    有上限的LRU頁面快取
+
+    參數:
+    maxsize: 最多保留的頁面數，0時停用
+    max_entry_bytes: 超過此大小的頁面不快取
+    """
+
+    def __init__(self, maxsize: int = 128, max_entry_bytes: int = 1024 * 1024):
+        self.maxsize = maxsize
+        self.max_entry_bytes = max_entry_bytes
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[str, Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, stamp: str) -> Optional[Entry]:
+        """查詢快取，條目的版本戳記與stamp不同時視為失效並移除"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] != stamp:
+                del self._entries[key]
+                self.invalidations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key: str, stamp: str, body: bytes, content_type: str) -> None:
+        if self.maxsize <= 0 or len(body) > self.max_entry_bytes:
+            return
+        with self._lock:
+            self._entries[key] = (stamp, body, content_type)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """返回命中/未命中統計"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+    def clear(self) -> None:
+        """清除所有條目與統計"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.invalidations = 0
+
+
+page_cache = PageCache(
+    maxsize=int(os.environ.get("PAGE_CACHE_SIZE", "128")),
+    max_entry_bytes=int(os.environ.get("PAGE_CACHE_MAX_ENTRY_BYTES", str(1024 * 1024))),
+)
+
+metrics.FunctionMetric(
+    "page_cache_requests_total", "Rendered-page cache lookups by result",
+    lambda: {(result,): page_cache.stats()[field]
+             for result, field in (("hit", "hits"), ("miss", "misses"))},
+    labelnames=("result",), metric_type="counter")
+metrics.FunctionMetric(
+    "page_cache_invalidations_total", "Cached pages dropped because a template or data file changed",
+    lambda: {(): page_cache.stats()["invalidations"]}, metric_type="counter")
+metrics.FunctionMetric(
+    "page_cache_entries", "Entries in the rendered-page cache",
+    lambda: {(): page_cache.stats()["size"]})
+
+
+def _tee(chunks: Iterable, charset: str, store: Callable[[bytes], None]) -> Iterator:
+    # 客戶端中途斷線時產生器在yield處被關閉，不完整的內容不會存入快取
+    body = []
+    for chunk in chunks:
+        body.append(chunk.encode(charset) if isinstance(chunk, str) else chunk)
+        yield chunk
+    store(b"".join(body))
+
+
+def cached(sources: Callable[[], Iterable[str]], cache: PageCache = page_cache):
+    """
+    以路由、查詢參數與sources的版本戳記快取視圖的200回應
+
+    參數:
+    sources: 返回決定輸出內容之文件路徑的函數(與http_cache.conditional相同)
+    cache: 使用的PageCache
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if cache.maxsize <= 0:
+                return view(*args, **kwargs)
+            stamp, _ = http_cache.version_stamp(sources())
+            key = f"{request.endpoint}|{request.full_path}"
+            entry = cache.get(key, stamp)
+            if entry is not None:
+                return Response(entry[1], content_type=entry[2])
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+            def store(body):
+                cache.set(key, stamp, body, response.content_type)
+
+            if response.is_streamed:
+                response.response = _tee(response.response, "utf-8", store)
+            else:
+                store(response.get_data())
+            return response
+        return wrapper
+    return decorator
+
+
+def page(*templates: str, data: bool = False, cache: PageCache = page_cache):
+    """
+    頁面路由的快取
+
+    參數:
+    templates: 視圖渲染的模板
+    data: 輸出是否取決於專案資料
+    """
+    return cached(http_cache.page_sources(*templates, data=data), cache)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+預先渲染肺部健康圖像：將0-100每個整數健康度的肺部圖像輸出到版本化的資源目錄
+
+輸出目錄結構與lung_svg_generator的磁碟快取相同:
+    <output_dir>/<RENDER_VERSION>/lung_000.png ... lung_100.png
+    <output_dir>/<RENDER_VERSION>/sequence_<種類>_<畫質>.<副檔名> 與 .json 索引(--sequences)
+    <output_dir>/<RENDER_VERSION>/manifest.json
+
+部署時設定 LUNG_RENDER_CACHE_DIR=<output_dir>，請求路徑便只需讀取檔案而不必即時渲染。
+
+用法:
+    python prerender_lungs.py --output-dir static/lungs --formats png,svg --workers 4
+    python prerender_lungs.py --formats png --sequences webp,sprite --qualities thumbnail,standard,high
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import lung_svg_generator
+
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'lungs')
+
+
+def render_level(level, formats, output_dir, qualities=('standard',)):
+    """
+    在工作行程中渲染單一健康度的所有格式並寫入檔案
+
+    Matplotlib不是執行緒安全的，因此每個健康度都在獨立的行程中渲染
+
+    Returns:
+        tuple: (健康度, {格式: 檔案資訊})
+    """
+    # 使用與請求路徑相同的渲染選項與檔名，讓磁碟快取可直接讀取這些檔案
+    layout = lung_svg_generator.LungRenderCache(cache_dir=output_dir)
+    entries = {}
+    for image_format, quality in [(f, q) for q in qualities for f in formats]:
+        options = lung_svg_generator.render_options(image_format, quality=quality)
+        data = lung_svg_generator.render_lung_image(level, **options)
+        path = layout.disk_path(level, options)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+        key = image_format if quality == 'standard' else f"{image_format}@{quality}"
+        entries[key] = {
+            "file": os.path.basename(path),
+            "bytes": len(data),
+            "sha256": hashlib.sha256(data).hexdigest(),
+        }
+    return level, entries
+
+
+def render_sequence(kind, quality, output_dir):
+    """
+    在工作行程中渲染100%至0%的肺部退化序列並寫入磁碟快取
+
+    high畫質的序列在請求中渲染需要數十秒，main.py只提供以此預先渲染的檔案
+
+    Returns:
+        tuple: (種類, 畫質, 檔案資訊)
+    """
+    layout = lung_svg_generator.LungRenderCache(cache_dir=output_dir)
+    sequence = lung_svg_generator.render_lung_sequence(format=kind, quality=quality)
+    layout.write_sequence(kind, quality, sequence)
+    data = sequence['data']
+    return kind, quality, {
+        "file": os.path.basename(layout.sequence_paths(kind, quality)[0]),
+        "bytes": len(data),
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "frame_count": sequence['frame_count'],
+    }
+
+
+def prerender(output_dir=DEFAULT_OUTPUT_DIR, formats=('png', 'svg'), workers=None, levels=range(101),
+              qualities=('standard',), sequences=()):
+    """
+    渲染所有健康度(以及sequences列出的序列種類)並寫出manifest.json
+
+    Returns:
+        dict: manifest內容
+    """
+    version_dir = os.path.join(output_dir, lung_svg_generator.RENDER_VERSION)
+    os.makedirs(version_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    results = {}
+    sequence_results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(render_level, level, tuple(formats), output_dir, tuple(qualities)) for level in levels]
+        sequence_futures = [executor.submit(render_sequence, kind, quality, output_dir)
+                            for kind in sequences for quality in qualities]
+        for future in as_completed(futures):
+            level, entries = future.result()
+            results[level] = entries
+        for future in as_completed(sequence_futures):
+            kind, quality, entry = future.result()
+            sequence_results[f"{kind}@{quality}"] = entry
+
+    manifest = {
+        "render_version": lung_svg_generator.RENDER_VERSION,
+        "formats": list(formats),
+        "qualities": list(qualities),
+        "generated_at": int(time.time()),
+        "levels": {str(level): results[level] for level in sorted(results)},
+        "sequences": {key: sequence_results[key] for key in sorted(sequence_results)},
+    }
+    with open(os.path.join(version_dir, 'manifest.json'), 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+
+    print(f"已渲染 {len(results)} 個健康度 ({', '.join(formats)})、{len(sequence_results)} 個序列，"
+          f"耗時 {time.perf_counter() - started:.1f} 秒 -> {version_dir}")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="預先渲染0-100所有健康度的肺部圖像")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help="資源輸出目錄")
+    parser.add_argument('--formats', default='png,svg', help="以逗號分隔的輸出格式(png、svg、webp)")
+    parser.add_argument('--qualities', default='standard', help="以逗號分隔的畫質(thumbnail、standard、high)")
+    parser.add_argument('--sequences', default='', help="一併渲染的退化序列，以逗號分隔(webp、apng、sprite)，每個畫質各一份")
+    parser.add_argument('--workers', type=int, default=None, help="工作行程數(預設為CPU核心數)")
+    args = parser.parse_args()
+
+    formats = [f.strip() for f in args.formats.split(',') if f.strip()]
+    qualities = [q.strip() for q in args.qualities.split(',') if q.strip()]
+    sequences = [kind.strip() for kind in args.sequences.split(',') if kind.strip()]
+    prerender(args.output_dir, formats, args.workers, qualities=qualities, sequences=sequences)
+
+
+if __name__ == '__main__':
+    main()
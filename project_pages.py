@@ -0,0 +1,65 @@
+"""
+專案頁面的共用視圖邏輯：main.py與app.py的/projects(以及/api/projects)以相同方式讀取查詢參數、篩選與分頁
+"""
+from flask import render_template, request, stream_template
+
+import catalog
+import utils
+
+
+def request_filters():
+    """
+    從查詢參數讀取篩選條件
+
+    Returns:
+        dict: {'category': [...], 'tech': [...], 'q': 標題關鍵字}
+    """
+    return {
+        'category': request.args.getlist('category'),
+        'tech': request.args.getlist('tech'),
+        'q': request.args.get('q', ''),
+    }
+
+
+def request_pagination():
+    """
+    Returns:
+        tuple: 查詢參數中的(頁碼, 每頁專案數)
+    """
+    return (request.args.get('page', 1, type=int),
+            request.args.get('per_page', catalog.DEFAULT_PER_PAGE, type=int))
+
+
+def get_project_page():
+    """依查詢參數(category、tech、q、page、per_page)篩選並分頁專案"""
+    filters = request_filters()
+    project_catalog = catalog.get_catalog()
+    results = project_catalog.search(filters['category'], filters['tech'], filters['q'])
+    page = project_catalog.paginate(results, *request_pagination())
+    return project_catalog, filters, page
+
+
+def stream_projects():
+    """
+    逐行讀取data.jsonl並串流輸出頁面：第一張卡片不必等整個文件解析完成，記憶體也不隨專案數增加
+
+    分類按鈕不顯示專案數，分頁在所有卡片輸出後才計算
+    """
+    filters = request_filters()
+    page = catalog.StreamedPage(
+        utils.iter_project_lines(),
+        catalog.ProjectFilter(filters['category'], filters['tech'], filters['q']),
+        *request_pagination(),
+    )
+    categories = [(category, label, None) for category, label in catalog.CATEGORY_LABELS.items()]
+    return stream_template('projects.html', projects=page, page=page, filters=filters,
+                           categories=categories, category_labels=catalog.CATEGORY_LABELS)
+
+
+def render_projects():
+    """渲染專案頁面：data.jsonl存在時串流輸出，否則使用data.txt的索引目錄"""
+    if utils.has_project_lines():
+        return stream_projects()
+    project_catalog, filters, page = get_project_page()
+    return render_template('projects.html', projects=page.items, page=page, filters=filters,
+                           categories=project_catalog.categories(), category_labels=catalog.CATEGORY_LABELS)
@@ -0,0 +1,177 @@
+"""
+外部服務呼叫的韌性工具：每次呼叫的時間預算、帶抖動的重試與斷路器
+"""
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+# 視為暫時性錯誤的例外名稱(google.api_core的例外以名稱比對，不需匯入SDK)
+TRANSIENT_ERROR_NAMES = {
+    "DeadlineExceeded",
+    "ServiceUnavailable",
+    "TooManyRequests",
+    "ResourceExhausted",
+    "InternalServerError",
+    "GatewayTimeout",
+    "Aborted",
+}
+
+
+class CircuitOpenError(Exception):
+    """斷路器開啟中，呼叫未被送出"""
+
+
+class DeadlineExceededError(TimeoutError):
+    """已用完呼叫的時間預算"""
+
+
+def is_transient(error: BaseException) -> bool:
+    """判斷錯誤是否值得重試"""
+    if isinstance(error, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+        return True
+    return type(error).__name__ in TRANSIENT_ERROR_NAMES
+
+
+class CircuitBreaker:
+    """
+    連續失敗達到門檻後開啟斷路器，在reset_timeout秒內直接拒絕呼叫；
+    之後進入半開狀態，只放行一次試探呼叫，成功則關閉、失敗則再次開啟
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """返回 "closed"、"open" 或 "half_open" """
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """是否允許送出呼叫(半開狀態下只允許一個試探呼叫)"""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+class RetryPolicy:
+    """
+    重試策略
+
+    參數:
+    attempts: 最多嘗試次數(含第一次)
+    base_delay: 退避基準秒數，第n次重試前最多等待 base_delay * 2**n 秒(full jitter)
+    max_delay: 單次等待上限
+    deadline: 整個呼叫(含重試與等待)的時間預算秒數
+    """
+
+    def __init__(self, attempts: int = 3, base_delay: float = 0.5, max_delay: float = 4, deadline: float = 20):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def backoff(self, retry: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+
+def call_with_resilience(
+    func: Callable[[float], Any],
+    breaker: CircuitBreaker,
+    policy: RetryPolicy,
+    retry_on: Callable[[BaseException], bool] = is_transient
+) -> Any:
+    """
+    在斷路器與重試策略保護下呼叫func
+
+    參數:
+    func: 接收本次嘗試剩餘秒數(應作為請求逾時)的函數
+    breaker: 斷路器
+    policy: 重試策略
+    retry_on: 判斷錯誤是否可重試的函數
+
+    返回:
+    func的回傳值；斷路器開啟時拋出CircuitOpenError，預算用完時拋出DeadlineExceededError
+    """
+    if not breaker.allow():
+        raise CircuitOpenError("上游服務暫時不可用")
+    give_up_at = time.monotonic() + policy.deadline
+    for attempt in range(policy.attempts):
+        remaining = give_up_at - time.monotonic()
+        if remaining <= 0:
+            breaker.record_failure()
+            raise DeadlineExceededError(f"超過 {policy.deadline} 秒的呼叫預算")
+        try:
+            result = func(remaining)
+        except Exception as e:
+            delay = policy.backoff(attempt)
+            if (attempt + 1 >= policy.attempts or not retry_on(e)
+                    or time.monotonic() + delay >= give_up_at):
+                breaker.record_failure()
+                raise
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
+
+
+async def call_with_resilience_async(
+    func: Callable[[float], Awaitable[Any]],
+    breaker: CircuitBreaker,
+    policy: RetryPolicy,
+    retry_on: Callable[[BaseException], bool] = is_transient
+) -> Any:
+    """call_with_resilience的asyncio版本，每次嘗試另外以asyncio.wait_for強制逾時"""
+    if not breaker.allow():
+        raise CircuitOpenError("上游服務暫時不可用")
+    loop = asyncio.get_running_loop()
+    give_up_at = loop.time() + policy.deadline
+    for attempt in range(policy.attempts):
+        remaining = give_up_at - loop.time()
+        if remaining <= 0:
+            breaker.record_failure()
+            raise DeadlineExceededError(f"超過 {policy.deadline} 秒的呼叫預算")
+        try:
+            result = await asyncio.wait_for(func(remaining), remaining)
+        except Exception as e:
+            delay = policy.backoff(attempt)
+            if (attempt + 1 >= policy.attempts or not retry_on(e)
+                    or loop.time() + delay >= give_up_at):
+                breaker.record_failure()
+                raise
+            await asyncio.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
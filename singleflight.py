@@ -0,0 +1,139 @@
+"""
+請求合併(single-flight)：相同鍵的並行呼叫共用同一次上游呼叫與結果
+
+- 同一行程內的執行緒：由第一個呼叫者(leader)執行，其餘呼叫者等待並取得相同結果
+- 跨gunicorn工作者(可選)：leader另外取得以鍵命名的檔案鎖，取得鎖後先呼叫recheck
+  查詢共享的儲存(例如SQLite建議快取)，其他工作者已完成時便不再呼叫上游；
+  結果在釋放鎖之前交給store寫入共享的儲存，等待鎖的工作者醒來時recheck就能找到
+"""
+import asyncio
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows沒有fcntl，只做行程內合併
+    fcntl = None
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    參數:
+    lock_dir: 跨行程檔案鎖的目錄，None時只合併同一行程內的呼叫
+    """
+
+    def __init__(self, lock_dir: Optional[str] = None):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.shared = 0
+        self._calls: Dict[str, _Call] = {}
+        self._async_calls: Dict[str, "asyncio.Future[Any]"] = {}
+        self._lock = threading.Lock()
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    @contextmanager
+    def _file_lock(self, key: str) -> Iterator[None]:
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        with open(os.path.join(self.lock_dir, f"{name}.lock"), 'a') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def _lead(self, key: str, func: Callable[[], Any], recheck: Optional[Callable[[], Optional[Any]]],
+              store: Optional[Callable[[Any], None]]) -> Any:
+        if not self.lock_dir:
+            result = func()
+            if store is not None:
+                store(result)
+            return result
+        with self._file_lock(key):
+            if recheck is not None:
+                result = recheck()
+                if result is not None:
+                    return result
+            result = func()
+            if store is not None:
+                store(result)
+            return result
+
+    def do(self, key: str, func: Callable[[], Any],
+           recheck: Optional[Callable[[], Optional[Any]]] = None,
+           store: Optional[Callable[[Any], None]] = None) -> Tuple[Any, bool]:
+        """
+        執行func，或等待進行中的相同呼叫
+
+        參數:
+        key: 合併鍵(通常為正規化後的輸入)
+        func: 實際的上游呼叫
+        recheck: 取得跨行程鎖後呼叫，返回非None時直接作為結果(不呼叫func)
+        store: 以func的結果呼叫，在釋放跨行程鎖之前寫入共享的儲存
+
+        返回:
+        (結果, 是否共用了其他呼叫者的結果)；leader拋出的例外會傳給所有等待者
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = self._lead(key, func, recheck, store)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    async def do_async(self, key: str, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        do的asyncio版本，合併同一事件迴圈上的並行協程(不使用檔案鎖，避免阻塞事件迴圈)
+
+        返回:
+        (結果, 是否共用了其他呼叫者的結果)
+        """
+        future = self._async_calls.get(key)
+        if future is not None:
+            self.shared += 1
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._async_calls[key] = future
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 沒有等待者時避免"exception was never retrieved"警告
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            del self._async_calls[key]
@@ -0,0 +1,34 @@
+import functools
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def flask_app(request):
+    """以模板所在的專案根目錄建立test client(模板不在Flask預設的templates/目錄)"""
+    import page_cache
+
+    app = request.param.app
+    folder = app.template_folder
+    app.template_folder = ROOT
+    page_cache.page_cache.clear()
+    yield app
+    app.template_folder = folder
+    page_cache.page_cache.clear()
+
+
+@pytest.fixture
+def project_lines(tmp_path, monkeypatch):
+    """以data.txt轉換的data.jsonl副本，讓/projects改走串流路徑"""
+    import utils
+
+    path = str(tmp_path / "data.jsonl")
+    utils.export_project_lines(path)
+    monkeypatch.setattr(utils, "PROJECT_LINES_PATH", path)
+    monkeypatch.setattr(utils, "iter_project_lines", functools.partial(utils.iter_project_lines, path))
+    return path
@@ -0,0 +1,33 @@
+import asyncio
+import threading
+
+import advice_cache
+
+
+def test_async_disk_tier_access_runs_off_the_event_loop(tmp_path, monkeypatch):
+    cache = advice_cache.AdviceCache(db_path=str(tmp_path / "advice.db"))
+    threads = []
+    for name in ("get", "set"):
+        method = getattr(cache, name)
+
+        def record(*args, _method=method):
+            threads.append(threading.current_thread())
+            return _method(*args)
+
+        monkeypatch.setattr(cache, name, record)
+
+    async def compute():
+        return {"motivation": "m"}, True
+
+    async def run():
+        loop_thread = threading.current_thread()
+        first = await cache.aget_or_compute("key", compute)
+        second = await cache.aget_or_compute("key", compute)
+        return loop_thread, first, second
+
+    loop_thread, first, second = asyncio.run(run())
+    assert first == second == {"motivation": "m"}
+    assert len(threads) == 3
+    assert loop_thread not in threads
+    assert cache.stats()["hits"] == 1
+
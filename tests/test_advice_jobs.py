@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+import advice_jobs
+import main
+
+
+async def fake_runner(params):
+    await asyncio.sleep(0.05)
+    return {"motivation": f"{params['cigarettes_per_day']}"}
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """兩個共用同一個SQLite工作狀態的佇列，模擬兩個gunicorn工作者"""
+    db_path = str(tmp_path / "jobs.db")
+    return [advice_jobs.AdviceJobQueue(runner=fake_runner, store=advice_jobs.JobStore(db_path))
+            for _ in range(2)]
+
+
+def test_other_worker_sees_job_state(workers):
+    submitter, other = workers
+    job = submitter.submit(cigarettes_per_day=10)
+
+    snapshot = other.get(job.id)
+    assert snapshot is not None and snapshot.status in ("queued", "running")
+
+    latest = other.wait_for_change(snapshot, snapshot.version, timeout=5, poll_interval=0.01)
+    while not latest.finished:
+        latest = other.wait_for_change(latest, latest.version, timeout=5, poll_interval=0.01)
+    assert latest.to_dict()["result"] == {"motivation": "10"}
+    assert other.get("missing") is None
+
+
+def test_status_route_answers_from_shared_store(workers, monkeypatch):
+    submitter, other = workers
+    job = submitter.submit(cigarettes_per_day=3)
+    monkeypatch.setattr(advice_jobs, "_job_queue", other)
+
+    client = main.app.test_client()
+    assert client.get(f"/api/advice/jobs/{job.id}").status_code == 200
+    events = client.get(f"/api/advice/jobs/{job.id}/events").get_data(as_text=True)
+    assert "event: done" in events
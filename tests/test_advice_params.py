@@ -0,0 +1,20 @@
+import pytest
+
+import main
+
+VALID = {"cigarettes_per_day": "10", "years_smoking": "5", "health_percentage": "80"}
+
+
+@pytest.mark.parametrize("field", list(VALID))
+@pytest.mark.parametrize("value", ["nan", "inf", "-inf", "1e308", "-1", "abc"])
+def test_invalid_numbers_are_rejected(field, value):
+    client = main.app.test_client()
+    params = dict(VALID, **{field: value})
+    assert client.get("/api/advice/local", query_string=params).status_code == 400
+    assert client.post("/api/advice/jobs", json=params).status_code == 400
+
+
+def test_valid_numbers_are_accepted():
+    response = main.app.test_client().get("/api/advice/local", query_string=VALID)
+    assert response.status_code == 200
+    assert "health_risks" in response.get_json()
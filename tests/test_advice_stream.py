@@ -0,0 +1,96 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import gemini_assistant
+import gemini_stub
+import local_advice
+import resilience
+
+VALID_ADVICE = {
+    "health_risks": ["風險"],
+    "quit_strategies": ["策略"],
+    "recovery_timeline": {"一週後": "描述"},
+    "medical_stats": ["統計"],
+    "motivation": "加油",
+}
+
+
+class FakeModel:
+    def __init__(self, text):
+        self.text = text
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        if not stream:
+            return SimpleNamespace(text=self.text)
+        # 每次送出幾個字元，模擬串流區塊
+        return [SimpleNamespace(text=self.text[i:i + 7]) for i in range(0, len(self.text), 7)]
+
+
+@pytest.fixture
+def legacy_stream(monkeypatch):
+    monkeypatch.setattr(gemini_assistant, "GEMINI_STRUCTURED_OUTPUT", False)
+    gemini_assistant.advice_cache.clear()
+    monkeypatch.setattr(gemini_assistant, "gemini_breaker", resilience.CircuitBreaker())
+
+    def run(text):
+        monkeypatch.setattr(gemini_assistant, "_get_model", lambda: FakeModel(text))
+        events = list(gemini_assistant.stream_personalized_advice(10, 5, 80, mode="llm"))
+        key = gemini_assistant.make_advice_cache_key(10, 5, 80)
+        return events[-1], gemini_assistant.advice_cache.get(key)[1]
+
+    yield run
+    gemini_assistant.advice_cache.clear()
+
+
+def test_parser_skips_prose_braces_before_json():
+    parser = gemini_assistant.AdviceSectionParser()
+    parser.feed("以下是{建議}：" + json.dumps(VALID_ADVICE, ensure_ascii=False))
+    assert parser.complete
+    assert parser.sections == {}
+
+
+def test_parser_drops_malformed_members():
+    parser = gemini_assistant.AdviceSectionParser()
+    found = parser.feed('{"health_risks": ["a"], "quit_strategies": [oops], "motivation": "m"}')
+    assert dict(found) == {"health_risks": ["a"], "motivation": "m"}
+
+
+def test_stream_caches_only_validated_advice(legacy_stream):
+    (name, advice), state = legacy_stream("```json\n" + json.dumps(VALID_ADVICE, ensure_ascii=False) + "\n```")
+    assert name == "done"
+    assert advice == VALID_ADVICE
+    assert state == "fresh"
+
+
+@pytest.mark.parametrize("text", [
+    "以下是{建議}：" + json.dumps(VALID_ADVICE, ensure_ascii=False),
+    '{"health_risks": ["a"], "quit_strategies": [oops], "motivation": "m"}',
+    '{"health_risks": ["a"], "motivation": "m"}',
+])
+def test_stream_does_not_cache_incomplete_advice(legacy_stream, text):
+    (name, advice), state = legacy_stream(text)
+    assert name == "done"
+    assert advice
+    assert state is None
+
+
+@pytest.mark.parametrize("mode", ["llm", "auto"])
+def test_legacy_parse_rejects_arbitrary_json(legacy_stream, monkeypatch, mode):
+    monkeypatch.setattr(gemini_assistant, "_get_model", lambda: FakeModel('{"error": "quota"}'))
+    monkeypatch.setattr(gemini_assistant, "GEMINI_API_KEY", "test")
+    advice = gemini_assistant.get_personalized_advice(10, 5, 80, mode=mode)
+    expected = (local_advice.generate_local_advice(10, 5, 80) if mode == "auto"
+                else gemini_assistant._fallback_advice())
+    assert advice == expected
+    key = gemini_assistant.make_advice_cache_key(10, 5, 80)
+    assert gemini_assistant.advice_cache.get(key)[1] is None
+
+
+def test_additional_info_does_not_bypass_cache(legacy_stream, monkeypatch):
+    stub = gemini_stub.StubModel()
+    monkeypatch.setattr(gemini_assistant, "_get_model", lambda: stub)
+    for info in (None, {"age": 30}, {"note": "x"}):
+        gemini_assistant.get_personalized_advice(10, 5, 80, additional_info=info, mode="llm")
+    assert stub.calls == 1
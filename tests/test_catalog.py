@@ -0,0 +1,62 @@
+import catalog
+from utils import Project
+
+
+def make_project(title, category="finance", technologies=("Python",)):
+    return Project(title=title, description="", technologies=technologies, category=category, icon="fa-chart")
+
+
+PROJECTS = (
+    make_project("台泥財報及股價分析"),
+    make_project("台積電股價人工智慧預測"),
+    make_project("韓流文化分析研究", category="analysis"),
+)
+
+
+def titles(results):
+    return [project.title for project in results]
+
+
+def test_single_cjk_character_query_matches_indexed_titles():
+    project_catalog = catalog.ProjectCatalog(PROJECTS)
+    assert titles(project_catalog.search(query="台")) == ["台泥財報及股價分析", "台積電股價人工智慧預測"]
+    assert titles(project_catalog.search(query="韓")) == ["韓流文化分析研究"]
+
+
+def test_bigram_queries_still_match():
+    project_catalog = catalog.ProjectCatalog(PROJECTS)
+    assert titles(project_catalog.search(query="股價")) == ["台泥財報及股價分析", "台積電股價人工智慧預測"]
+    assert titles(project_catalog.search(query="台積電")) == ["台積電股價人工智慧預測"]
+    assert titles(project_catalog.search(query="台韓")) == []
+
+
+def test_streamed_filter_matches_catalog_search():
+    project_catalog = catalog.ProjectCatalog(PROJECTS)
+    for query in ("台", "分析", "台積電", "研"):
+        predicate = catalog.ProjectFilter(query=query)
+        assert [p for p in PROJECTS if predicate(p)] == list(project_catalog.search(query=query))
+
+
+def test_mixed_script_titles_split_into_latin_and_cjk_tokens():
+    projects = PROJECTS + (make_project("Python股價分析"), make_project("AI預測", category="programming"))
+    project_catalog = catalog.ProjectCatalog(projects)
+    assert catalog.tokenize("Python股價分析") == ["python", "股價", "價分", "分析"]
+    for query, expected in (("股價", ["台泥財報及股價分析", "台積電股價人工智慧預測", "Python股價分析"]),
+                            ("python", ["Python股價分析"]),
+                            ("ai 預測", ["AI預測"])):
+        assert titles(project_catalog.search(query=query)) == expected
+        predicate = catalog.ProjectFilter(query=query)
+        assert titles(p for p in projects if predicate(p)) == expected
+
+
+def test_streamed_page_clamps_out_of_range_page_like_paginate():
+    projects = tuple(make_project(f"專案{i}") for i in range(5))
+    for number in (1, 2, 3, 999):
+        expected = catalog.ProjectCatalog.paginate(projects, number, 2)
+        page = catalog.StreamedPage(projects, lambda project: True, number, 2)
+        assert list(page) == list(expected.items)
+        assert (page.page, page.total, page.pages) == (expected.page, expected.total, expected.pages)
+
+    empty = catalog.StreamedPage(projects, lambda project: False, 999, 2)
+    assert list(empty) == []
+    assert (empty.page, empty.pages) == (1, 1)
@@ -0,0 +1,76 @@
+import json
+import os
+
+import pytest
+
+import freeze
+
+
+@pytest.fixture
+def export(tmp_path):
+    def run(output_dir, **kwargs):
+        return freeze.freeze(str(output_dir), template_dir=freeze.BASE_DIR, **kwargs)
+    return run
+
+
+def test_refuses_non_empty_directory_without_manifest(tmp_path, export):
+    keep = tmp_path / "notes.txt"
+    keep.write_text("keep")
+    with pytest.raises(FileExistsError):
+        export(tmp_path)
+    assert keep.read_text() == "keep"
+
+
+def test_refuses_repository_root(export):
+    with pytest.raises(FileExistsError):
+        export(freeze.BASE_DIR, force=True)
+
+
+def test_force_writes_without_deleting(tmp_path, export):
+    keep = tmp_path / "notes.txt"
+    keep.write_text("keep")
+    export(tmp_path, force=True)
+    assert keep.read_text() == "keep"
+    assert (tmp_path / "index.html").is_file()
+
+
+def test_reexport_removes_only_previous_manifest_files(tmp_path, export):
+    output = tmp_path / "site"
+    export(output)
+    manifest = json.loads((output / freeze.MANIFEST_NAME).read_text(encoding="utf-8"))
+    assert manifest["pages"]["/"] == "index.html"
+
+    # 上一次匯出的過期頁面會被清除，其他文件保留
+    stale = output / "projects-stale.html"
+    stale.write_text("old")
+    (output / "stale.html.gz").write_bytes(b"old")
+    manifest["pages"]["/projects?stale=1"] = "projects-stale.html"
+    manifest["pages"]["/escape"] = "../outside.html"
+    (output / freeze.MANIFEST_NAME).write_text(json.dumps(manifest), encoding="utf-8")
+    outside = tmp_path / "outside.html"
+    outside.write_text("outside")
+
+    export(output)
+    assert not stale.exists()
+    assert (output / "stale.html.gz").exists()
+    assert outside.read_text() == "outside"
+    assert os.path.isfile(output / "index.html")
+
+
+@pytest.fixture
+def default_templates(monkeypatch):
+    # 還原Flask預設的templates/目錄(本專案中不存在)
+    monkeypatch.setattr(freeze.main.app, "template_folder", "templates")
+
+
+def test_defaults_to_repository_templates(tmp_path, default_templates):
+    summary = freeze.freeze(str(tmp_path / "site"))
+    assert summary["failures"] == []
+    assert summary["pages"] > len(freeze.SEED_URLS)
+
+
+def test_reports_links_skipped_by_max_pages(tmp_path, default_templates, capsys):
+    summary = freeze.freeze(str(tmp_path / "site"), max_pages=2)
+    assert summary["pages"] == 2
+    assert summary["skipped"][0] == "/projects"
+    assert "/projects" in capsys.readouterr().out
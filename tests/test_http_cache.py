@@ -0,0 +1,30 @@
+import pytest
+
+import main
+
+CONDITIONAL_HEADERS = [
+    {"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"},
+    {"If-None-Match": "*"},
+]
+
+
+@pytest.mark.parametrize("headers", CONDITIONAL_HEADERS)
+@pytest.mark.parametrize("url, status", [
+    ("/lung/101.png", 404),
+    ("/lung/50.png?quality=bogus", 400),
+    ("/lung/sequence/webp?quality=bogus", 400),
+    ("/lung/sequence/sprite/index?quality=bogus", 400),
+])
+def test_invalid_requests_are_rejected_before_conditional_headers(url, status, headers):
+    client = main.app.test_client()
+    assert client.get(url).status_code == status
+    assert client.get(url, headers=headers).status_code == status
+
+
+def test_valid_image_answers_304_with_matching_etag():
+    client = main.app.test_client()
+    response = client.get("/lung/50.png?quality=thumbnail")
+    assert response.status_code == 200
+    revalidated = client.get("/lung/50.png?quality=thumbnail", headers={"If-None-Match": response.headers["ETag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["ETag"] == response.headers["ETag"]
@@ -0,0 +1,63 @@
+import io
+
+import pytest
+from PIL import Image
+
+import lung_svg_generator
+import main
+
+
+@pytest.mark.parametrize("start, stop, step", [(0, 100, -1), (100, 0, 1), (50, 50, 0)])
+def test_empty_or_reversed_range_raises_value_error(start, stop, step):
+    with pytest.raises(ValueError):
+        lung_svg_generator.render_lung_sequence(start, stop, step, format='sprite', quality='thumbnail')
+
+
+def test_frames_are_drawn_at_their_own_level_by_default():
+    sequence = lung_svg_generator.render_lung_sequence(95, 90, -1, format='sprite', quality='thumbnail')
+    assert sequence['frame_count'] == 6
+
+    renderer = lung_svg_generator.get_renderer()
+    sheet = Image.open(io.BytesIO(sequence['data'])).convert('RGBA')
+    width, height = sequence['frame_width'], sequence['frame_height']
+    for entry in sequence['levels']:
+        expected = Image.fromarray(renderer.render_rgba(entry['level'], 'thumbnail'), 'RGBA')
+        frame = sheet.crop((entry['x'], entry['y'], entry['x'] + width, entry['y'] + height))
+        assert frame.tobytes() == expected.tobytes(), entry['level']
+
+
+def test_snap_to_bands_collapses_levels():
+    sequence = lung_svg_generator.render_lung_sequence(95, 90, -1, format='sprite', quality='thumbnail',
+                                                       snap_to_bands=True)
+    assert sequence['frame_count'] < 6
+
+
+@pytest.fixture
+def sequence_disk_tier(tmp_path, monkeypatch):
+    monkeypatch.setattr(lung_svg_generator, "_render_cache", lung_svg_generator.LungRenderCache(cache_dir=str(tmp_path)))
+    main.get_lung_sequence.cache_clear()
+    yield lung_svg_generator.get_render_cache()
+    main.get_lung_sequence.cache_clear()
+
+
+def test_high_quality_sequence_is_not_rendered_in_the_request(sequence_disk_tier, monkeypatch):
+    def fail(**kwargs):
+        raise AssertionError("high quality sequences must be prebuilt")
+
+    monkeypatch.setattr(lung_svg_generator, "render_lung_sequence", fail)
+    client = main.app.test_client()
+    assert client.get("/lung/sequence/sprite?quality=high").status_code == 404
+    assert client.get("/lung/sequence/sprite/index?quality=high").status_code == 404
+
+
+def test_prebuilt_sequence_is_served_from_the_disk_tier(sequence_disk_tier, monkeypatch):
+    sequence = lung_svg_generator.render_lung_sequence(100, 98, -1, format='webp', quality='thumbnail')
+    sequence_disk_tier.write_sequence('webp', 'high', sequence)
+    monkeypatch.setattr(lung_svg_generator, "render_lung_sequence", None)
+
+    client = main.app.test_client()
+    response = client.get("/lung/sequence/webp?quality=high")
+    assert response.status_code == 200
+    assert response.data == sequence['data']
+    index = client.get("/lung/sequence/webp/index?quality=high").get_json()
+    assert index['levels'] == sequence['levels']
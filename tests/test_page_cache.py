@@ -0,0 +1,96 @@
+import os
+import shutil
+
+import pytest
+
+import app as replit_app
+import http_cache
+import main
+import page_cache
+import utils
+from conftest import ROOT
+
+cache = page_cache.page_cache
+
+
+def bump_mtime(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+@pytest.fixture
+def template_copy(flask_app, tmp_path):
+    """模板的副本，修改其mtime不影響專案中的文件"""
+    for name in ("index.html", "slideshow.html", "projects.html"):
+        shutil.copy(os.path.join(ROOT, name), tmp_path / name)
+    flask_app.template_folder = str(tmp_path)
+    return tmp_path
+
+
+@pytest.mark.parametrize("flask_app", [main, replit_app], indirect=True)
+def test_hit_skips_rendering_until_template_changes(template_copy, flask_app):
+    client = flask_app.test_client()
+    first = client.get("/")
+    assert client.get("/").data == first.data
+    assert cache.stats()["hits"] == 1
+
+    bump_mtime(template_copy / "index.html")
+    assert client.get("/").status_code == 200
+    assert cache.stats()["invalidations"] == 1
+    assert client.get("/").status_code == 200
+    assert cache.stats()["hits"] == 2
+
+
+@pytest.mark.parametrize("flask_app", [main], indirect=True)
+def test_data_file_change_invalidates_projects(flask_app, tmp_path, monkeypatch):
+    data = tmp_path / "data.txt"
+    shutil.copy(utils.DATA_PATH, data)
+    monkeypatch.setattr(http_cache, "project_data_paths", lambda: [str(data)])
+    client = flask_app.test_client()
+    client.get("/projects")
+    client.get("/projects")
+    assert cache.stats()["hits"] == 1
+
+    bump_mtime(data)
+    client.get("/projects")
+    assert cache.stats()["invalidations"] == 1
+
+
+@pytest.mark.parametrize("flask_app", [main], indirect=True)
+def test_streamed_page_is_stored_only_after_it_is_fully_sent(flask_app, project_lines):
+    client = flask_app.test_client()
+
+    # 客戶端讀到一半就斷線
+    response = client.get("/projects", buffered=False)
+    assert response.is_streamed
+    next(response.response)
+    response.close()
+    assert cache.stats()["size"] == 0
+
+    response = client.get("/projects", buffered=False)
+    assert cache.stats()["size"] == 0
+    body = response.get_data()
+    response.close()
+    assert cache.stats()["size"] == 1
+    assert client.get("/projects").data == body
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.parametrize("flask_app", [main], indirect=True)
+def test_error_responses_are_not_cached(flask_app, monkeypatch):
+    monkeypatch.setattr(main, "render_template", lambda name: ("暫時無法提供", 503))
+    client = flask_app.test_client()
+    assert client.get("/").status_code == 503
+    assert client.get("/").status_code == 503
+    assert cache.stats()["size"] == 0
+    assert cache.stats()["hits"] == 0
+
+
+@pytest.mark.parametrize("flask_app", [main], indirect=True)
+def test_oversized_pages_are_not_cached(flask_app, monkeypatch):
+    monkeypatch.setattr(cache, "max_entry_bytes", 100)
+    client = flask_app.test_client()
+    assert client.get("/").status_code == 200
+    assert client.get("/").status_code == 200
+    assert cache.stats()["size"] == 0
+    assert cache.stats()["hits"] == 0
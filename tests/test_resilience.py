@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+import pytest
+
+import gemini_assistant
+import gemini_stub
+import resilience
+
+
+def call(stub, breaker, policy):
+    return resilience.call_with_resilience(
+        lambda timeout: stub.generate_content("prompt", request_options={"timeout": timeout}), breaker, policy)
+
+
+def test_fail_mode_opens_breaker_and_stops_calling_upstream():
+    stub = gemini_stub.StubModel(mode="fail")
+    breaker = resilience.CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    policy = resilience.RetryPolicy(attempts=1)
+    for _ in range(3):
+        with pytest.raises(gemini_stub.StubServiceUnavailable):
+            call(stub, breaker, policy)
+    assert breaker.state == "open"
+
+    with pytest.raises(resilience.CircuitOpenError):
+        call(stub, breaker, policy)
+    assert stub.calls == 3
+
+
+def test_half_open_breaker_lets_one_probe_through():
+    stub = gemini_stub.StubModel(mode="fail")
+    breaker = resilience.CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    policy = resilience.RetryPolicy(attempts=1)
+    with pytest.raises(gemini_stub.StubServiceUnavailable):
+        call(stub, breaker, policy)
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+
+    def probe(timeout):
+        # 試探呼叫進行中，其他呼叫仍被拒絕
+        with pytest.raises(resilience.CircuitOpenError):
+            call(stub, breaker, policy)
+        stub.mode = "ok"
+        return stub.generate_content("prompt", request_options={"timeout": timeout})
+
+    resilience.call_with_resilience(probe, breaker, policy)
+    assert stub.calls == 2
+    assert breaker.state == "closed"
+
+
+def test_failed_probe_reopens_breaker():
+    stub = gemini_stub.StubModel(mode="fail")
+    breaker = resilience.CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    policy = resilience.RetryPolicy(attempts=1)
+    with pytest.raises(gemini_stub.StubServiceUnavailable):
+        call(stub, breaker, policy)
+    time.sleep(0.06)
+    with pytest.raises(gemini_stub.StubServiceUnavailable):
+        call(stub, breaker, policy)
+    assert breaker.state == "open"
+
+
+def test_hang_mode_gives_up_within_deadline():
+    stub = gemini_stub.StubModel(mode="hang")
+    policy = resilience.RetryPolicy(attempts=3, deadline=0.3)
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        call(stub, resilience.CircuitBreaker(), policy)
+    assert time.monotonic() - started < 0.3 + 0.2
+
+
+def test_hang_mode_gives_up_within_deadline_async():
+    stub = gemini_stub.StubModel(mode="hang")
+    policy = resilience.RetryPolicy(attempts=3, deadline=0.3)
+
+    async def run():
+        return await resilience.call_with_resilience_async(
+            lambda timeout: stub.generate_content_async("prompt", request_options={"timeout": timeout}),
+            resilience.CircuitBreaker(), policy)
+
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        asyncio.run(run())
+    assert time.monotonic() - started < 0.3 + 0.2
+
+
+def test_advice_falls_back_within_gemini_timeout(monkeypatch):
+    monkeypatch.setattr(gemini_assistant, "_get_model", lambda: gemini_stub.StubModel(mode="hang"))
+    monkeypatch.setattr(gemini_assistant, "gemini_retry", resilience.RetryPolicy(attempts=3, deadline=0.3))
+    monkeypatch.setattr(gemini_assistant, "gemini_breaker", resilience.CircuitBreaker())
+    started = time.monotonic()
+    advice = gemini_assistant.get_personalized_advice(10, 5, 80, use_cache=False, mode="llm")
+    assert time.monotonic() - started < 0.3 + 0.2
+    assert advice == gemini_assistant._fallback_advice()
+
+
+def test_flaky_mode_retries_transient_errors(monkeypatch):
+    # 前兩次失敗，第三次成功
+    outcomes = iter([0.0, 0.0, 1.0])
+    monkeypatch.setattr(gemini_stub.random, "random", lambda: next(outcomes))
+    stub = gemini_stub.StubModel(mode="flaky", failure_rate=0.5)
+    breaker = resilience.CircuitBreaker()
+    response = call(stub, breaker, resilience.RetryPolicy(attempts=3, base_delay=0.001))
+    assert response.text == gemini_stub.StubModel(mode="ok").generate_content("prompt").text
+    assert stub.calls == 3
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+def test_non_transient_errors_are_not_retried():
+    calls = []
+
+    def func(timeout):
+        calls.append(timeout)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        resilience.call_with_resilience(func, resilience.CircuitBreaker(),
+                                        resilience.RetryPolicy(attempts=3, base_delay=0.001))
+    assert len(calls) == 1
@@ -0,0 +1,34 @@
+import re
+
+import pytest
+
+import app as replit_app
+import catalog
+import main
+
+
+@pytest.mark.parametrize("flask_app", [main, replit_app], indirect=True)
+@pytest.mark.parametrize("url", ["/projects", "/projects?category=finance&page=2"])
+def test_projects_page_renders(flask_app, url):
+    response = flask_app.test_client().get(url)
+    assert response.status_code == 200
+    assert "所有專案".encode("utf-8") in response.data
+
+
+def card_titles(body):
+    """頁面中的專案標題與目前頁碼"""
+    active = re.search(r'page-item active">\s*<a[^>]*>(\d+)<', body)
+    return re.findall(r'<h3 class="card-title">(.*?)</h3>', body), active and active.group(1)
+
+
+@pytest.mark.parametrize("flask_app", [main, replit_app], indirect=True)
+@pytest.mark.parametrize("query", ["", "?category=finance", "?page=999", "?q=股價&per_page=1&page=999"])
+def test_streamed_and_indexed_projects_pages_match(flask_app, request, monkeypatch, query):
+    client = flask_app.test_client()
+    indexed = client.get("/projects" + query)
+    request.getfixturevalue("project_lines")
+    # 有data.jsonl時兩個應用程式都不應再建立索引目錄
+    monkeypatch.setattr(catalog, "get_catalog", None)
+    streamed = client.get("/projects" + query)
+    assert streamed.status_code == 200
+    assert card_titles(streamed.get_data(as_text=True)) == card_titles(indexed.get_data(as_text=True))
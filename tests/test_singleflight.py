@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+import time
+
+from conftest import ROOT
+
+# 在約定的時間同時開始，取得建議後印出本行程的上游呼叫次數
+WORKER = """
+import sys, time
+import gemini_assistant
+time.sleep(max(0, float(sys.argv[1]) - time.time()))
+gemini_assistant.get_personalized_advice(10, 5, 80, mode="llm")
+print(gemini_assistant._get_model().calls)
+"""
+
+
+def test_concurrent_workers_make_one_upstream_call(tmp_path):
+    env = dict(
+        os.environ,
+        GEMINI_BACKEND="stub",
+        GEMINI_STUB_LATENCY="0.5",
+        GEMINI_CACHE_DB=str(tmp_path / "advice.db"),
+        GEMINI_SINGLEFLIGHT_DIR=str(tmp_path / "locks"),
+    )
+    start = str(time.time() + 3)
+    workers = [subprocess.Popen([sys.executable, "-c", WORKER, start], cwd=ROOT, env=env,
+                                stdout=subprocess.PIPE, text=True) for _ in range(4)]
+    calls = [int(worker.communicate(timeout=60)[0].split()[-1]) for worker in workers]
+    assert all(worker.returncode == 0 for worker in workers)
+    assert sum(calls) == 1
@@ -4,51 +4,231 @@
 """
 import json
 import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Tuple
+
+# 以模組所在目錄解析，不受工作目錄影響
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data.txt')
+
+# JSON Lines格式的專案資料(每行一個專案)；存在時優先於data.txt，並可逐行串流讀取
+PROJECT_LINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data.jsonl')
+
+# 文件不存在或無法讀取時使用的預設專案資料
+DEFAULT_PROJECTS = (
+    {
+        "title": "台泥財報及股價分析",
+        "description": "深入分析台灣水泥公司的財務報表，並結合市場趨勢和技術指標對其股價進行分析和預測。",
+        "technologies": ["Python", "Pandas", "NumPy", "Matplotlib", "財務分析"],
+        "category": "finance",
+        "icon": "chart-line"
+    },
+    {
+        "title": "友達光電招募流程研究",
+        "description": "對友達光電的人才招募流程進行全面研究，分析其招聘策略、面試流程和人才選拔標準，提出優化建議。",
+        "technologies": ["問卷調查", "數據分析", "策略規劃"],
+        "category": "analysis",
+        "icon": "search-dollar"
+    },
+    {
+        "title": "台積電股價人工智慧預測",
+        "description": "運用機器學習和人工智慧技術對台積電股價進行預測，結合多種預測模型提高準確性，分析影響股價的關鍵因素。",
+        "technologies": ["Python", "機器學習", "時間序列分析", "深度學習"],
+        "category": "programming",
+        "icon": "robot"
+    },
+    {
+        "title": "韓流文化分析研究",
+        "description": "研究韓流文化在台灣的影響與發展，分析其商業模式、行銷策略和文化傳播方式，探討跨文化傳播的成功因素。",
+        "technologies": ["市場研究", "文化分析", "社會調查", "數據視覺化"],
+        "category": "analysis",
+        "icon": "globe-asia"
+    }
+)
+
+@dataclass(frozen=True, slots=True)
+class Project:
+    """
+    唯讀的專案記錄，建立一次後在請求間共用
+
+    分類、圖示與技術名稱在專案之間大量重複，以sys.intern共用同一個字串物件
+    """
+    title: str
+    description: str
+    technologies: Tuple[str, ...] = ()
+    category: str = ""
+    icon: str = ""
+
+    @classmethod
+    def from_dict(cls, data):
+        """從JSON物件建立專案(忽略未知欄位)"""
+        return cls(
+            title=data["title"],
+            description=data.get("description", ""),
+            technologies=tuple(sys.intern(technology) for technology in data.get("technologies", ())),
+            category=sys.intern(data.get("category", "")),
+            icon=sys.intern(data.get("icon", "")),
+        )
+
+    def to_dict(self):
+        """轉為可序列化為JSON的字典"""
+        return {
+            "title": self.title,
+            "description": self.description,
+            "technologies": list(self.technologies),
+            "category": self.category,
+            "icon": self.icon,
+        }
+
+def freeze_projects(projects):
+    """
+    將專案列表轉為不可變的Project記錄，讓快取的資料可安全地在請求間共用
+
+    Returns:
+        tuple: Project記錄
+    """
+    return tuple(Project.from_dict(project) for project in projects)
+
+class CachedFileLoader:
+    """
+    解析一次並保留結果，只在文件的mtime或大小改變時重新載入
+
+    Args:
+        path: 文件路徑
+        parse: 將文件內容轉為資料的函數
+        default: 文件不存在或從未成功解析時返回的資料
+    """
+
+    def __init__(self, path, parse, default):
+        self.path = path
+        self.parse = parse
+        self.default = default
+        self.loads = 0
+        self._value = default
+        self._signature = None
+        self._failed_signature = None
+        self._lock = threading.Lock()
+        self._watcher = None
+
+    def _stat_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _refresh(self, signature):
+        with self._lock:
+            if signature is None:
+                self._value, self._signature = self.default, None
+                return
+            if signature in (self._signature, self._failed_signature):
+                return
+            try:
+                with open(self.path, 'r', encoding='utf-8') as file:
+                    value = self.parse(file.read())
+            except Exception as e:
+                # 同一版本的文件只回報一次，並繼續提供上一次成功載入的資料
+                self._failed_signature = signature
+                print(f"讀取 {self.path} 時發生錯誤: {e}")
+                return
+            self._value, self._signature, self._failed_signature = value, signature, None
+            self.loads += 1
+
+    def get(self):
+        """返回目前的資料(啟用監看時不再檢查文件)"""
+        if self._watcher is None:
+            self._refresh(self._stat_signature())
+        return self._value
+
+    def start_watcher(self, interval=2.0):
+        """
+        以背景執行緒定期檢查文件，請求路徑便不再需要呼叫os.stat
+
+        Args:
+            interval: 檢查間隔秒數
+        """
+        if self._watcher is not None:
+            return
+        self._refresh(self._stat_signature())
+
+        def watch():
+            while True:
+                time.sleep(interval)
+                self._refresh(self._stat_signature())
+
+        self._watcher = threading.Thread(target=watch, name="data-watcher", daemon=True)
+        self._watcher.start()
+
+_reported_line_errors = set()
+
+def _parse_project_lines(lines, path, version):
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield Project.from_dict(json.loads(line))
+        except (ValueError, TypeError, AttributeError, KeyError) as e:
+            key = (path, version, line_number)
+            if key not in _reported_line_errors:
+                _reported_line_errors.add(key)
+                print(f"{path} 第 {line_number} 行無法解析: {e}")
+
+def iter_project_lines(path=PROJECT_LINES_PATH):
+    """
+    逐行讀取JSON Lines專案資料，記憶體用量不隨專案數增加
+
+    無法解析的行會被略過；同一版本文件的同一行只回報一次
+
+    Yields:
+        Project: 唯讀的專案記錄
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        yield from _parse_project_lines(file, path, os.fstat(file.fileno()).st_mtime_ns)
+
+def has_project_lines():
+    """是否使用JSON Lines專案資料"""
+    return os.path.exists(PROJECT_LINES_PATH)
+
+def export_project_lines(path=PROJECT_LINES_PATH, projects=None):
+    """
+    將專案資料寫成JSON Lines格式
+
+    Args:
+        path: 輸出路徑
+        projects: Project序列(預設為data.txt的內容)
+    """
+    projects = project_data_loader.get() if projects is None else projects
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        for project in projects:
+            file.write(json.dumps(project.to_dict(), ensure_ascii=False) + "\n")
+    os.replace(tmp_path, path)
+
+project_data_loader = CachedFileLoader(
+    DATA_PATH,
+    lambda text: freeze_projects(json.loads(text)),
+    freeze_projects(DEFAULT_PROJECTS),
+)
+
+project_lines_loader = CachedFileLoader(
+    PROJECT_LINES_PATH,
+    lambda text: tuple(_parse_project_lines(
+        text.splitlines(), PROJECT_LINES_PATH, os.stat(PROJECT_LINES_PATH).st_mtime_ns)),
+    (),
+)
 
 def get_project_data():
     """
-    從data.txt文件中獲取專案數據
+    從data.jsonl或data.txt文件中獲取專案數據
     如果文件不存在，則返回預設專案資料
     
     Returns:
-        list: 專案數據列表
-    """
-    try:
-        # 嘗試從文件讀取數據
-        if os.path.exists('data.txt'):
-            with open('data.txt', 'r', encoding='utf-8') as file:
-                return json.loads(file.read())
-    except Exception as e:
-        print(f"讀取專案數據時發生錯誤: {e}")
-    
-    # 如果無法讀取文件或文件不存在，返回預設數據
-    return [
-        {
-            "title": "台泥財報及股價分析",
-            "description": "深入分析台灣水泥公司的財務報表，並結合市場趨勢和技術指標對其股價進行分析和預測。",
-            "technologies": ["Python", "Pandas", "NumPy", "Matplotlib", "財務分析"],
-            "category": "finance",
-            "icon": "chart-line"
-        },
-        {
-            "title": "友達光電招募流程研究",
-            "description": "對友達光電的人才招募流程進行全面研究，分析其招聘策略、面試流程和人才選拔標準，提出優化建議。",
-            "technologies": ["問卷調查", "數據分析", "策略規劃"],
-            "category": "analysis",
-            "icon": "search-dollar"
-        },
-        {
-            "title": "台積電股價人工智慧預測",
-            "description": "運用機器學習和人工智慧技術對台積電股價進行預測，結合多種預測模型提高準確性，分析影響股價的關鍵因素。",
-            "technologies": ["Python", "機器學習", "時間序列分析", "深度學習"],
-            "category": "programming",
-            "icon": "robot"
-        },
-        {
-            "title": "韓流文化分析研究",
-            "description": "研究韓流文化在台灣的影響與發展，分析其商業模式、行銷策略和文化傳播方式，探討跨文化傳播的成功因素。",
-            "technologies": ["市場研究", "文化分析", "社會調查", "數據視覺化"],
-            "category": "analysis",
-            "icon": "globe-asia"
-        }
-    ]
\ No newline at end of file
+        tuple: Project記錄(文件未改變時返回同一個物件)
+    """
+    if has_project_lines():
+        return project_lines_loader.get()
+    return project_data_loader.get()